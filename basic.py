@@ -1,14 +1,22 @@
-import cv2
 import numpy as np
-import mss
 import time
 import tkinter as tk
-from collections import deque
+
+from capture import get_capture
+from detection import TriangleDetector
+from pipeline import DetectionWorker
+from tracking import TrackManager
+from render import OverlaySurface
+from timing import LatencyEstimator, TickScheduler, adaptive_interval
 
 # === Глобальные переменные ===
-target_history = deque(maxlen=10)
-time_stamps = deque(maxlen=10)
+tracks = TrackManager()  # треки целей: история и скорость каждой
+detection_worker = None  # фоновый поток захвата (если включён)
+display_latency = LatencyEstimator()  # от начала тика до показа оверлея
+capture_latency = LatencyEstimator()  # от захвата кадра до показа оверлея
+last_capture_time = None  # время захвата кадра, уже переданного трекам
 overlay_window = None
+overlay_surface = None  # общее прозрачное окно для маркеров (если включено)
 explosion_window = None
 
 # GUI элементы (будут инициализированы позже)
@@ -16,6 +24,7 @@ status_window = None
 time_label = None
 dist_label = None
 capture_label = None
+rate_label = None
 
 # Параметры
 TOTAL_TIME = 0.0
@@ -23,33 +32,59 @@ START_TIME = 0.0
 RUNNING = False
 LAST_AIM_POINT = (800, 400)
 MISSILE_SPEED_MPS = 0.0
-
-# === Поиск треугольника ===
-def find_triangle(frame):
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    inv_gray = cv2.bitwise_not(gray)
-    _, thresh = cv2.threshold(inv_gray, 128, 255, cv2.THRESH_BINARY)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-    thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=2)
-
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
-        if area < 200:
-            continue
-        perimeter = cv2.arcLength(cnt, True)
-        approx = cv2.approxPolyDP(cnt, 0.04 * perimeter, True)
-        if len(approx) == 3 and cv2.isContourConvex(approx):
-            x, y, w, h = cv2.boundingRect(cnt)
-            aspect_ratio = float(w) / h
-            if 0.5 < aspect_ratio < 2.0:
-                M = cv2.moments(cnt)
-                if M["m00"] != 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    return (cx, cy)
-    return None
+TRACKING_CAPTURE = True  # захват только окна вокруг последней позиции цели
+BACKGROUND_DETECTION = True  # захват и поиск цели в отдельном потоке
+DETECTION_PYRAMID = 1  # 2/4 — первый проход по уменьшенному кадру (окупается только на полном кадре без помех)
+DETECTION_BACKEND = "contours"  # "components" — один проход по связным компонентам
+MOTION_GATE = True  # не искать цель заново, если кадр не изменился
+MULTI_TARGET = False  # искать все цели на экране (следящий захват тогда не используется)
+TRACK_POLICY = "oldest"  # выбор цели для наведения: oldest / nearest / fastest
+OVERLAY_SURFACE = True  # маркер на прозрачном окне во весь экран (False — отдельное окно маркера)
+UPDATE_INTERVAL_MS = 100
+GUIDANCE_INTERVAL_MIN = UPDATE_INTERVAL_MS / 1000  # сек — самый частый поиск цели и упреждение
+GUIDANCE_INTERVAL_MAX = 1.0  # сек — самый редкий (цель стоит на месте)
+ADAPTIVE_DETECTION = True  # частота поиска по скорости цели и остатку времени (False — раз в GUIDANCE_INTERVAL_MAX)
+detector = TriangleDetector(pyramid=DETECTION_PYRAMID, backend=DETECTION_BACKEND, motion_gate=MOTION_GATE)
+tick_rate = TickScheduler(UPDATE_INTERVAL_MS / 1000)  # цикл обновления
+guidance_rate = TickScheduler(GUIDANCE_INTERVAL_MAX)  # поиск цели и упреждение
+
+# === Источник цели: фоновый поток или синхронный захват ===
+def target_source():
+    if detection_worker is not None:
+        return detection_worker
+    return get_capture()
+
+def stop_detection():
+    global detection_worker
+    if detection_worker is not None:
+        detection_worker.stop()
+        detection_worker = None
+
+# Все цели текущего тика
+def detect_targets():
+    source = target_source()
+    if MULTI_TARGET:
+        return source.targets(detector.detect_all)
+    target_pos = source.target(detector.detect)
+    return [target_pos] if target_pos is not None else []
+
+# Передать трекам новый кадр. Время обнаружения — момент захвата, а не конец
+# поиска; повторно тот же кадр (фоновый поток ещё не успел) не передаётся.
+def update_tracks():
+    global last_capture_time
+    targets = detect_targets()
+    capture_time = target_source().capture_time
+    if capture_time is not None and capture_time != last_capture_time:
+        tracks.update(targets, capture_time)
+        last_capture_time = capture_time
+    return capture_time
+
+# Прозрачное окно маркеров создаётся при первом обращении поверх главного окна
+def get_overlay_surface():
+    global overlay_surface
+    if overlay_surface is None:
+        overlay_surface = OverlaySurface(status_window)
+    return overlay_surface
 
 # === Обновление оверлея ===
 def update_overlay(x, y, filled=False):
@@ -57,6 +92,15 @@ def update_overlay(x, y, filled=False):
     size = 40
     offset = size // 2
 
+    if OVERLAY_SURFACE:
+        surface = get_overlay_surface()
+        if filled:
+            surface.circle("lead", x, y, offset, fill="red", outline="")
+        else:
+            surface.circle("lead", x, y, offset - 5, outline="red", width=3, fill="")
+        surface.flush()
+        return
+
     if overlay_window is None:
         overlay_window = tk.Tk()
         overlay_window.overrideredirect(True)
@@ -88,7 +132,7 @@ def update_guidance():
     if not RUNNING:
         return
 
-    current_time = time.time()
+    current_time = time.perf_counter()
     elapsed = current_time - START_TIME
     remaining = max(0.0, TOTAL_TIME - elapsed)
 
@@ -101,50 +145,55 @@ def update_guidance():
         update_overlay(LAST_AIM_POINT[0], LAST_AIM_POINT[1], filled=True)
         capture_label.config(text="Цель: --", fg="gray")
         RUNNING = False
+        stop_detection()
         return
 
-    # Поиск цели
-    try:
-        sct = mss.mss()
-        monitor = sct.monitors[1]
-        screenshot = np.array(sct.grab(monitor))
-        frame = screenshot[:, :, :3]
-        target_pos = find_triangle(frame)
-    except Exception:
-        target_pos = None
-
-    if target_pos is not None:
-        target_history.append(target_pos)
-        time_stamps.append(current_time)
-        capture_label.config(text="Цель: захвачена", fg="green")
-    else:
-        capture_label.config(text="Цель: не найдена", fg="red")
-
-    # Обновляем упреждение раз в секунду
-    if hasattr(update_guidance, 'last_update'):
-        if current_time - update_guidance.last_update >= 1.0:
-            aim_point = target_pos
-            if target_pos is not None and len(target_history) >= 2:
-                dt_total = time_stamps[-1] - time_stamps[0]
-                if dt_total > 0:
-                    dx = target_history[-1][0] - target_history[0][0]
-                    dy = target_history[-1][1] - target_history[0][1]
-                    vx, vy = dx / dt_total, dy / dt_total
-                    pred_time = min(5.0, remaining)
-                    aim_x = int(target_pos[0] + vx * pred_time)
-                    aim_y = int(target_pos[1] + vy * pred_time)
-                    aim_point = (aim_x, aim_y)
-
-            if aim_point:
-                LAST_AIM_POINT = aim_point
-                update_overlay(aim_point[0], aim_point[1], filled=False)
-
-            update_guidance.last_update = current_time
-    else:
-        update_guidance.last_update = current_time
-
-    # Запланировать следующее обновление
-    status_window.after(100, update_guidance)  # каждые 100 мс
+    # Поиск цели и упреждение — по расписанию guidance_rate
+    target_source().next_tick()
+    if guidance_rate.due(current_time):
+        capture_time = update_tracks()
+        track = tracks.select(TRACK_POLICY)
+        # Цель на момент показа оверлея (компенсация задержки захват → экран).
+        # Без обнаружения трек продолжает движение по прогнозу фильтра
+        display_time = current_time + display_latency.value
+        target_pos = track.position_at(display_time) if track is not None else None
+
+        if track is not None and track.misses == 0:
+            capture_label.config(text=f"Цель: захвачена ({capture_latency.value * 1000:.0f} мс)", fg="green")
+        else:
+            capture_label.config(text="Цель: не найдена", fg="red")
+
+        # Медленная цель — поиск реже; быстрая, потерянная или конец полёта — чаще
+        if ADAPTIVE_DETECTION:
+            speed = np.hypot(*track.velocity()) if track is not None and track.samples >= 2 else None
+            guidance_rate.interval = adaptive_interval(speed, remaining, GUIDANCE_INTERVAL_MIN,
+                                                       GUIDANCE_INTERVAL_MAX)
+            if detection_worker is not None:
+                detection_worker.interval = guidance_rate.interval
+
+        aim_point = target_pos
+        if target_pos is not None and track.samples >= 2:
+            vx, vy = track.velocity()
+            pred_time = min(5.0, max(0.0, TOTAL_TIME - (display_time - START_TIME)))
+            aim_x = int(target_pos[0] + vx * pred_time)
+            aim_y = int(target_pos[1] + vy * pred_time)
+            aim_point = (aim_x, aim_y)
+
+        if aim_point:
+            LAST_AIM_POINT = aim_point
+            update_overlay(aim_point[0], aim_point[1], filled=False)
+            shown = time.perf_counter()
+            display_latency.add(shown - current_time)
+            if capture_time is not None:
+                capture_latency.add(shown - capture_time)
+
+    tick_requested, tick_achieved = tick_rate.rates(current_time)
+    detect_requested, detect_achieved = guidance_rate.rates(current_time)
+    rate_label.config(text=f"Тик: {tick_achieved:.0f}/{tick_requested:.0f} Гц | "
+                           f"Поиск: {detect_achieved:.1f}/{detect_requested:.1f} Гц")
+
+    # Запланировать следующее обновление (по дедлайну, без накопления опозданий)
+    status_window.after(tick_rate.next_delay(), update_guidance)
 
 # === Стартовое окно ===
 def show_start_form():
@@ -173,12 +222,25 @@ def show_start_form():
             tk.messagebox.showerror("Ошибка", "Введите корректные числа!")
             return
 
-        global TOTAL_TIME, START_TIME, RUNNING, MISSILE_SPEED_MPS
+        global TOTAL_TIME, START_TIME, RUNNING, MISSILE_SPEED_MPS, detection_worker
         MISSILE_SPEED_MPS = speed_kmh * 1000 / 3600
         TOTAL_TIME = distance_m / MISSILE_SPEED_MPS
-        START_TIME = time.time()
+        START_TIME = time.perf_counter()
         RUNNING = True
 
+        capture = get_capture()
+        capture.tracking = TRACKING_CAPTURE
+        capture.reset_tracking()
+        tracks.reset()
+        display_latency.reset()
+        capture_latency.reset()
+        tick_rate.reset()
+        guidance_rate.reset()
+        guidance_rate.interval = GUIDANCE_INTERVAL_MIN if ADAPTIVE_DETECTION else GUIDANCE_INTERVAL_MAX
+        if BACKGROUND_DETECTION:
+            detection_worker = DetectionWorker(GUIDANCE_INTERVAL_MIN, TRACKING_CAPTURE, DETECTION_PYRAMID,
+                                               DETECTION_BACKEND, MOTION_GATE, MULTI_TARGET).start()
+
         root.destroy()
         create_status_window()
 
@@ -187,25 +249,27 @@ def show_start_form():
 
 # === Создание окна статуса ===
 def create_status_window():
-    global status_window, time_label, dist_label, capture_label
+    global status_window, time_label, dist_label, capture_label, rate_label
     status_window = tk.Tk()
     status_window.title("Статус наведения")
-    status_window.geometry("280x140")
+    status_window.geometry("280x165")
     status_window.resizable(False, False)
     status_window.wm_attributes("-topmost", True)
 
     time_label = tk.Label(status_window, text="До взрыва: -- с", font=("Courier", 11))
     dist_label = tk.Label(status_window, text="Расстояние: -- м", font=("Courier", 11))
     capture_label = tk.Label(status_window, text="Цель: --", font=("Arial", 12), fg="gray")
+    rate_label = tk.Label(status_window, text="Тик: -- Гц", font=("Courier", 8), fg="gray")
 
     time_label.pack(pady=3)
     dist_label.pack(pady=3)
     capture_label.pack(pady=3)
+    rate_label.pack()
 
     tk.Label(status_window, text="Контур — упреждение\nЗакрашенный — взрыв", font=("Arial", 8), fg="gray").pack(pady=5)
 
     # Запуск обновления в основном потоке
-    status_window.after(100, update_guidance)
+    status_window.after(UPDATE_INTERVAL_MS, update_guidance)
     status_window.mainloop()
 
 # === Запуск ===
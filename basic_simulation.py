@@ -1,14 +1,28 @@
-import cv2
 import numpy as np
-import mss
 import time
 import tkinter as tk
-from collections import deque
+
+from capture import get_capture
+from detection import TriangleDetector
+from pipeline import DetectionWorker, ProcessDetectionWorker
+from tracking import TrackManager
+from render import OverlaySurface, RetainedCanvas
+from timing import NULL_PROFILER, LatencyEstimator, PhaseProfiler, TickScheduler, adaptive_interval
+from trajectories import TRAJECTORY_KINDS, random_trajectory
 
 # === Глобальные переменные ===
-target_history = deque(maxlen=10)
-time_stamps = deque(maxlen=10)
+tracks = TrackManager()  # треки целей: история и скорость каждой
+detection_worker = None  # фоновый поток захвата (если включён)
+display_latency = LatencyEstimator()  # от начала тика до показа оверлея
+capture_latency = LatencyEstimator()  # от захвата кадра до показа оверлея
+last_capture_time = None  # время захвата кадра, уже переданного трекам
+render_time = LatencyEstimator()  # время отрисовки холста за тик
+profiler = NULL_PROFILER  # время фаз тика (timing.PhaseProfiler, если включено)
+profile_hud = False  # показывать таблицу фаз на холсте
+profile_hud_text = ""
+profile_hud_time = 0.0  # когда таблица последний раз пересчитана
 overlay_window = None
+overlay_surface = None  # общее прозрачное окно для маркеров (если включено)
 explosion_window = None
 
 # Параметры полёта
@@ -23,39 +37,83 @@ TARGET_X, TARGET_Y = 800, 400
 TARGET_SIZE = 60
 MOVE_SPEED = 5
 MOVE_INTERVAL = 16
+UPDATE_INTERVAL_MS = 6
+GUIDANCE_INTERVAL_MIN = UPDATE_INTERVAL_MS / 1000  # сек — самый частый поиск цели
+GUIDANCE_INTERVAL_MAX = 0.05  # сек — самый редкий (цель стоит на месте)
+ADAPTIVE_DETECTION = True  # частота поиска по скорости цели и остатку времени (False — раз в GUIDANCE_INTERVAL_MAX)
+TRACKING_CAPTURE = True  # захват только окна вокруг последней позиции цели
+BACKGROUND_DETECTION = True  # захват и поиск цели в отдельном потоке
+DETECTION_PYRAMID = 1  # 2/4 — первый проход по уменьшенному кадру (окупается только на полном кадре без помех)
+DETECTION_BACKEND = "contours"  # "components" — один проход по связным компонентам
+MOTION_GATE = True  # не искать цель заново, если кадр не изменился
+MULTI_TARGET = False  # искать все цели на экране (следящий захват тогда не используется)
+TRACK_POLICY = "oldest"  # выбор цели для наведения: oldest / nearest / fastest
+DETECTION_PROCESSES = 0  # >0 — поиск цели в пуле процессов через разделяемую память
+RETAINED_RENDERING = True  # обновлять элементы холста, а не пересоздавать их (False — прежняя отрисовка)
+OVERLAY_SURFACE = True  # маркер на прозрачном окне во весь экран (False — отдельное окно маркера)
+TARGET_MOTION = "keyboard"  # движение цели: keyboard или вид траектории из trajectories.py
+TARGET_SEED = 0  # seed траектории: одинаковый seed — одинаковое движение цели
+PROFILE_PHASES = False  # время фаз тика: захват, поиск, треки, упреждение, отрисовка (F3 — таблица)
+PROFILE_EXPORT = None  # файл .json или .csv, куда при выходе пишутся перцентили фаз
+PROFILE_HUD_REFRESH = 0.25  # сек — как часто пересчитывать таблицу на экране
+# Фазы тика в порядке показа; grab и detect с фоновым поиском пишет поток захвата
+TICK_PHASES = ("draw", "grab", "detect", "tracks", "guidance", "overlay", "tick")
+detector = TriangleDetector(pyramid=DETECTION_PYRAMID, backend=DETECTION_BACKEND, motion_gate=MOTION_GATE)
+tick_rate = TickScheduler(UPDATE_INTERVAL_MS / 1000)  # цикл обновления
+guidance_rate = TickScheduler(GUIDANCE_INTERVAL_MAX)  # поиск цели и упреждение
 
 key_state = {"Up": False, "Down": False, "Left": False, "Right": False}
+target_path = None  # траектория цели (None — управление с клавиатуры)
 
 # Окна
 sim_window = None
 canvas = None
-
-# === Поиск треугольника ===
-def find_triangle(frame):
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    inv_gray = cv2.bitwise_not(gray)
-    _, thresh = cv2.threshold(inv_gray, 128, 255, cv2.THRESH_BINARY)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-    thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=2)
-
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
-        if area < 200:
-            continue
-        perimeter = cv2.arcLength(cnt, True)
-        approx = cv2.approxPolyDP(cnt, 0.04 * perimeter, True)
-        if len(approx) == 3 and cv2.isContourConvex(approx):
-            x, y, w, h = cv2.boundingRect(cnt)
-            aspect_ratio = float(w) / h
-            if 0.5 < aspect_ratio < 2.0:
-                M = cv2.moments(cnt)
-                if M["m00"] != 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    return (cx, cy)
-    return None
+scene = None  # элементы холста, обновляемые на месте
+
+# === Источник цели: фоновый поток или синхронный захват ===
+def target_source():
+    if detection_worker is not None:
+        return detection_worker
+    return get_capture()
+
+def stop_detection():
+    global detection_worker
+    if detection_worker is not None:
+        detection_worker.stop()
+        detection_worker = None
+
+# Все цели текущего тика
+def detect_targets():
+    source = target_source()
+    if MULTI_TARGET:
+        return source.targets(detector.detect_all)
+    target_pos = source.target(detector.detect)
+    return [target_pos] if target_pos is not None else []
+
+
+# Передать трекам новый кадр. Время обнаружения — момент захвата, а не конец
+# поиска; повторно тот же кадр (фоновый поток ещё не успел) не передаётся.
+def update_tracks():
+    global last_capture_time
+    targets = detect_targets()
+    if profiler.enabled and detection_worker is None:
+        # Синхронный захват: поиск цели — всё, кроме самого захвата
+        grab = get_capture().grab_seconds
+        profiler.add("grab", grab)
+        profiler.lap("detect", grab)
+    capture_time = target_source().capture_time
+    if capture_time is not None and capture_time != last_capture_time:
+        tracks.update(targets, capture_time)
+        last_capture_time = capture_time
+    profiler.lap("tracks")
+    return capture_time
+
+# Прозрачное окно маркеров создаётся при первом обращении поверх главного окна
+def get_overlay_surface():
+    global overlay_surface
+    if overlay_surface is None:
+        overlay_surface = OverlaySurface(sim_window)
+    return overlay_surface
 
 # === Обновление оверлея ===
 def update_overlay(x, y, filled=False):
@@ -63,6 +121,15 @@ def update_overlay(x, y, filled=False):
     size = 40
     offset = size // 2
 
+    if OVERLAY_SURFACE:
+        surface = get_overlay_surface()
+        if filled:
+            surface.circle("lead", x, y, offset, fill="red", outline="")
+        else:
+            surface.circle("lead", x, y, offset - 5, outline="red", width=3, fill="")
+        surface.flush()
+        return
+
     if overlay_window is None:
         overlay_window = tk.Tk()
         overlay_window.overrideredirect(True)
@@ -88,36 +155,37 @@ def update_overlay(x, y, filled=False):
         overlay_window.update_idletasks()
 
 # === Рисование ===
+# Время отрисовки считается без поиска цели: только работа с элементами холста
 def draw_all():
     if not canvas:
         return
-    canvas.delete("all")
-    canvas.config(bg="gray")
 
     # Таймер и статус (левый верх)
     if RUNNING:
-        elapsed = time.time() - START_TIME
+        elapsed = time.perf_counter() - START_TIME
         remaining = max(0.0, TOTAL_TIME - elapsed)
         dist_m = remaining / TOTAL_TIME * 1000 if TOTAL_TIME > 0 else 0
         status_text = f"До взрыва: {remaining:.1f} с\nРасст: {dist_m:.0f} м"
-        canvas.create_text(10, 10, anchor="nw", text=status_text,
-                           fill="white", font=("Courier", 10), tags="timer")
 
         # Статус цели
-        try:
-            sct = mss.mss()
-            monitor = sct.monitors[1]
-            screenshot = np.array(sct.grab(monitor))
-            target_pos = find_triangle(screenshot)
-        except Exception:
-            target_pos = None
-        status_color = "green" if target_pos else "red"
-        status_str = "Цель: захвачена" if target_pos else "Цель: не найдена"
-        canvas.create_text(10, 40, anchor="nw", text=status_str,
-                           fill=status_color, font=("Arial", 10), tags="status")
+        # (по трекам: поиск цели идёт с частотой наведения, а не каждый тик)
+        found = any(track.misses == 0 for track in tracks.tracks)
+        status_color = "green" if found else "red"
+        status_str = "Цель: захвачена" if found else "Цель: не найдена"
+        status_str += f" | Задержка: {capture_latency.value * 1000:.0f} мс"
+        status_str += f" | Отрисовка: {render_time.value * 1000:.1f} мс"
+        tick_requested, tick_achieved = tick_rate.rates()
+        detect_requested, detect_achieved = guidance_rate.rates()
+        status_str += (f"\nТик: {tick_achieved:.0f}/{tick_requested:.0f} Гц"
+                       f" | Поиск: {detect_achieved:.0f}/{detect_requested:.0f} Гц")
+        texts = [
+            ("timer", 10, status_text, "white", ("Courier", 10)),
+            ("status", 40, status_str, status_color, ("Arial", 10)),
+        ]
     else:
-        canvas.create_text(10, 10, anchor="nw", text="ВЗРЫВ!",
-                           fill="red", font=("Arial", 16, "bold"), tags="timer")
+        texts = [("timer", 10, "ВЗРЫВ!", "red", ("Arial", 16, "bold"))]
+    if profile_hud:
+        texts.append(("profile_hud", 80, profile_summary(), "white", ("Courier", 9)))
 
     # Треугольник
     h = TARGET_SIZE * np.sqrt(3) / 2
@@ -126,7 +194,51 @@ def draw_all():
         (TARGET_X - TARGET_SIZE // 2, TARGET_Y + h // 2),
         (TARGET_X + TARGET_SIZE // 2, TARGET_Y + h // 2)
     ]
-    canvas.create_polygon(pts, fill="black", outline="black", tags="triangle")
+
+    start = time.perf_counter()
+    if RETAINED_RENDERING:
+        for name, y, text, color, font in texts:
+            scene.text(name, 10, y, text, anchor="nw", fill=color, font=font)
+        if not RUNNING:
+            scene.hide("status")
+        if not profile_hud:
+            scene.hide("profile_hud")
+        scene.polygon("triangle", pts, fill="black", outline="black")
+    else:
+        canvas.delete("all")
+        canvas.config(bg="gray")
+        for name, y, text, color, font in texts:
+            canvas.create_text(10, y, anchor="nw", text=text, fill=color, font=font, tags=name)
+        canvas.create_polygon(pts, fill="black", outline="black", tags="triangle")
+    render_time.add(time.perf_counter() - start)
+
+# === Время фаз тика ===
+# Таблица перцентилей пересчитывается не чаще PROFILE_HUD_REFRESH
+def profile_summary():
+    global profile_hud_text, profile_hud_time
+    now = time.perf_counter()
+    if now - profile_hud_time >= PROFILE_HUD_REFRESH:
+        profile_hud_text = profiler.summary() if profiler.stats() else "Время фаз: данных пока нет"
+        profile_hud_time = now
+    return profile_hud_text
+
+def new_profiler():
+    return PhaseProfiler(UPDATE_INTERVAL_MS / 1000, TICK_PHASES)
+
+# F3: показать/скрыть таблицу; профилирование включается и в потоке поиска
+def toggle_profile_hud(event=None):
+    global profiler, profile_hud, profile_hud_time
+    if not profiler.enabled:
+        profiler = new_profiler()
+        if detection_worker is not None:
+            detection_worker.set_profiler(profiler)
+    profile_hud = not profile_hud
+    profile_hud_time = 0.0
+    draw_all()
+
+def export_profile():
+    if PROFILE_EXPORT and profiler.stats():
+        profiler.export(PROFILE_EXPORT)
 
 # === Клавиши ===
 def on_key_press(event):
@@ -141,35 +253,43 @@ def on_key_release(event):
 def update_loop():
     global TARGET_X, TARGET_Y, RUNNING
 
+    target_source().next_tick()
+
     if not RUNNING:
         draw_all()
         sim_window.after(100, update_loop)
         return
 
-    # Движение только при зажатых клавишах
-    dx = dy = 0
-    if key_state["Up"]:    dy -= MOVE_SPEED
-    if key_state["Down"]:  dy += MOVE_SPEED
-    if key_state["Left"]:  dx -= MOVE_SPEED
-    if key_state["Right"]: dx += MOVE_SPEED
+    profiler.begin()
+    if target_path is not None:
+        # Позиция по времени с начала полёта — не зависит от частоты тиков
+        TARGET_X, TARGET_Y = (float(v) for v in target_path(time.perf_counter() - START_TIME))
+    else:
+        # Движение только при зажатых клавишах
+        dx = dy = 0
+        if key_state["Up"]:    dy -= MOVE_SPEED
+        if key_state["Down"]:  dy += MOVE_SPEED
+        if key_state["Left"]:  dx -= MOVE_SPEED
+        if key_state["Right"]: dx += MOVE_SPEED
 
-    TARGET_X += dx
-    TARGET_Y += dy
+        TARGET_X += dx
+        TARGET_Y += dy
 
     draw_all()
+    profiler.lap("draw")
 
-    # Обновление наведения раз в секунду
-    current_time = time.time()
-    if not hasattr(update_loop, 'last_update'):
-        update_loop.last_update = current_time
-    if current_time - update_loop.last_update >= 0.05:
+    # Обновление наведения по расписанию guidance_rate
+    current_time = time.perf_counter()
+    if guidance_rate.due(current_time):
         elapsed = current_time - START_TIME
         remaining = max(0.0, TOTAL_TIME - elapsed)
 
         if remaining <= 0:
-            # 💥 ВЗРЫВ
+            # 💥 ВЗРЫВ (тик учитывается до взрыва, как и на обычном выходе)
+            profiler.tick()
             update_overlay(TARGET_X, TARGET_Y, filled=True)
             RUNNING = False
+            stop_detection()
             sim_window.unbind("<KeyPress>")
             sim_window.unbind("<KeyRelease>")
             draw_all()
@@ -177,46 +297,52 @@ def update_loop():
             return
 
         # Поиск цели
-        try:
-            sct = mss.mss()
-            monitor = sct.monitors[1]
-            screenshot = np.array(sct.grab(monitor))
-            target_pos = find_triangle(screenshot)
-        except Exception:
-            target_pos = None
-
-        if target_pos is not None:
-            target_history.append(target_pos)
-            time_stamps.append(current_time)
+        capture_time = update_tracks()
+        track = tracks.select(TRACK_POLICY)
+
+        # Медленная цель — поиск реже; быстрая, потерянная или конец полёта — чаще
+        if ADAPTIVE_DETECTION:
+            speed = np.hypot(*track.velocity()) if track is not None and track.samples >= 2 else None
+            guidance_rate.interval = adaptive_interval(speed, remaining, GUIDANCE_INTERVAL_MIN,
+                                                       GUIDANCE_INTERVAL_MAX)
+            if detection_worker is not None:
+                detection_worker.interval = guidance_rate.interval
+
+        # Цель на момент показа оверлея (компенсация задержки захват → экран).
+        # Без обнаружения трек продолжает движение по прогнозу фильтра
+        display_time = current_time + display_latency.value
+        if track is not None:
+            target_pos = track.position_at(display_time)
         else:
             target_pos = (TARGET_X, TARGET_Y)  # fallback
 
         # Прогноз
         aim_point = target_pos
-        if target_pos and len(target_history) >= 2:
-            dt_total = time_stamps[-1] - time_stamps[0]
-            if dt_total > 0:
-                dx_t = target_history[-1][0] - target_history[0][0]
-                dy_t = target_history[-1][1] - target_history[0][1]
-                vx, vy = dx_t / dt_total, dy_t / dt_total
-                pred_time = min(5.0, remaining)
-                aim_x = int(target_pos[0] + vx * pred_time)
-                aim_y = int(target_pos[1] + vy * pred_time)
-                aim_point = (aim_x, aim_y)
+        if track is not None and track.samples >= 2:
+            vx, vy = track.velocity()
+            pred_time = min(5.0, max(0.0, TOTAL_TIME - (display_time - START_TIME)))
+            aim_x = int(target_pos[0] + vx * pred_time)
+            aim_y = int(target_pos[1] + vy * pred_time)
+            aim_point = (aim_x, aim_y)
+        profiler.lap("guidance")
 
         if aim_point:
             LAST_AIM_POINT = aim_point
             update_overlay(aim_point[0], aim_point[1], filled=False)
+            shown = time.perf_counter()
+            display_latency.add(shown - current_time)
+            if capture_time is not None:
+                capture_latency.add(shown - capture_time)
+            profiler.lap("overlay")
+    profiler.tick()
 
-        update_loop.last_update = current_time
-
-    sim_window.after(6, update_loop)
+    sim_window.after(tick_rate.next_delay(), update_loop)
 
 # === Стартовое окно ===
 def show_start_form():
     root = tk.Tk()
     root.title("Запуск ракеты")
-    root.geometry("300x180")
+    root.geometry("300x240")
     root.resizable(False, False)
     root.wm_attributes("-topmost", True)
 
@@ -230,6 +356,10 @@ def show_start_form():
     speed_entry.insert(0, "400")
     speed_entry.pack()
 
+    tk.Label(root, text="Движение цели:").pack(pady=5)
+    motion = tk.StringVar(root, TARGET_MOTION)
+    tk.OptionMenu(root, motion, "keyboard", *TRAJECTORY_KINDS).pack()
+
     def on_launch():
         try:
             distance_m = float(dist_entry.get())
@@ -240,16 +370,44 @@ def show_start_form():
             tk.messagebox.showerror("Ошибка", "Введите корректные числа!")
             return
 
-        global TOTAL_TIME, START_TIME, RUNNING, MISSILE_SPEED_MPS
+        global TOTAL_TIME, START_TIME, RUNNING, MISSILE_SPEED_MPS, detection_worker, target_path, profiler
         MISSILE_SPEED_MPS = speed_kmh * 1000 / 3600
         TOTAL_TIME = distance_m / MISSILE_SPEED_MPS
-        START_TIME = time.time()
+        START_TIME = time.perf_counter()
         RUNNING = True
+        if motion.get() == "keyboard":
+            target_path = None
+        else:
+            # Траектория начинается в текущей позиции цели и не уходит за край экрана
+            screen = (TARGET_SIZE, TARGET_SIZE,
+                      root.winfo_screenwidth() - TARGET_SIZE, root.winfo_screenheight() - TARGET_SIZE)
+            target_path = random_trajectory(motion.get(), TARGET_SEED, start=(TARGET_X, TARGET_Y), bounds=screen)
+
+        capture = get_capture()
+        capture.tracking = TRACKING_CAPTURE
+        capture.reset_tracking()
+        tracks.reset()
+        display_latency.reset()
+        capture_latency.reset()
+        render_time.reset()
+        tick_rate.reset()
+        guidance_rate.reset()
+        guidance_rate.interval = GUIDANCE_INTERVAL_MIN if ADAPTIVE_DETECTION else GUIDANCE_INTERVAL_MAX
+        if PROFILE_PHASES and not profiler.enabled:
+            profiler = new_profiler()
+        if BACKGROUND_DETECTION and DETECTION_PROCESSES > 0:
+            detection_worker = ProcessDetectionWorker(DETECTION_PROCESSES, GUIDANCE_INTERVAL_MIN,
+                                                      pyramid=DETECTION_PYRAMID,
+                                                      backend=DETECTION_BACKEND, profiler=profiler).start()
+        elif BACKGROUND_DETECTION:
+            detection_worker = DetectionWorker(GUIDANCE_INTERVAL_MIN, TRACKING_CAPTURE, DETECTION_PYRAMID,
+                                               DETECTION_BACKEND, MOTION_GATE, MULTI_TARGET,
+                                               profiler=profiler).start()
 
         root.destroy()
 
         # Создаём окно симуляции
-        global sim_window, canvas
+        global sim_window, canvas, scene
         sim_window = tk.Tk()
         sim_window.title("Наведение — цель")
         sim_window.attributes("-fullscreen", True)
@@ -257,10 +415,12 @@ def show_start_form():
 
         canvas = tk.Canvas(sim_window, bg="gray", highlightthickness=0)
         canvas.pack(fill="both", expand=True)
+        scene = RetainedCanvas(canvas)
 
         # Привязка клавиш
         sim_window.bind("<KeyPress>", on_key_press)
         sim_window.bind("<KeyRelease>", on_key_release)
+        sim_window.bind("<F3>", toggle_profile_hud)
 
         # Esc для выхода (только если не запущено)
         def on_escape(e):
@@ -277,4 +437,7 @@ def show_start_form():
 
 # === Запуск ===
 if __name__ == "__main__":
-    show_start_form()
\ No newline at end of file
+    try:
+        show_start_form()
+    finally:
+        export_profile()
\ No newline at end of file
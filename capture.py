@@ -0,0 +1,169 @@
+import time
+
+import mss
+
+from detection import wrap_screenshot
+
+# Параметры следящего захвата
+TRACK_MARGIN = 100  # px — запас окна вокруг последней позиции цели
+TRACK_MAX_MISSES = 5  # промахов подряд до возврата к полному экрану
+TRACK_MAX_LOOKAHEAD = 0.25  # сек — не растягиваем окно по старой скорости дольше
+
+
+# === Сессия захвата экрана (одна на процесс) ===
+# Создание mss.mss() дорогое, поэтому сессия живёт всё время работы программы.
+# Вместо mss можно передать любую сессию с тем же интерфейсом (monitors, grab,
+# close) — например, synthetic.SyntheticScreen для работы без экрана или
+# recording.ReplaySession. Если у сессии есть clock(), время захвата берётся из
+# него (у записи — записанное время кадра), иначе time.perf_counter.
+# Внутри одного тика кадр и результат поиска цели кэшируются: draw_all,
+# update_loop и update_guidance читают один и тот же снимок.
+class ScreenCapture:
+    def __init__(self, monitor_index=1, tracking=False, session=None):
+        self.sct = session if session is not None else mss.mss()
+        self.external = session is not None
+        self.monitor = self.sct.monitors[monitor_index]
+        self.clock = getattr(self.sct, "clock", time.perf_counter)
+        self.tick = 0
+        self.capture_time = None  # момент последнего захвата (time.perf_counter)
+        self.grab_seconds = 0.0  # сколько занял захват в текущем тике (сек, для профилирования)
+        self._frame = None
+        self._frame_tick = -1
+        self._target = None
+        self._target_tick = -1
+        self._targets = []
+        self._targets_tick = -1
+
+        # Следящий режим: захват только окна вокруг последней цели
+        self.tracking = tracking
+        self.region = None  # последнее окно захвата (в координатах монитора)
+        self.misses = 0
+        self._last_hit = None  # (x, y, t)
+        self._velocity = (0.0, 0.0)
+
+    # Новый тик — старые кадр и цель больше не действительны
+    def next_tick(self):
+        self.tick += 1
+        self.grab_seconds = 0.0
+
+    def grab(self, monitor=None):
+        self.capture_time = self.clock()
+        started = time.perf_counter()
+        frame = wrap_screenshot(self.sct.grab(monitor or self.monitor))
+        self.grab_seconds += time.perf_counter() - started
+        return frame
+
+    # Кадр текущего тика (захватывается один раз)
+    def frame(self):
+        if self._frame_tick != self.tick:
+            self._frame = self.grab()
+            self._frame_tick = self.tick
+        return self._frame
+
+    # Позиция цели в текущем тике (поиск выполняется один раз)
+    def target(self, detect):
+        if self._target_tick != self.tick:
+            try:
+                if self.tracking:
+                    self._target = self._track(detect)
+                else:
+                    self._target = detect(self.frame())
+            except Exception:
+                self._target = None
+            self._target_tick = self.tick
+        return self._target
+
+    # Все цели текущего тика. Следящий режим здесь не используется: окно
+    # строится вокруг одной цели, а остальные могут быть где угодно на экране.
+    def targets(self, detect_all):
+        if self._targets_tick != self.tick:
+            try:
+                self._targets = detect_all(self.frame())
+            except Exception:
+                self._targets = []
+            self._targets_tick = self.tick
+        return self._targets
+
+    def reset_tracking(self):
+        self.region = None
+        self.misses = 0
+        self._last_hit = None
+        self._velocity = (0.0, 0.0)
+
+    # Окно поиска: последняя позиция + сдвиг по скорости, размер — запас плюс путь цели
+    def _tracking_region(self, now):
+        x, y, t = self._last_hit
+        vx, vy = self._velocity
+        lookahead = min(now - t, TRACK_MAX_LOOKAHEAD)
+        cx = x + vx * lookahead
+        cy = y + vy * lookahead
+        half = TRACK_MARGIN + int(abs(vx) * lookahead + abs(vy) * lookahead)
+
+        width, height = self.monitor["width"], self.monitor["height"]
+        left = max(0, int(cx) - half)
+        top = max(0, int(cy) - half)
+        right = min(width, int(cx) + half)
+        bottom = min(height, int(cy) + half)
+        if right <= left or bottom <= top:
+            return None
+        return left, top, right - left, bottom - top
+
+    def _track(self, detect):
+        now = self.clock()
+        region = None
+        if self._last_hit is not None and self.misses < TRACK_MAX_MISSES:
+            region = self._tracking_region(now)
+
+        if region is None:
+            self.region = None
+            pos = detect(self.frame())
+        else:
+            self.region = region
+            left, top, width, height = region
+            roi = self.grab({
+                "left": self.monitor["left"] + left,
+                "top": self.monitor["top"] + top,
+                "width": width,
+                "height": height,
+            })
+            pos = detect(roi)
+            if pos is not None:
+                pos = (pos[0] + left, pos[1] + top)
+
+        if pos is None:
+            self.misses += 1
+            return None
+
+        now = self.capture_time
+        if self._last_hit is not None:
+            px, py, pt = self._last_hit
+            if now > pt:
+                self._velocity = ((pos[0] - px) / (now - pt), (pos[1] - py) / (now - pt))
+        self._last_hit = (pos[0], pos[1], now)
+        self.misses = 0
+        return pos
+
+    def close(self):
+        self.sct.close()
+
+
+_capture = None
+
+
+def get_capture():
+    global _capture
+    if _capture is None:
+        _capture = ScreenCapture()
+    return _capture
+
+
+# Общий захват на другой сессии (запись, воспроизведение) или снова на экране (None).
+# Прежний захват закрывается вместе со своей сессией (mss или подставленной)
+def set_capture_session(session=None):
+    global _capture
+    if session is None and _capture is not None and not _capture.external:
+        return _capture
+    if _capture is not None:
+        _capture.close()
+    _capture = ScreenCapture(session=session)
+    return _capture
@@ -0,0 +1,182 @@
+import math
+import sys
+import time
+
+import numpy as np
+
+# Как в simulation.py: радиус жёлтого кружка ракеты и сторона треугольника цели
+MISSILE_RADIUS = 12
+TARGET_SIZE = 60
+
+
+# Вершины треугольника цели с центром в centers (..., 2) -> (..., 3, 2);
+# те же, что у draw_all
+def target_triangles(centers, size=TARGET_SIZE):
+    centers = np.asarray(centers, dtype=np.float64)
+    h = size * np.sqrt(3) / 2
+    offsets = np.array([(0, -(size // 2)), (-(size // 2), h // 2), (size // 2, h // 2)], dtype=np.float64)
+    return centers[..., None, :] + offsets
+
+
+def _dot(u, v):
+    return u[..., 0] * v[..., 0] + u[..., 1] * v[..., 1]
+
+
+def _cross(u, v):
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+# Расстояние от точки p до отрезка ab
+def _point_segment(p, a, b):
+    ab = b - a
+    length2 = _dot(ab, ab)
+    s = np.clip(_dot(p - a, ab) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+    closest = a + ab * s[..., None]
+    return np.hypot(p[..., 0] - closest[..., 0], p[..., 1] - closest[..., 1])
+
+
+# Пересекаются ли отрезки p0p1 и ab (касание и наложение ловит расстояние до концов)
+def _segments_cross(p0, p1, a, b):
+    d = p1 - p0
+    e = b - a
+    w = a - p0
+    denom = _cross(d, e)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = _cross(w, e) / denom
+        u = _cross(w, d) / denom
+    return (denom != 0) & (s >= 0) & (s <= 1) & (u >= 0) & (u <= 1)
+
+
+# === Заметание: круг ракеты вдоль шага против треугольника цели ===
+# За шаг ракета проходит отрезок start → end, цель — target_start → target_end
+# (обе равномерно). В системе цели ракета проходит отрезок относительного движения
+# мимо неподвижного треугольника, поэтому быстрая ракета не проскакивает цель
+# между кадрами при любом dt.
+# Все аргументы транслируются numpy: позиции (..., 2), треугольники (..., 3, 2) —
+# один вызов проверяет залп против одной цели или тысячи боёв сразу.
+# Возвращает (hit, closest, fraction): попадание (круг radius коснулся треугольника),
+# наименьшее расстояние от центра ракеты до треугольника за шаг (0 — центр
+# внутри) и долю шага в момент первого касания (nan без попадания).
+def sweep(start, end, triangles, target_start=None, target_end=None, radius=MISSILE_RADIUS):
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    triangles = np.asarray(triangles, dtype=np.float64)
+    # Треугольник задан в начале шага: в его системе путь ракеты — end − сдвиг цели
+    if target_start is not None and target_end is not None:
+        end = end - (np.asarray(target_end, dtype=np.float64) - np.asarray(target_start, dtype=np.float64))
+
+    vertices = [triangles[..., i, :] for i in range(3)]
+    edges = [(vertices[i], vertices[(i + 1) % 3]) for i in range(3)]
+    centroid = (vertices[0] + vertices[1] + vertices[2]) / 3
+
+    # Ближайший подход: 0, если путь пересекает треугольник или начинается внутри,
+    # иначе минимум расстояний между отрезком пути и сторонами (расстояние до
+    # выпуклой фигуры вдоль отрезка выпукло, минимум — на концах отрезков)
+    sides = np.stack([_cross(b - a, start - a) for a, b in edges])
+    inside = np.all(sides >= 0, axis=0) | np.all(sides <= 0, axis=0)
+    crosses = inside
+    closest = None
+    for a, b in edges:
+        crosses = crosses | _segments_cross(start, end, a, b)
+        edge_closest = np.minimum(np.minimum(_point_segment(start, a, b), _point_segment(end, a, b)),
+                                  np.minimum(_point_segment(a, start, end), _point_segment(b, start, end)))
+        closest = edge_closest if closest is None else np.minimum(closest, edge_closest)
+    closest = np.where(crosses, 0.0, closest)
+    hit = closest <= radius
+
+    # Момент касания: первый выход пути на границу треугольника, раздутого на radius
+    # (внешние стороны, сдвинутые на radius, и круги вокруг вершин)
+    d = end - start
+    first = np.full(closest.shape, np.inf)
+    for a, b in edges:
+        e = b - a
+        length = np.hypot(e[..., 0], e[..., 1])
+        normal = np.stack((e[..., 1], -e[..., 0]), axis=-1) / np.where(length > 0, length, 1.0)[..., None]
+        normal = np.where((_dot(centroid - a, normal) > 0)[..., None], -normal, normal)
+        f0 = _dot(start - a, normal)
+        f1 = _dot(end - a, normal)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            s = (f0 - radius) / (f0 - f1)
+            along = _dot(start + d * s[..., None] - a, e) / (length * length)
+        valid = (f0 >= radius) & (f1 < radius) & (s >= 0) & (s <= 1) & (along >= 0) & (along <= 1)
+        first = np.where(valid, np.minimum(first, s), first)
+
+    dd = _dot(d, d)
+    for vertex in vertices:
+        w = start - vertex
+        b = _dot(w, d)
+        c = _dot(w, w) - radius * radius
+        discriminant = b * b - dd * c
+        with np.errstate(divide="ignore", invalid="ignore"):
+            s = (-b - np.sqrt(np.maximum(discriminant, 0.0))) / dd
+        valid = (discriminant >= 0) & (dd > 0) & (s >= 0) & (s <= 1)
+        first = np.where(valid, np.minimum(first, s), first)
+
+    # Круг уже касался цели в начале шага
+    start_closest = np.minimum.reduce([_point_segment(start, a, b) for a, b in edges])
+    first = np.where(inside | (start_closest <= radius), 0.0, first)
+    fraction = np.where(hit, np.where(np.isfinite(first), first, 0.0), np.nan)
+    return hit, closest, fraction
+
+
+# === Быстрый отсев для одного шага (без numpy) ===
+# Круг ракеты может коснуться цели, только если путь в системе цели подходит к её
+# центру ближе радиуса описанной окружности треугольника плюс radius. Такая
+# проверка стоит пары микросекунд, поэтому точный sweep вызывается лишь на шагах
+# рядом с целью.
+def may_hit(start, end, target_start, target_end, radius=MISSILE_RADIUS, size=TARGET_SIZE):
+    half = size // 2
+    bound = max(half, math.hypot(half, size * math.sqrt(3) / 2 // 2)) + radius
+    x0 = start[0] - target_start[0]
+    y0 = start[1] - target_start[1]
+    dx = end[0] - target_end[0] - x0
+    dy = end[1] - target_end[1] - y0
+    length2 = dx * dx + dy * dy
+    s = -(x0 * dx + y0 * dy) / length2 if length2 > 0 else 0.0
+    s = 0.0 if s < 0.0 else 1.0 if s > 1.0 else s
+    return math.hypot(x0 + dx * s, y0 + dy * s) <= bound
+
+
+# === Проверка и замер: python collision.py [число шагов] ===
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = np.random.default_rng(0)
+    start = rng.uniform(-150, 150, (count, 2))
+    end = start + rng.uniform(-120, 120, (count, 2))
+    target_start = rng.uniform(-20, 20, (count, 2))
+    target_end = target_start + rng.uniform(-8, 8, (count, 2))
+    triangles = target_triangles(target_start)
+
+    started = time.perf_counter()
+    hit, closest, fraction = sweep(start, end, triangles, target_start, target_end)
+    elapsed = time.perf_counter() - started
+    print(f"{count} шагов за {elapsed * 1000:.1f} мс ({elapsed / count * 1e6:.2f} мкс на шаг), "
+          f"попаданий {hit.mean():.1%}")
+
+    # Сверка с плотной выборкой точек по шагу (на части шагов)
+    check = min(count, 2000)
+    samples = np.linspace(0.0, 1.0, 2001)
+    worst_closest = worst_fraction = 0.0
+    for i in range(check):
+        path = start[i] + (end[i] - start[i] - (target_end[i] - target_start[i])) * samples[:, None]
+        a, b, c = triangles[i]
+        sides = np.stack([_cross(q - p, path - p) for p, q in ((a, b), (b, c), (c, a))])
+        inside = np.all(sides >= 0, axis=0) | np.all(sides <= 0, axis=0)
+        distance = np.where(inside, 0.0, np.minimum.reduce(
+            [_point_segment(path, p, q) for p, q in ((a, b), (b, c), (c, a))]))
+        worst_closest = max(worst_closest, abs(distance.min() - closest[i]))
+        touching = np.flatnonzero(distance <= MISSILE_RADIUS)
+        if touching.size and hit[i]:
+            worst_fraction = max(worst_fraction, abs(samples[touching[0]] - fraction[i]))
+        assert hit[i] == (distance.min() <= MISSILE_RADIUS) or abs(distance.min() - MISSILE_RADIUS) < 0.2
+    print(f"Отличие от выборки: ближайший подход {worst_closest:.3f} px, момент касания {worst_fraction:.4f} шага")
+    assert worst_closest < 0.2 and worst_fraction < 2e-3
+
+    # Отсев не теряет попаданий
+    rejected = np.array([not may_hit(start[i], end[i], target_start[i], target_end[i]) for i in range(count)])
+    print(f"Отсеяно без точной проверки: {rejected.mean():.1%} шагов, из них попаданий {hit[rejected].sum()}")
+    assert not hit[rejected].any()
+
+    # Проскок: точечная проверка в конце шага против заметания
+    fast = sweep([[-200, 0]], [[200, 0]], target_triangles([[0, 0]]))
+    print(f"Ракета пролетает цель за один шаг: попадание {bool(fast[0][0])}, касание на {fast[2][0]:.3f} шага")
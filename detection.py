@@ -0,0 +1,386 @@
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Параметры поиска треугольника
+MIN_AREA = 200  # px² — меньшие пятна отбрасываются
+DARK_THRESHOLD = 126  # пиксели с яркостью <= порога считаются тёмными
+MAX_EXTENT = 0.85  # доля рамки, закрытая пятном, выше которой пятно не треугольник
+
+KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+# Первый проход пирамиды: глубина открытия по уменьшению (2 эрозии на полном
+# кадре — 1 при уменьшении в 2 раза, без открытия при 4 и больше) и запас отсева
+COARSE_OPENING = {2: 1}
+COARSE_AREA_SLACK = 0.5  # доля площади MIN_AREA / scale², ниже которой пятно отбрасывается
+REFINE_MARGIN = 4  # px — открытие (2 эрозии + 2 дилатации ядром 3×3) видит на 4 px вокруг
+
+
+# === Кадр mss без копирования ===
+# np.array(sct.grab(...)) копирует весь снимок; здесь берём вид на сырой буфер BGRA.
+def wrap_screenshot(shot):
+    return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+
+# === Проверка контуров: треугольники, прошедшие фильтры ===
+# Выдаёт (cx, cy, boundingRect) в порядке контуров.
+# bounds=(left, top, right, bottom) — рамка контура должна лежать внутри
+# (пятна, обрезанные краем окна поиска, отбрасываются).
+def triangle_candidates(contours, min_area=MIN_AREA, bounds=None):
+    for cx, cy, rect, _ in _triangles(contours, min_area, bounds):
+        yield cx, cy, rect
+
+
+# То же и начальная точка контура (x, y): верхний левый пиксель пятна.
+# findContours отдаёт контуры по убыванию (y, x) этой точки
+def _triangles(contours, min_area=MIN_AREA, bounds=None):
+    for cnt in contours:
+        area = cv2.contourArea(cnt)
+        if area < min_area:
+            continue
+        if bounds is not None and not _inside(cv2.boundingRect(cnt), bounds):
+            continue
+        perimeter = cv2.arcLength(cnt, True)
+        approx = cv2.approxPolyDP(cnt, 0.04 * perimeter, True)
+        if len(approx) == 3 and cv2.isContourConvex(approx):
+            x, y, w, h = cv2.boundingRect(cnt)
+            aspect_ratio = float(w) / h
+            if 0.5 < aspect_ratio < 2.0:
+                M = cv2.moments(cnt)
+                if M["m00"] != 0:
+                    cx = int(M["m10"] / M["m00"])
+                    cy = int(M["m01"] / M["m00"])
+                    yield cx, cy, (x, y, w, h), (int(cnt[0, 0, 0]), int(cnt[0, 0, 1]))
+
+
+def _inside(rect, bounds):
+    x, y, w, h = rect
+    left, top, right, bottom = bounds
+    return x >= left and y >= top and x + w <= right and y + h <= bottom
+
+
+# Первый треугольник, прошедший фильтры
+def match_triangle(contours, min_area=MIN_AREA):
+    for cx, cy, _ in triangle_candidates(contours, min_area):
+        return (cx, cy)
+    return None
+
+
+# === Поиск по статистике связных компонент ===
+# Один проход connectedComponentsWithStats даёт площадь и рамку всех пятен сразу;
+# отсев по площади и пропорциям делается масками NumPy, а контур и проверка
+# вершин строятся только для немногих выживших. Площадь в пикселях не меньше
+# площади контура, поэтому отсев по площади не теряет кандидатов; почти сплошные
+# пятна (доля рамки выше MAX_EXTENT) approxPolyDP всё равно не свёл бы к трём
+# вершинам. Итоговые проверки те же, что и в match_triangle.
+# Выдаёт центры треугольников в том же порядке, что и triangle_candidates.
+def triangle_components(binary, labels=None, min_area=MIN_AREA, bounds=None):
+    for cx, cy, _ in _components(binary, labels, min_area, bounds):
+        yield cx, cy
+
+
+# То же и начальная точка контура (как у _triangles)
+def _components(binary, labels=None, min_area=MIN_AREA, bounds=None):
+    # CCL_GRANA (блочный алгоритм) заметно быстрее алгоритма по умолчанию для 8-связности
+    count, labels, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(
+        binary, 8, cv2.CV_32S, cv2.CCL_GRANA, labels=labels)
+    if count <= 1:
+        return
+    stats = stats[1:]
+    w = stats[:, cv2.CC_STAT_WIDTH]
+    h = stats[:, cv2.CC_STAT_HEIGHT]
+    area = stats[:, cv2.CC_STAT_AREA]
+    keep = (area >= min_area) & (w > 0.5 * h) & (w < 2.0 * h) & (area < MAX_EXTENT * w * h)
+    if bounds is not None:
+        left, top, right, bottom = bounds
+        x = stats[:, cv2.CC_STAT_LEFT]
+        y = stats[:, cv2.CC_STAT_TOP]
+        keep &= (x >= left) & (y >= top) & (x + w <= right) & (y + h <= bottom)
+
+    # Метки идут в порядке развёртки сверху вниз, а findContours отдаёт контуры
+    # в обратном порядке — обходим так же, чтобы первый найденный совпадал
+    for index in np.flatnonzero(keep)[::-1]:
+        x, y, w, h = stats[index, :4]
+        # Маска одной компоненты с рамкой в 1 пиксель, чтобы контур не касался края
+        component = np.zeros((h + 2, w + 2), dtype=np.uint8)
+        component[1:-1, 1:-1] = labels[y:y + h, x:x + w] == index + 1
+        contours, _ = cv2.findContours(component, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                       offset=(int(x) - 1, int(y) - 1))
+        for cx, cy, _, start in _triangles(contours, min_area):
+            yield cx, cy, start
+            break
+
+
+def match_triangle_components(binary, labels=None, min_area=MIN_AREA):
+    for pos in triangle_components(binary, labels, min_area):
+        return pos
+    return None
+
+
+# === Поиск треугольника ===
+def find_triangle(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    inv_gray = cv2.bitwise_not(gray)
+    _, thresh = cv2.threshold(inv_gray, 128, 255, cv2.THRESH_BINARY)
+    thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, KERNEL, iterations=2)
+
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return match_triangle(contours)
+
+
+# === Пропуск неизменившихся кадров ===
+# Кадр прореживается в step раз по каждой оси (INTER_NEAREST — дешевле всего)
+# и сравнивается с предыдущим по максимальной разнице яркости. Если разница
+# не больше threshold, кадр считается тем же и результат поиска переиспользуется.
+class MotionGate:
+    def __init__(self, step=4, threshold=16):
+        self.step = step
+        self.threshold = threshold
+        self.hits = 0  # кадры, для которых поиск пропущен
+        self.misses = 0  # кадры, для которых поиск выполнен
+        self._small = None
+        self._prev = None
+        self._has_prev = False
+
+    def changed(self, frame):
+        height = max(1, frame.shape[0] // self.step)
+        width = max(1, frame.shape[1] // self.step)
+        shape = (height, width) + frame.shape[2:]
+        if self._small is None or self._small.shape != shape:
+            self._small = np.empty(shape, dtype=np.uint8)
+            self._prev = np.empty(shape, dtype=np.uint8)
+            self._has_prev = False
+
+        cv2.resize(frame, (width, height), dst=self._small, interpolation=cv2.INTER_NEAREST)
+        changed = not self._has_prev or cv2.norm(self._small, self._prev, cv2.NORM_INF) > self.threshold
+        self._small, self._prev = self._prev, self._small
+        self._has_prev = True
+
+        if changed:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return changed
+
+    def reset(self):
+        self._has_prev = False
+
+
+# === Детектор с заранее выделенными буферами ===
+# Те же центры, что и find_triangle, но без временных массивов на каждый кадр:
+# инверсия и порог сведены в один THRESH_BINARY_INV (255 - g > 128  <=>  g <= 126),
+# ядро общее, а буферы растут только при увеличении размера кадра
+# (для окон разного размера используются их виды).
+#
+# backend выбирает способ разбора маски: "contours" (findContours и проверка
+# каждого контура) или "components" (match_triangle_components).
+#
+# detect() возвращает первый найденный треугольник, detect_all() — все.
+# Один детектор рассчитан на один из этих режимов: кэш прошлого результата общий.
+#
+# motion_gate=True пропускает поиск на кадрах, не изменившихся с прошлого вызова
+# (см. MotionGate), и возвращает прошлый результат.
+#
+# pyramid > 1 (степень двойки) включает поиск «от грубого к точному»: первый проход
+# идёт по кадру, уменьшенному в pyramid раз, затем центр уточняется в полном
+# разрешении только внутри рамки найденного кандидата. Уточнение даёт тот же
+# центр, что и поиск по всему кадру: маска считается с запасом REFINE_MARGIN, а
+# пятна, задевшие край окна (не край кадра), отбрасываются — в полном кадре это
+# другое, более крупное пятно.
+class TriangleDetector:
+    def __init__(self, width=0, height=0, pyramid=1, backend="contours", motion_gate=False):
+        if backend not in ("contours", "components"):
+            raise ValueError(f"Неизвестный способ поиска: {backend}")
+        self.pyramid = pyramid
+        self.backend = backend
+        self.gate = MotionGate() if motion_gate else None
+        self.last = None  # результат последнего выполненного поиска
+        self.last_all = []
+        self.coarse = None  # грубая позиция последнего поиска (в пикселях кадра)
+        self._buffers = {}
+        for name in ("gray", "binary", "eroded"):
+            self._buffer(name, height, width)
+
+    # Буфер растёт только при увеличении кадра; наружу отдаётся вид нужного размера
+    def _buffer(self, name, height, width, channels=None, dtype=np.uint8):
+        shape = (height, width) if channels is None else (height, width, channels)
+        buf = self._buffers.get(name)
+        if buf is None or height > buf.shape[0] or width > buf.shape[1]:
+            if buf is not None:
+                shape = (max(height, buf.shape[0]), max(width, buf.shape[1])) + shape[2:]
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        return buf[:height, :width]
+
+    # Бинарная маска тёмных пятен после морфологического открытия.
+    # Кадр — BGRA, BGR или уже серый (height, width), например из записи.
+    # iterations — глубина открытия (на уменьшенном кадре меньше: пятно там мельче)
+    def mask(self, frame, prefix="", iterations=2):
+        height, width = frame.shape[:2]
+        binary = self._buffer(prefix + "binary", height, width)
+        eroded = self._buffer(prefix + "eroded", height, width)
+
+        if frame.ndim == 2:
+            gray = frame
+        else:
+            gray = self._buffer(prefix + "gray", height, width)
+            code = cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+            cv2.cvtColor(frame, code, dst=gray)
+        cv2.threshold(gray, DARK_THRESHOLD, 255, cv2.THRESH_BINARY_INV, dst=binary)
+        # MORPH_OPEN с iterations=2 — это две эрозии, затем две дилатации
+        if iterations > 0:
+            cv2.erode(binary, KERNEL, dst=eroded, iterations=iterations)
+            cv2.dilate(eroded, KERNEL, dst=binary, iterations=iterations)
+        return binary
+
+    def detect(self, frame):
+        if self.gate is not None and not self.gate.changed(frame):
+            return self.last
+        if self.pyramid > 1:
+            self.coarse, self.last = self.detect_pyramid(frame)
+        else:
+            self.last = self._match(self.mask(frame))
+        return self.last
+
+    # Все треугольники кадра (список центров в порядке контуров)
+    def detect_all(self, frame):
+        if self.gate is not None and not self.gate.changed(frame):
+            return self.last_all
+        if self.pyramid > 1:
+            self.last_all = self._pyramid_all(frame)
+        else:
+            self.last_all = [(cx, cy) for cx, cy, _ in self._candidates(self.mask(frame))]
+        self.last = self.last_all[0] if self.last_all else None
+        return self.last_all
+
+    # Треугольники на бинарной маске выбранным способом: (cx, cy, начальная точка контура)
+    def _candidates(self, binary, bounds=None):
+        if self.backend == "components":
+            height, width = binary.shape
+            labels = self._buffer("labels", height, width, dtype=np.int32)
+            yield from _components(binary, labels, bounds=bounds)
+            return
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for cx, cy, _, start in _triangles(contours, bounds=bounds):
+            yield cx, cy, start
+
+    # Первый треугольник на бинарной маске
+    def _match(self, binary):
+        for cx, cy, _ in self._candidates(binary):
+            return cx, cy
+        return None
+
+    # Рамки кандидатов первого прохода в полном разрешении: (грубый центр, рамка).
+    # На уменьшенном кадре треугольник слишком мал для approxPolyDP, поэтому
+    # кандидаты отбираются только по площади, а проверка формы выполняется уже
+    # в полном разрешении. Отсев здесь мягче окончательного: открытие слабее
+    # (полное стёрло бы треугольник у нижней границы MIN_AREA), порог площади —
+    # с запасом на размытие краёв при уменьшении, а пропорции не проверяются:
+    # тонкая линия, которую открытие в полном кадре стирает, здесь может слиться
+    # с треугольником. Лишний кандидат стоит только уточнения, потерянный — пропуск цели.
+    def _coarse_regions(self, frame):
+        height, width = frame.shape[:2]
+        # Уменьшаем последовательными делениями пополам: INTER_AREA с коэффициентом 2
+        # идёт по быстрому пути и заметно дешевле одного большого шага
+        small = frame
+        scale = 1
+        while scale < self.pyramid:
+            level = self._buffer(f"level{scale}", small.shape[0] // 2, small.shape[1] // 2,
+                                 frame.shape[2] if frame.ndim == 3 else None)
+            cv2.resize(small, (level.shape[1], level.shape[0]), dst=level, interpolation=cv2.INTER_AREA)
+            small = level
+            scale *= 2
+        binary = self.mask(small, prefix="small_", iterations=COARSE_OPENING.get(scale, 0))
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        min_area = COARSE_AREA_SLACK * MIN_AREA / (scale * scale)
+        pad = 2 * scale + 8  # запас на размытие краёв и морфологию
+        for cnt in contours:
+            if cv2.contourArea(cnt) < min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(cnt)
+            M = cv2.moments(cnt)
+            coarse = None
+            if M["m00"] != 0:
+                coarse = (int(M["m10"] / M["m00"] * scale), int(M["m01"] / M["m00"] * scale))
+            left = max(0, x * scale - pad)
+            top = max(0, y * scale - pad)
+            right = min(width, (x + w) * scale + pad)
+            bottom = min(height, (y + h) * scale + pad)
+            yield coarse, (left, top, right, bottom)
+
+    # Треугольники окна кандидата в координатах кадра: (порядок, центр). Маска считается по окну,
+    # расширенному на REFINE_MARGIN: на таком расстоянии от края открытие уже не
+    # зависит от того, что за краем. Пятно должно лежать внутри этой точной части
+    # с зазором в пиксель (иначе оно продолжается за окном); у края кадра зазор не нужен.
+    def _refine(self, frame, region):
+        left, top, right, bottom = region
+        height, width = frame.shape[:2]
+        left, top = max(0, left - REFINE_MARGIN), max(0, top - REFINE_MARGIN)
+        right, bottom = min(width, right + REFINE_MARGIN), min(height, bottom + REFINE_MARGIN)
+        edge = REFINE_MARGIN + 1
+        bounds = (edge if left > 0 else 0, edge if top > 0 else 0,
+                  right - left - (edge if right < width else 0), bottom - top - (edge if bottom < height else 0))
+        for cx, cy, (sx, sy) in self._candidates(self.mask(frame[top:bottom, left:right]), bounds):
+            yield (sy + top, sx + left), (cx + left, cy + top)
+
+    # Возвращает (грубая позиция, уточнённая позиция); любая может быть None.
+    # Порядок грубых пятен не совпадает с порядком контуров полного кадра, поэтому
+    # первым берётся тот треугольник, что нашёл бы поиск по всему кадру (наибольшая
+    # начальная точка контура). Окна перебираются снизу вверх: как только нижний
+    # край окна выше лучшей найденной точки, остальные окна её уже не превзойдут
+    def detect_pyramid(self, frame):
+        best = None
+        for coarse, region in sorted(self._coarse_regions(frame), key=lambda item: -item[1][3]):
+            if best is not None and region[3] <= best[0][0]:
+                break
+            for order, pos in self._refine(frame, region):
+                if best is None or order > best[0]:
+                    best = (order, coarse, pos)
+        if best is None:
+            return None, None
+        return best[1], best[2]
+
+    def _pyramid_all(self, frame):
+        found = {}
+        for _, region in self._coarse_regions(frame):
+            # Рамки соседних кандидатов могут перекрываться
+            found.update(self._refine(frame, region))
+        return [found[order] for order in sorted(found, reverse=True)]
+
+
+# === Проверка пирамиды: python detection.py [кадров на размер] ===
+# Пирамида (2 и 4, оба способа разбора) должна находить то же, что find_triangle
+# и поиск по всему кадру, для треугольников от 25 px (у границы MIN_AREA) до 60 px
+# на кадрах с шумом и помехами (линии, круги, прямоугольники рядом с целью)
+if __name__ == "__main__":
+    from synthetic import SyntheticScreen
+
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    rng = np.random.default_rng(0)
+    detectors = {(pyramid, backend): TriangleDetector(pyramid=pyramid, backend=backend)
+                 for pyramid in (1, 2, 4) for backend in ("contours", "components")}
+    elapsed = dict.fromkeys(detectors, 0.0)
+    mismatches = dict.fromkeys(detectors, 0)
+    total = found = 0
+    for size in range(25, 61, 5):
+        for i in range(frames):
+            screen = SyntheticScreen(size=size, noise=6.0, clutter=150, seed=i)
+            screen.set_targets(rng.integers((0, 0), (1920, 1080), (2, 2)))
+            frame = screen.render()
+            expected = find_triangle(frame)
+            expected_all = detectors[1, "contours"].detect_all(frame)
+            total += 1
+            found += expected is not None
+            for key, detector in detectors.items():
+                started = time.perf_counter()
+                pos = detector.detect(frame)
+                elapsed[key] += time.perf_counter() - started
+                mismatches[key] += pos != expected or detector.detect_all(frame) != expected_all
+    print(f"{total} кадров (стороны 25–60 px), find_triangle нашёл цель в {found}")
+    for (pyramid, backend), count in mismatches.items():
+        print(f"  пирамида {pyramid}, {backend:10s}: {elapsed[pyramid, backend] / total * 1000:.2f} мс на кадр, "
+              f"расхождений {count}")
+    assert not any(mismatches.values())
@@ -0,0 +1,282 @@
+import math
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from collision import MISSILE_RADIUS, TARGET_SIZE, may_hit, sweep, target_triangles
+from guidance import FINAL_APPROACH_TIME, lead_point
+from missile import MAX_MISSILE_SPEED, step_missile
+from timing import TickScheduler, adaptive_interval
+from tracking import TRACK_HISTORY, TrackManager
+from trajectories import TRAJECTORY_KINDS, Trajectory, random_trajectory
+
+# Параметры по умолчанию — те же, что в simulation.py
+UPDATE_INTERVAL = 0.008  # сек — шаг физики (тик цикла Tk)
+GUIDANCE_INTERVAL_MIN = UPDATE_INTERVAL  # сек — самый частый поиск цели
+GUIDANCE_INTERVAL_MAX = 0.1  # сек — самый редкий
+MOVE_SPEED = 4  # px за тик при зажатой клавише
+TRACK_POLICY = "nearest"
+
+# Колонки траектории
+TRAJECTORY_COLUMNS = ("t", "target_x", "target_y", "missile_x", "missile_y", "aim_x", "aim_y")
+
+# Итог боя: промах (px) в момент взрыва, траектория (n, 7), число шагов, время взрыва
+# (при попадании — момент касания), попадание и ближайший подход ракеты к треугольнику цели (px)
+EngagementResult = namedtuple("EngagementResult", ["miss_distance", "trajectory", "steps", "time", "hit", "closest"])
+
+
+# Время полёта до взрыва по данным стартовой формы
+def flight_time(distance_m, speed_kmh):
+    return distance_m / (speed_kmh * 1000 / 3600)
+
+
+# === Движение цели с клавиатуры ===
+# keys — по одному набору зажатых клавиш ("Up", "Down", "Left", "Right") на тик,
+# как key_state в simulation.py. Возвращает позиции цели по тикам (n, 2).
+def keyboard_path(start, keys, move_speed=MOVE_SPEED):
+    steps = np.zeros((len(keys), 2))
+    for i, pressed in enumerate(keys):
+        steps[i, 0] = move_speed * (("Right" in pressed) - ("Left" in pressed))
+        steps[i, 1] = move_speed * (("Down" in pressed) - ("Up" in pressed))
+    return np.asarray(start, dtype=np.float64) + np.cumsum(steps, axis=0)
+
+
+# === Бой без окон с фиксированным шагом ===
+# Та же логика, что в update_loop simulation.py, но состояние хранится в объекте,
+# время — модельное (шаг dt), а цель «обнаруживается» точно в своей позиции
+# (или через detect(pos, t) -> список позиций). Порядок действий тика совпадает
+# с интерактивным: движение цели, поиск и упреждение по расписанию, шаг ракеты.
+# Взрыв — на первом тике наведения после истечения времени полёта или сразу при
+# попадании: круг ракеты (radius) за шаг коснулся треугольника цели (collision.sweep).
+# Параметры наведения (агрессивность и пределы ускорения ракеты, длина истории
+# трека и шум манёвра фильтра Калмана, фиксированное упреждение) по умолчанию —
+# значения модулей.
+# target_path — позиции цели по тикам (n, 2) (после последней цель стоит),
+# функция path(t) -> (x, y) модельного времени или траектория из trajectories.py
+# (её позиции на все тики считаются заранее одним вызовом).
+class Engagement:
+    def __init__(self, target_path, missile=(600, 400), total_time=10.0, dt=UPDATE_INTERVAL,
+                 guidance_min=GUIDANCE_INTERVAL_MIN, guidance_max=GUIDANCE_INTERVAL_MAX, adaptive=True,
+                 solver=True, policy=TRACK_POLICY, latency=0.0, detect=None, history=TRACK_HISTORY,
+                 final_approach_time=FINAL_APPROACH_TIME, aggressiveness=None, max_acceleration=None,
+                 max_deceleration=None, radius=MISSILE_RADIUS, target_size=TARGET_SIZE, stop_on_hit=True,
+                 process_noise=None):
+        self.target_path = target_path
+        self.total_time = total_time
+        self.dt = dt
+        self.guidance_min = guidance_min
+        self.guidance_max = guidance_max
+        self.adaptive = adaptive
+        self.solver = solver
+        self.policy = policy
+        self.latency = latency  # сек — упреждение на задержку захват → экран
+        self.detect = detect
+        self.final_approach_time = final_approach_time
+        self.limits = {"aggressiveness": aggressiveness, "max_acceleration": max_acceleration,
+                       "max_deceleration": max_deceleration}
+        self.radius = radius
+        self.target_size = target_size
+        self.stop_on_hit = stop_on_hit
+
+        self.tracks = TrackManager(history, process_noise=process_noise)
+        self.guidance = TickScheduler(guidance_min if adaptive else guidance_max)
+        self.step_count = 0
+        self.t = 0.0
+        self.missile = (float(missile[0]), float(missile[1]), 0.0, 0.0)  # x, y, vx, vy
+        self.aim = (int(missile[0]), int(missile[1]))
+        self.intercepting = False
+        self.exploded = False
+        self.hit = False
+        self.hit_time = None
+
+        self._samples = None
+        if isinstance(target_path, Trajectory):
+            self._samples = target_path.positions(np.arange(self._max_steps() + 1) * dt)
+        self.target = self._target_at(0, 0.0)
+
+    # Тиков до взрыва по времени (с запасом на интервал наведения)
+    def _max_steps(self):
+        return int(math.ceil(self.total_time / self.dt)) + int(math.ceil(self.guidance_max / self.dt)) + 1
+
+    def _target_at(self, step, t):
+        if self._samples is not None:
+            index = int(round(t / self.dt))
+            if index < len(self._samples):
+                x, y = self._samples[index]
+                return float(x), float(y)
+        if callable(self.target_path):
+            x, y = self.target_path(t)
+            return float(x), float(y)
+        path = self.target_path
+        x, y = path[min(step, len(path) - 1)]
+        return float(x), float(y)
+
+    # Один тик; возвращает False после взрыва
+    def step(self):
+        if self.exploded:
+            return False
+        self.step_count += 1
+        self.t = self.step_count * self.dt
+        previous_target = self.target
+        self.target = self._target_at(self.step_count - 1, self.t)
+        x, y, vx, vy = self.missile
+
+        if self.guidance.due(self.t):
+            remaining = max(0.0, self.total_time - self.t)
+            if remaining <= 0:
+                self.exploded = True
+                return False
+
+            detections = [self.target] if self.detect is None else self.detect(self.target, self.t)
+            self.tracks.update(detections, self.t)
+            track = self.tracks.select(self.policy, (x, y))
+
+            if self.adaptive:
+                speed = math.hypot(*track.velocity()) if track is not None and track.samples >= 2 else None
+                self.guidance.interval = adaptive_interval(speed, remaining, self.guidance_min, self.guidance_max)
+
+            display_time = self.t + self.latency
+            aim = track.position_at(display_time) if track is not None else self.target
+            intercepting = False
+            if track is not None and track.samples >= 2:
+                remaining_at_display = max(0.0, self.total_time - display_time)
+                aim, intercepting = lead_point(aim, track.velocity(), (x, y), MAX_MISSILE_SPEED,
+                                               remaining_at_display, self.solver, self.final_approach_time)
+            self.aim = aim
+            self.intercepting = intercepting
+
+        self.missile = step_missile(x, y, vx, vy, self.aim[0], self.aim[1], self.dt, not self.intercepting,
+                                    **self.limits)
+
+        missile = self.missile[:2]
+        if not self.hit and may_hit((x, y), missile, previous_target, self.target, self.radius, self.target_size):
+            hit, _, fraction = sweep((x, y), missile, target_triangles(previous_target, self.target_size),
+                                     previous_target, self.target, self.radius)
+            if hit:
+                self.hit = True
+                self.hit_time = self.t - self.dt + float(fraction) * self.dt
+                if self.stop_on_hit:
+                    self.exploded = True
+        return True
+
+    @property
+    def miss_distance(self):
+        return math.hypot(self.missile[0] - self.target[0], self.missile[1] - self.target[1])
+
+    # Прогнать бой до взрыва (или max_steps тиков). Ближайший подход считается
+    # одним вызовом sweep по всем шагам траектории
+    def run(self, max_steps=None):
+        if max_steps is None:
+            max_steps = self._max_steps()
+        trajectory = np.empty((max_steps + 1, len(TRAJECTORY_COLUMNS)))
+        n = 0
+        trajectory[n] = (self.t, *self.target, self.missile[0], self.missile[1], *self.aim)
+        while n < max_steps and self.step():
+            n += 1
+            trajectory[n] = (self.t, *self.target, self.missile[0], self.missile[1], *self.aim)
+        trajectory = trajectory[:n + 1]
+
+        targets = trajectory[:, 1:3]
+        _, closest, _ = sweep(trajectory[:-1, 3:5], trajectory[1:, 3:5], target_triangles(targets[:-1], self.target_size),
+                              targets[:-1], targets[1:], self.radius)
+        closest = float(closest.min()) if n else math.nan
+        end_time = self.hit_time if self.hit else self.t
+        return EngagementResult(self.miss_distance, trajectory, self.step_count, end_time, self.hit, closest)
+
+
+# === Сверка с интерактивным циклом ===
+# update_loop из simulation.py прогоняется без окон на модельных часах: тот же
+# шаг dt, цель «обнаруживается» точно в своей позиции, задержка показа — ноль.
+# target_path — траектория (trajectories.py) или None и keys — клавиши по тикам.
+# Возвращает строки (t, target_x, target_y, missile_x, missile_y) до взрыва.
+def _interactive_run(target_path, total_time, dt=UPDATE_INTERVAL, keys=None, start=(800, 400)):
+    import types
+
+    import simulation
+
+    clock = [0.0]
+    source = types.SimpleNamespace(next_tick=lambda: None, capture_time=None)
+    replaced = {name: getattr(simulation, name) for name in
+                ("time", "draw_all", "update_overlay", "update_missile", "sim_window", "stop_detection",
+                 "target_source", "detect_targets")}
+    simulation.time = types.SimpleNamespace(perf_counter=lambda: clock[0])
+    simulation.draw_all = simulation.stop_detection = lambda: None
+    simulation.update_overlay = lambda x, y: None
+    simulation.update_missile = lambda *args, **kwargs: None
+    simulation.sim_window = types.SimpleNamespace(after=lambda ms, callback: None, unbind=lambda event: None)
+    simulation.target_source = lambda: source
+    simulation.detect_targets = lambda: [(simulation.TARGET_X, simulation.TARGET_Y)]
+
+    simulation.START_TIME, simulation.TOTAL_TIME, simulation.RUNNING = 0.0, total_time, True
+    simulation.MISSILE_X, simulation.MISSILE_Y, simulation.MISSILE_VX, simulation.MISSILE_VY = 600, 400, 0, 0
+    simulation.LAST_AIM_POINT, simulation.LAST_AIM_INTERCEPT = (600, 400), False
+    simulation.overlay_frozen = simulation.missile_frozen = simulation.target_hit = False
+    simulation.closest_approach = math.inf
+    simulation.salvo = None
+    simulation.TARGET_X, simulation.TARGET_Y = start
+    simulation.target_path = target_path
+    simulation.last_frame_time = 0.0
+    simulation.tracks.reset()
+    simulation.display_latency.reset()
+    simulation.guidance_rate.reset()
+    simulation.guidance_rate.interval = simulation.GUIDANCE_INTERVAL_MIN
+    rows = []
+    try:
+        while simulation.RUNNING:
+            clock[0] = (len(rows) + 1) * dt
+            source.capture_time = clock[0]
+            if keys is not None:
+                pressed = keys[min(len(rows), len(keys) - 1)]
+                simulation.key_state.update({name: name in pressed for name in simulation.key_state})
+            simulation.update_loop()
+            if simulation.RUNNING:
+                rows.append((clock[0], simulation.TARGET_X, simulation.TARGET_Y,
+                             simulation.MISSILE_X, simulation.MISSILE_Y))
+    finally:
+        for name, value in replaced.items():
+            setattr(simulation, name, value)
+    return np.array(rows)
+
+
+# === Замер скорости: python engine.py [число боёв] ===
+# Сначала — сверка с интерактивным update_loop на клавиатуре и каждом виде траектории
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    # В update_loop шаг тика — разность показаний часов; при dt = 8 мс она отличается
+    # от dt в последних знаках, и на пределе скорости ракеты это может переключить
+    # ветку разгон/торможение (доли пикселя). При dt = 2⁻⁷ с разности точные —
+    # траектории должны совпасть до бита.
+    rng = np.random.default_rng(1)
+    total_time = 4.0
+    for dt, tolerance in ((2 ** -7, 0.0), (UPDATE_INTERVAL, 0.1)):
+        # Набор зажатых клавиш меняется раз в 40 тиков
+        keys = [pressed for pressed in ({key for key in ("Up", "Down", "Left", "Right") if rng.random() < 0.4}
+                                        for _ in range(int(total_time / dt) // 40 + 2))
+                for _ in range(40)]
+        cases = [("keyboard", None, keyboard_path((1200, 200), keys))]
+        cases += [(kind, random_trajectory(kind, seed=0), None) for kind in TRAJECTORY_KINDS]
+        for name, path, keyboard in cases:
+            interactive = _interactive_run(path, total_time, dt, keys if path is None else None, (1200, 200))
+            result = Engagement(path if path is not None else keyboard, total_time=total_time, dt=dt).run()
+            n = min(len(interactive), len(result.trajectory) - 1)
+            worst = np.abs(interactive[:n] - result.trajectory[1:n + 1, :5]).max()
+            print(f"Сверка с update_loop ({name}, dt {dt * 1000:g} мс): {n} тиков, отличие {worst:.2e} px")
+            assert worst <= tolerance
+    misses = []
+    hits = 0
+    steps = 0
+    started = time.perf_counter()
+    for i in range(runs):
+        path = random_trajectory(TRAJECTORY_KINDS[i % len(TRAJECTORY_KINDS)], seed=i)
+        result = Engagement(path, total_time=10.0).run()
+        misses.append(result.closest)
+        hits += result.hit
+        steps += result.steps
+    elapsed = time.perf_counter() - started
+    print(f"{runs} боёв, {steps} шагов за {elapsed:.2f} с ({steps / elapsed:.0f} шагов/с, "
+          f"{steps * UPDATE_INTERVAL / elapsed:.0f}× быстрее реального времени)")
+    print(f"Попаданий {hits}/{runs}; ближайший подход: медиана {np.median(misses):.1f} px, "
+          f"максимум {np.max(misses):.1f} px")
@@ -0,0 +1,187 @@
+import json
+import mmap
+import os
+import sys
+import time
+
+import numpy as np
+
+# === Колонки бортового самописца ===
+# Одна строка на тик update_loop. Координаты и скорости — float32 (точность лучше
+# 0.001 px на экране), время — float64. Колонки наведения и обнаружения на тиках
+# без поиска цели — nan (guided=0): решение действует с последнего поиска.
+FLIGHT_COLUMNS = (
+    ("t", "<f8"),  # сек от старта
+    ("remaining", "<f4"),  # сек до взрыва
+    ("target_x", "<f4"), ("target_y", "<f4"),  # цель на экране
+    ("guided", "u1"),  # на этом тике был поиск цели и новое упреждение
+    ("capture_t", "<f4"),  # сек от старта — момент захвата кадра поиска (nan — кадра нет)
+    ("track_x", "<f4"), ("track_y", "<f4"),  # позиция цели по треку, от которой строится упреждение
+    ("aim_x", "<f4"), ("aim_y", "<f4"),  # точка прицеливания
+    ("intercepting", "u1"),  # точка встречи (1) или упреждение по времени (0)
+    ("pred_time", "<f4"),  # сек — выбранное упреждение по времени (nan при точке встречи)
+    ("missile_x", "<f4"), ("missile_y", "<f4"),
+    ("missile_vx", "<f4"), ("missile_vy", "<f4"),
+    ("missile_speed", "<f4"),
+)
+
+INITIAL_CAPACITY = 4096  # строк — около 30 сек полёта при тике 8 мс
+
+# === Формат файла ===
+# FLIGHT_MAGIC, длина заголовка (uint32) и заголовок JSON (колонки, число строк,
+# смещения, meta) — дополнены до 64 байт; дальше каждая колонка целиком, подряд,
+# тоже с выравниванием 64. Колонка читается как массив прямо из mmap.
+FLIGHT_MAGIC = b"MSLFLT01"
+ALIGNMENT = 64
+
+
+def _padding(size):
+    return -size % ALIGNMENT
+
+
+# === Запись полёта ===
+# Строки пишутся в заранее выделенный типизированный буфер (структурный массив
+# numpy); заполнился — ёмкость удваивается. Одна строка — одно присваивание
+# кортежа, около микросекунды, поэтому запись можно не выключать.
+# append(...) принимает значения в порядке FLIGHT_COLUMNS.
+class FlightRecorder:
+    def __init__(self, columns=FLIGHT_COLUMNS, capacity=INITIAL_CAPACITY, meta=None):
+        self.dtype = np.dtype(list(columns))
+        self.meta = dict(meta or {})
+        self.count = 0
+        self._buffer = np.empty(max(1, capacity), dtype=self.dtype)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self._buffer)
+
+    def append(self, *values):
+        if self.count == len(self._buffer):
+            self._grow()
+        self._buffer[self.count] = values
+        self.count += 1
+
+    def _grow(self):
+        buffer = np.empty(2 * len(self._buffer), dtype=self.dtype)
+        buffer[:self.count] = self._buffer[:self.count]
+        self._buffer = buffer
+
+    # Колонка записанных строк (представление буфера, без копии)
+    def column(self, name):
+        return self._buffer[name][:self.count]
+
+    def clear(self):
+        self.count = 0
+
+    # Сохранить по колонкам; файл появляется целиком (запись во временный и замена)
+    def dump(self, path):
+        names = self.dtype.names
+        columns = []
+        offset = 0
+        for name in names:
+            dtype = self.dtype[name]
+            columns.append({"name": name, "dtype": dtype.str, "offset": offset})
+            offset += self.count * dtype.itemsize
+            offset += _padding(offset)
+        header = json.dumps({"count": self.count, "columns": columns, "meta": self.meta}).encode()
+        start = len(FLIGHT_MAGIC) + 4 + len(header)
+        start += _padding(start)
+
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(FLIGHT_MAGIC)
+            f.write(np.uint32(len(header)).tobytes())
+            f.write(header)
+            f.write(bytes(start - (len(FLIGHT_MAGIC) + 4 + len(header))))
+            for name in names:
+                data = np.ascontiguousarray(self.column(name))
+                f.write(data.data)
+                f.write(bytes(_padding(data.nbytes)))
+        os.replace(temporary, path)
+        return path
+
+
+# === Чтение полёта ===
+# Файл отображается в память, колонка читается при первом обращении:
+# log["missile_x"] — массив прямо в mmap, остальные колонки не трогаются.
+class FlightLog:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if size < len(FLIGHT_MAGIC) + 4 or bytes(self._map[:8]) != FLIGHT_MAGIC:
+            raise ValueError(f"{path}: не файл записи полёта")
+        length = int(np.frombuffer(self._map, dtype="<u4", count=1, offset=8)[0])
+        header = json.loads(bytes(self._map[12:12 + length]))
+        start = 12 + length
+        self._start = start + _padding(start)
+        self.count = header["count"]
+        self.meta = header["meta"]
+        self._columns = {column["name"]: column for column in header["columns"]}
+        self._cache = {}
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def columns(self):
+        return tuple(self._columns)
+
+    def __getitem__(self, name):
+        data = self._cache.get(name)
+        if data is None:
+            column = self._columns[name]
+            data = np.frombuffer(self._map, dtype=column["dtype"], count=self.count,
+                                 offset=self._start + column["offset"])
+            self._cache[name] = data
+        return data
+
+    # Несколько колонок копией в памяти: dict имя -> массив (всё — без аргументов)
+    def load(self, *names):
+        return {name: np.array(self[name]) for name in names or self.columns}
+
+    def close(self):
+        self._cache.clear()
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+
+# === Замер: python flight.py [число тиков] ===
+# Цена строки на тик (как в update_loop: значения — числа Python) и размер файла
+if __name__ == "__main__":
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    recorder = FlightRecorder(meta={"total_time": ticks * 0.008})
+    nan = float("nan")
+    started = time.perf_counter()
+    for i in range(ticks):
+        t = i * 0.008
+        guided = i % 4 == 0
+        recorder.append(t, 10.0 - t, 900.0 + t, 300.0, guided, t - 0.01 if guided else nan,
+                        900.0 if guided else nan, 300.0 if guided else nan, 1000.0, 320.0, guided,
+                        nan, 600.0 + i, 400.0, 120.0, 4.0, 120.07)
+    elapsed = time.perf_counter() - started
+    print(f"{ticks} строк за {elapsed * 1000:.0f} мс ({elapsed / ticks * 1e6:.2f} мкс на тик), "
+          f"ёмкость {recorder.capacity}")
+
+    path = "flight.flt"
+    started = time.perf_counter()
+    recorder.dump(path)
+    elapsed = time.perf_counter() - started
+    print(f"Файл: {os.path.getsize(path) / 1e6:.2f} МБ ({os.path.getsize(path) / ticks:.0f} байт на тик), "
+          f"сохранение {elapsed * 1000:.1f} мс")
+
+    started = time.perf_counter()
+    log = FlightLog(path)
+    x = log["missile_x"]
+    elapsed = time.perf_counter() - started
+    same = all(np.array_equal(log[name], recorder.column(name), equal_nan=log[name].dtype.kind == "f")
+               for name in log.columns)
+    print(f"Открытие и одна колонка: {elapsed * 1000:.2f} мс; колонки совпадают: {same}; meta {log.meta}")
+    del x
+    log.close()
+    os.remove(path)
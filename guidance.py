@@ -0,0 +1,75 @@
+import numpy as np
+
+# Скорость ракеты, при которой задача перехвата вырождается в линейную (px/сек)
+SPEED_EPSILON = 1e-6
+
+# Упреждение по времени, когда перехват невозможен (цель быстрее ракеты)
+MAX_LEAD_TIME = 5.0  # сек — не упреждаем дальше
+FINAL_APPROACH_TIME = 1.5  # последние 1.5 сек — фиксированное упреждение
+FINAL_LEAD_TIME = 1.0
+
+
+# === Точка перехвата в замкнутой форме ===
+# Ракета из missile летит прямо со скоростью speed, цель из target движется
+# с постоянной скоростью velocity. Момент встречи t — наименьший неотрицательный
+# корень уравнения |p + v·t| = speed·t, где p = target − missile:
+#     (v·v − speed²)·t² + 2(p·v)·t + p·p = 0
+# Все аргументы транслируются numpy: позиции и скорости — массивы (..., 2),
+# speed — число или массив (...). Так за один вызов считаются перехваты
+# многих целей одной ракетой, одной цели многими ракетами или попарно.
+# Возвращает (t, point, ok): время перехвата (inf, если цель недостижима),
+# точку перехвата (текущая позиция цели, если перехват невозможен) и маску успеха.
+def intercept(missile, speed, target, velocity):
+    missile = np.asarray(missile, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    velocity = np.asarray(velocity, dtype=np.float64)
+    speed = np.asarray(speed, dtype=np.float64)
+
+    p = target - missile
+    a = np.einsum("...i,...i->...", velocity, velocity) - speed * speed
+    b = np.einsum("...i,...i->...", p, velocity)
+    c = np.einsum("...i,...i->...", p, p)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discriminant = b * b - a * c
+        root = np.sqrt(np.maximum(discriminant, 0.0))
+        near = (-b - root) / a
+        far = (-b + root) / a
+        # Скорости цели и ракеты равны: уравнение линейное, 2b·t + c = 0
+        linear = -c / (2 * b)
+
+    quadratic = np.abs(a) > SPEED_EPSILON
+    near = np.where(quadratic, near, linear)
+    far = np.where(quadratic, far, linear)
+    solvable = np.where(quadratic, discriminant >= 0, b < 0) | (c == 0)
+
+    near = np.where(near >= 0, near, np.inf)
+    far = np.where(far >= 0, far, np.inf)
+    t = np.where(c == 0, 0.0, np.minimum(near, far))
+    t = np.where(solvable, t, np.inf)
+    ok = np.isfinite(t)
+
+    lead = np.where(ok, t, 0.0)[..., None]
+    point = target + velocity * lead
+    return t, point, ok
+
+
+# === Упреждение по времени до взрыва ===
+# 🔑 КЛЮЧЕВОЕ ИЗМЕНЕНИЕ: последние 1.5 сек — фиксированное упреждение 1 сек
+def lead_time(remaining, final_approach_time=FINAL_APPROACH_TIME):
+    if remaining > final_approach_time:
+        return min(MAX_LEAD_TIME, remaining)
+    return FINAL_LEAD_TIME
+
+
+# === Точка прицеливания ===
+# Точка встречи, если она существует (solver=True), иначе прежнее упреждение
+# по времени до взрыва. Возвращает ((x, y) в целых пикселях, признак перехвата).
+def lead_point(target_pos, velocity, missile, speed, remaining, solver=True, final_approach_time=FINAL_APPROACH_TIME):
+    if solver:
+        _, point, ok = intercept(missile, speed, target_pos, velocity)
+        if ok:
+            return (int(point[0]), int(point[1])), True
+
+    pred_time = lead_time(remaining, final_approach_time)
+    return (int(target_pos[0] + velocity[0] * pred_time), int(target_pos[1] + velocity[1] * pred_time)), False
@@ -0,0 +1,159 @@
+import math
+import sys
+import time
+
+import numpy as np
+
+# Ограничения ракеты (ОЧЕНЬ АГРЕССИВНЫЕ)
+MAX_MISSILE_SPEED = 400.0  # px/сек (высокая)
+MAX_ACCELERATION = 300.0  # px/сек² (высокое ускорение)
+MAX_DECELERATION = 400.0  # px/сек² (очень высокое торможение)
+AGGRESSIVENESS = 1.5  # высокая агрессивность
+
+
+# === Один шаг полёта ракеты (ОЧЕНЬ АГРЕССИВНЫЙ) ===
+# Чистая функция: состояние (x, y, vx, vy) на входе и на выходе. Её используют
+# и интерактивная симуляция, и расчёт без окон (engine.py), поэтому при одинаковых
+# входных данных траектории совпадают.
+# brake=False — точка прицеливания является точкой встречи: ракета идёт к ней
+# на максимальной скорости, не тормозя на подлёте (иначе отстаёт от цели)
+# Ограничения можно переопределить (перебор параметров, sweep.py); None — значения модуля.
+def step_missile(x, y, vx, vy, aim_x, aim_y, dt, brake=True, aggressiveness=None, max_acceleration=None,
+                 max_deceleration=None, max_speed=None):
+    if aggressiveness is None:
+        aggressiveness = AGGRESSIVENESS
+    if max_acceleration is None:
+        max_acceleration = MAX_ACCELERATION
+    if max_deceleration is None:
+        max_deceleration = MAX_DECELERATION
+    if max_speed is None:
+        max_speed = MAX_MISSILE_SPEED
+
+    dx = aim_x - x
+    dy = aim_y - y
+    distance = math.sqrt(dx * dx + dy * dy)
+
+    if distance < 1.0:
+        return x, y, vx * 0.95, vy * 0.95
+
+    # ОЧЕНЬ АГРЕССИВНОЕ наведение: максимальная скорость почти сразу
+    desired_speed = min(max_speed, distance * aggressiveness) if brake else max_speed
+
+    dir_x = dx / distance
+    dir_y = dy / distance
+    desired_vx = dir_x * desired_speed
+    desired_vy = dir_y * desired_speed
+
+    # Высокое ускорение/торможение. Скорости сравниваются по квадратам: на пределе
+    # скорости они равны, и округление не должно решать, какая ветка выбрана.
+    # Длины везде — sqrt суммы квадратов, а не hypot: sqrt округляется одинаково
+    # в math и numpy, поэтому пакетная версия выбирает те же ветки
+    if desired_vx * desired_vx + desired_vy * desired_vy > vx * vx + vy * vy:
+        max_accel_this_frame = max_acceleration * dt
+    else:
+        max_accel_this_frame = max_deceleration * dt
+
+    dvx = desired_vx - vx
+    dvy = desired_vy - vy
+    dv = math.sqrt(dvx * dvx + dvy * dvy)
+
+    if dv > 0:
+        accel = min(dv, max_accel_this_frame)
+        vx += (dvx / dv) * accel
+        vy += (dvy / dv) * accel
+
+    # Ограничение максимальной скорости
+    current_speed = math.sqrt(vx * vx + vy * vy)
+    if current_speed > max_speed:
+        vx = (vx / current_speed) * max_speed
+        vy = (vy / current_speed) * max_speed
+
+    return x + vx * dt, y + vy * dt, vx, vy
+
+
+# === Шаг N ракет сразу (NumPy) ===
+# То же, что step_missile, но для массивов: pos и vel — (N, 2), обновляются на месте;
+# aim — (N, 2) или (2,), brake — bool или (N,). Ограничения можно задать массивами
+# (N,) — так за один прогон сравниваются разные AGGRESSIVENESS и пределы ускорения.
+# Порядок операций совпадает со скалярной версией, поэтому результаты совпадают
+# до последнего знака.
+def step_missiles(pos, vel, aim, dt, brake=True, aggressiveness=None, max_acceleration=None,
+                  max_deceleration=None, max_speed=None):
+    if aggressiveness is None:
+        aggressiveness = AGGRESSIVENESS
+    if max_acceleration is None:
+        max_acceleration = MAX_ACCELERATION
+    if max_deceleration is None:
+        max_deceleration = MAX_DECELERATION
+    if max_speed is None:
+        max_speed = MAX_MISSILE_SPEED
+
+    delta = aim - pos
+    distance = np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+    near = distance < 1.0
+
+    desired_speed = np.where(brake, np.minimum(max_speed, distance * aggressiveness), max_speed)
+    direction = delta / np.where(near, 1.0, distance)[:, None]
+    desired = direction * desired_speed[:, None]
+
+    speeding_up = (desired[:, 0] * desired[:, 0] + desired[:, 1] * desired[:, 1]
+                   > vel[:, 0] * vel[:, 0] + vel[:, 1] * vel[:, 1])
+    max_accel = np.where(speeding_up, max_acceleration, max_deceleration) * dt
+
+    dvel = desired - vel
+    dv = np.sqrt(dvel[:, 0] * dvel[:, 0] + dvel[:, 1] * dvel[:, 1])
+    moving = dv > 0
+    accel = np.minimum(dv, max_accel)
+    new_vel = vel + (dvel / np.where(moving, dv, 1.0)[:, None]) * np.where(moving, accel, 0.0)[:, None]
+
+    speed = np.sqrt(new_vel[:, 0] * new_vel[:, 0] + new_vel[:, 1] * new_vel[:, 1])
+    over = speed > max_speed
+    if over.any():
+        new_vel = np.where(over[:, None], (new_vel / np.where(over, speed, 1.0)[:, None]) * np.reshape(
+            np.broadcast_to(max_speed, speed.shape), (-1, 1)), new_vel)
+
+    # Возле точки прицеливания — только затухание скорости, без перемещения
+    np.copyto(vel, np.where(near[:, None], vel * 0.95, new_vel))
+    pos += np.where(near[:, None], 0.0, vel * dt)
+    return pos, vel
+
+
+# === Проверка и замер: python missile.py [число ракет] [число шагов] ===
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    dt = 0.008
+    rng = np.random.default_rng(0)
+    start = rng.uniform(0, 1500, (count, 2))
+    target = rng.uniform(0, 1500, (count, 2))
+    target_velocity = rng.uniform(-200, 200, (count, 2))
+    brake = rng.random(count) < 0.5
+
+    # Совпадение со скалярной версией (на части ракет)
+    check = min(count, 200)
+    pos, vel = start[:check].copy(), np.zeros((check, 2))
+    scalar = [(x, y, 0.0, 0.0) for x, y in start[:check]]
+    worst = 0.0
+    for i in range(steps):
+        aim = target[:check] + target_velocity[:check] * i * dt
+        step_missiles(pos, vel, aim, dt, brake[:check])
+        scalar = [step_missile(*state, aim[j, 0], aim[j, 1], dt, brake[j]) for j, state in enumerate(scalar)]
+        worst = max(worst, np.abs(pos - np.array([state[:2] for state in scalar])).max())
+    print(f"Отличие от скалярной версии: {worst:.2e} px за {steps} шагов ({check} ракет)")
+    assert worst < 1e-6
+
+    pos, vel = start.copy(), np.zeros((count, 2))
+    started = time.perf_counter()
+    for i in range(steps):
+        step_missiles(pos, vel, target + target_velocity * i * dt, dt, brake)
+    elapsed = time.perf_counter() - started
+    print(f"Пакет: {count} ракет × {steps} шагов за {elapsed:.2f} с — "
+          f"{elapsed / (count * steps) * 1e6:.3f} с на миллион ракето-шагов")
+
+    started = time.perf_counter()
+    scalar = [(x, y, 0.0, 0.0) for x, y in start[:check]]
+    for i in range(steps):
+        aim = target[:check] + target_velocity[:check] * i * dt
+        scalar = [step_missile(*state, aim[j, 0], aim[j, 1], dt, brake[j]) for j, state in enumerate(scalar)]
+    elapsed = time.perf_counter() - started
+    print(f"Скалярно: {elapsed / (check * steps) * 1e6:.3f} с на миллион ракето-шагов")
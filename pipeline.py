@@ -0,0 +1,337 @@
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import mss
+import numpy as np
+
+from capture import ScreenCapture
+from detection import TriangleDetector
+from timing import NULL_PROFILER
+
+# Результат поиска: позиция первой цели (или None), время захвата
+# (time.perf_counter() в момент захвата), номер кадра и позиции всех найденных целей
+Detection = namedtuple("Detection", ["pos", "timestamp", "seq", "targets"], defaults=[()])
+
+
+# === Почтовый ящик «последнее значение» ===
+# Писатель всегда перезаписывает значение, читатель никогда не ждёт.
+# Кадр, перезаписанный до того, как его прочитали, считается выброшенным.
+class LatestValue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self._unread = False
+        self.dropped = 0
+
+    def put(self, value):
+        with self._lock:
+            if self._unread:
+                self.dropped += 1
+            self._value = value
+            self._unread = True
+
+    # Последнее значение (или None) и признак того, что оно новое
+    def get(self):
+        with self._lock:
+            fresh = self._unread
+            self._unread = False
+            return self._value, fresh
+
+
+# === Фоновый поток захвата и поиска цели ===
+# OpenCV и mss отпускают GIL, поэтому захват не тормозит цикл Tk.
+# У потока своя сессия mss и свой детектор: их буферы не делятся между потоками.
+# Интерфейс совпадает с ScreenCapture (next_tick/target/targets), поэтому цикл Tk
+# читает результат так же, как при синхронном захвате.
+class DetectionWorker:
+    def __init__(self, interval=0.008, tracking=False, pyramid=1, backend="contours", motion_gate=False,
+                 multi=False, session=None, profiler=NULL_PROFILER):
+        self.interval = interval
+        self.profiler = profiler  # фазы grab и detect потока (timing.PhaseProfiler)
+        self.session = session  # вместо mss (например, synthetic.SyntheticScreen)
+        self.tracking = tracking
+        self.multi = multi  # искать все цели на полном кадре
+        self.detector = TriangleDetector(pyramid=pyramid, backend=backend, motion_gate=motion_gate)
+        self.mailbox = LatestValue()
+        self.processed = 0
+        self.detection = None  # последний результат, взятый циклом Tk
+        self.fresh = False  # пришёл ли он в текущем тике
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="detection", daemon=True)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    # Профилировщик можно сменить на ходу (F3 в simulation.py): поток берёт
+    # текущий в начале каждой итерации
+    def set_profiler(self, profiler):
+        self.profiler = profiler
+
+    # True — поток вышел. Иначе он ещё в захвате (grab воспроизведения в реальном
+    # времени спит до времени кадра, mss может подвиснуть): сессию кадров поток
+    # закрывает сам в finally, поэтому закрывать её снаружи нельзя
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+        return not self._thread.is_alive()
+
+    def _run(self):
+        capture = ScreenCapture(tracking=self.tracking, session=self.session)
+        seq = 0
+        try:
+            while not self._stop.is_set():
+                profiler = self.profiler
+                capture.next_tick()
+                started = time.perf_counter()
+                if self.multi:
+                    targets = tuple(capture.targets(self.detector.detect_all))
+                    pos = targets[0] if targets else None
+                else:
+                    pos = capture.target(self.detector.detect)
+                    targets = (pos,) if pos is not None else ()
+                if profiler.enabled and capture.grab_seconds:
+                    profiler.add("grab", capture.grab_seconds)
+                    profiler.add("detect", time.perf_counter() - started - capture.grab_seconds)
+                if capture.capture_time is None:
+                    self._stop.wait(self.interval)
+                    continue
+                seq += 1
+                # Время захвата, а не окончания поиска: задержку поиска компенсирует прогноз
+                self.mailbox.put(Detection(pos, capture.capture_time, seq, targets))
+                self.processed += 1
+                self._stop.wait(self.interval)
+        finally:
+            capture.close()
+
+    # Забрать свежий результат из ящика (без ожидания)
+    def next_tick(self):
+        detection, self.fresh = self.mailbox.get()
+        if detection is not None:
+            self.detection = detection
+
+    def target(self, detect=None):
+        return self.detection.pos if self.detection is not None else None
+
+    def targets(self, detect_all=None):
+        return list(self.detection.targets) if self.detection is not None else []
+
+    @property
+    def capture_time(self):
+        return self.detection.timestamp if self.detection is not None else None
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        stats = {
+            "processed": self.processed,
+            "dropped": self.mailbox.dropped,
+            "fps": self.processed / elapsed if elapsed > 0 else 0.0,
+        }
+        if self.detector.gate is not None:
+            stats["gate_hits"] = self.detector.gate.hits
+            stats["gate_misses"] = self.detector.gate.misses
+        return stats
+
+
+# === Кольцо кадров в разделяемой памяти ===
+# Кадры BGRA одного размера лежат подряд; процессы-обработчики получают только
+# номер слота, пиксели между процессами не сериализуются.
+class FrameRing:
+    def __init__(self, slots, height, width, name=None):
+        self.slots = slots
+        self.height = height
+        self.width = width
+        self.slot_size = height * width * 4
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def slot(self, index):
+        return np.ndarray((self.height, self.width, 4), dtype=np.uint8,
+                          buffer=self.shm.buf, offset=index * self.slot_size)
+
+    def close(self, unlink=False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+# Состояние процесса-обработчика: подключённое кольцо и свой детектор
+_worker_ring = None
+_worker_detector = None
+
+
+def _attach_ring(name, slots, height, width, pyramid, backend):
+    global _worker_ring, _worker_detector
+    _worker_ring = FrameRing(slots, height, width, name=name)
+    _worker_detector = TriangleDetector(width, height, pyramid, backend)
+
+
+# Ошибка поиска не глушится: она уходит в error_callback пула (_on_error), где
+# кадр считается неудачным (failed), а слот освобождается
+def _detect_slot(slot, seq, timestamp):
+    targets = tuple(_worker_detector.detect_all(_worker_ring.slot(slot)))
+    return slot, Detection(targets[0] if targets else None, timestamp, seq, targets)
+
+
+# === Пул процессов поиска цели ===
+# Поток захвата пишет кадры в свободные слоты кольца и раздаёт их пулу.
+# Результаты приходят в произвольном порядке и выстраиваются по номеру кадра,
+# поэтому в ящик (а значит, и в историю треков) время идёт только вперёд.
+# Если свободных слотов нет, кадр не захватывается и считается выброшенным.
+# Интерфейс тот же, что у DetectionWorker; следящий режим не поддерживается —
+# каждый кадр обрабатывается независимо, поэтому захватывается весь монитор.
+class ProcessDetectionWorker:
+    def __init__(self, processes=None, interval=0.008, slots=None, pyramid=1, backend="contours", session=None,
+                 profiler=NULL_PROFILER):
+        self.processes = processes or os.cpu_count() or 1
+        self.profiler = profiler  # фаза grab потока захвата (поиск идёт в других процессах)
+        self.session = session  # вместо mss (например, synthetic.SyntheticScreen)
+        self.slots = slots or 2 * self.processes
+        self.interval = interval
+        self.pyramid = pyramid
+        self.backend = backend
+        self.mailbox = LatestValue()
+        self.processed = 0
+        self.skipped = 0  # кадры, для которых не нашлось свободного слота
+        self.failed = 0  # кадры, поиск по которым завершился ошибкой в пуле
+        self.detection = None
+        self.fresh = False
+        self._started = 0.0
+        self._lock = threading.Lock()
+        self._free = list(range(self.slots))
+        self._pending = {}
+        self._next_seq = 1
+        self._ring = None
+        self._pool = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
+
+    def start(self):
+        if self.session is not None:
+            monitor = self.session.monitors[1]
+        else:
+            with mss.mss() as sct:
+                monitor = sct.monitors[1]
+        height, width = monitor["height"], monitor["width"]
+        self._ring = FrameRing(self.slots, height, width)
+        self._pool = multiprocessing.Pool(
+            self.processes, initializer=_attach_ring,
+            initargs=(self._ring.name, self.slots, height, width, self.pyramid, self.backend))
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    # Как у DetectionWorker: смена профилировщика на ходу
+    def set_profiler(self, profiler):
+        self.profiler = profiler
+
+    # Как у DetectionWorker: True — поток захвата вышел. Пока он жив, пул и кольцо
+    # кадров не трогаются — их освобождает сам поток при выходе
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+        if self._thread.is_alive():
+            return False
+        self._release()
+        return True
+
+    # Пул останавливается вне блокировки: его поток результатов сам берёт _lock
+    def _release(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+            ring, self._ring = self._ring, None
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        if ring is not None:
+            ring.close(unlink=True)
+
+    def _run(self):
+        capture = ScreenCapture(session=self.session)
+        seq = 0
+        try:
+            while not self._stop.is_set():
+                with self._lock:
+                    slot = self._free.pop() if self._free else None
+                if slot is None:
+                    self.skipped += 1
+                else:
+                    try:
+                        capture.next_tick()
+                        self._ring.slot(slot)[:] = capture.grab()
+                    except Exception:
+                        with self._lock:
+                            self._free.append(slot)
+                    else:
+                        self.profiler.add("grab", capture.grab_seconds)
+                        seq += 1
+                        # Время захвата по часам сессии (у записи — записанное время кадра)
+                        self._pool.apply_async(_detect_slot, (slot, seq, capture.capture_time),
+                                               callback=self._on_result,
+                                               error_callback=functools.partial(self._on_error, slot, seq))
+                self._stop.wait(self.interval)
+        finally:
+            capture.close()
+            if self._stop.is_set():
+                self._release()
+
+    # Вызывается потоком результатов пула: освобождаем слот и выдаём кадры по порядку
+    def _on_result(self, result):
+        slot, detection = result
+        self._finish(slot, detection.seq, detection)
+
+    # Задача упала (например, процесс пула погиб): слот освобождается, а номер
+    # кадра пропускается — иначе очередь ждала бы его вечно
+    def _on_error(self, slot, seq, error):
+        self._finish(slot, seq, None)
+
+    def _finish(self, slot, seq, detection):
+        with self._lock:
+            self._free.append(slot)
+            self._pending[seq] = detection
+            while self._next_seq in self._pending:
+                detection = self._pending.pop(self._next_seq)
+                self._next_seq += 1
+                if detection is None:
+                    self.failed += 1
+                else:
+                    self.mailbox.put(detection)
+                    self.processed += 1
+
+    def next_tick(self):
+        detection, self.fresh = self.mailbox.get()
+        if detection is not None:
+            self.detection = detection
+
+    def target(self, detect=None):
+        return self.detection.pos if self.detection is not None else None
+
+    def targets(self, detect_all=None):
+        return list(self.detection.targets) if self.detection is not None else []
+
+    @property
+    def capture_time(self):
+        return self.detection.timestamp if self.detection is not None else None
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            "processed": self.processed,
+            "dropped": self.mailbox.dropped + self.skipped + self.failed,
+            "fps": self.processed / elapsed if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,329 @@
+import mmap
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from synthetic import Shot
+
+# === Формат файла записи ===
+# Заголовок файла (64 байта), затем записи кадров одна за другой: заголовок кадра
+# (64 байта) и пиксели uint8 (height, width, channels), дополненные до 64 байт.
+# Файл только дописывается; оборванная последняя запись при чтении отбрасывается.
+# Все смещения кратны 64, поэтому кадр читается как массив прямо из mmap, без копии.
+FILE_MAGIC = b"MSLFRM01"
+FRAME_MAGIC = 0x4D52464D
+ALIGNMENT = 64
+
+FILE_HEADER = np.dtype({
+    "names": ["magic", "left", "top", "width", "height"],
+    "formats": ["S8", "<i4", "<i4", "<i4", "<i4"],
+    "offsets": [0, 8, 12, 16, 20],
+    "itemsize": ALIGNMENT,
+})
+
+# time — момент захвата (time.perf_counter, не убывает); left/top/width/height —
+# захваченная область экрана (ROI следящего захвата или весь монитор);
+# stored_* и channels — что лежит в файле (после уменьшения и перевода в серый)
+FRAME_HEADER = np.dtype({
+    "names": ["magic", "time", "left", "top", "width", "height", "stored_width", "stored_height",
+              "channels", "size"],
+    "formats": ["<u4", "<f8", "<i4", "<i4", "<i4", "<i4", "<i4", "<i4", "<i4", "<u8"],
+    "offsets": [0, 8, 16, 20, 24, 28, 32, 36, 40, 48],
+    "itemsize": ALIGNMENT,
+})
+
+RECORD_GRAYSCALE = False  # писать только яркость (в 4 раза меньше BGRA)
+RECORD_DOWNSCALE = 1  # уменьшать кадры в N раз по каждой стороне
+
+
+def _padding(size):
+    return -size % ALIGNMENT
+
+
+# === Запись кадров ===
+# Кадр BGRA (как у wrap_screenshot) переводится в BGR или серый, при downscale > 1
+# уменьшается (INTER_AREA), и пишется одной записью. Полный кадр 1920×1080 BGR —
+# 6 МБ, серый с downscale=2 — 0.5 МБ: так долгая запись укладывается в скорость диска.
+# Если файл уже есть, кадры дописываются в конец, а время продолжается после последнего;
+# монитор файла должен совпадать с текущим.
+class FrameRecorder:
+    def __init__(self, path, monitor, grayscale=RECORD_GRAYSCALE, downscale=RECORD_DOWNSCALE):
+        self.path = path
+        self.monitor = monitor
+        self.grayscale = grayscale
+        self.downscale = max(1, int(downscale))
+        self.frames = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._offset = 0.0
+        self._last = -np.inf
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            recording = Recording(path)
+            # Кадры другого монитора не легли бы на холст воспроизведения
+            if recording.monitor != {key: monitor[key] for key in ("left", "top", "width", "height")}:
+                recorded = recording.monitor
+                recording.close()
+                raise ValueError(f"{path}: записан монитор {recorded['width']}×{recorded['height']} "
+                                 f"({recorded['left']}, {recorded['top']}), текущий {monitor['width']}×"
+                                 f"{monitor['height']} ({monitor['left']}, {monitor['top']})")
+            if len(recording):
+                self._last = float(recording.times[-1])
+                self._offset = max(0.0, self._last - time.perf_counter())
+            end = recording.end
+            recording.close()
+            # Оборванную последнюю запись отрезаем, чтобы следующая легла по границе
+            with open(path, "rb+") as f:
+                f.truncate(end)
+            self._file = open(path, "ab", buffering=0)
+        else:
+            self._file = open(path, "wb", buffering=0)
+            header = np.zeros(1, dtype=FILE_HEADER)
+            header["magic"] = FILE_MAGIC
+            header["left"], header["top"] = monitor["left"], monitor["top"]
+            header["width"], header["height"] = monitor["width"], monitor["height"]
+            self._file.write(header.tobytes())
+
+    # frame — BGRA (height, width, 4); region — захваченная область экрана
+    def write(self, frame, timestamp, region):
+        if self.grayscale:
+            data = cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY)
+        else:
+            data = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+        if self.downscale > 1:
+            height, width = data.shape[:2]
+            size = (max(1, width // self.downscale), max(1, height // self.downscale))
+            data = cv2.resize(data, size, interpolation=cv2.INTER_AREA)
+        data = np.ascontiguousarray(data)
+
+        header = np.zeros(1, dtype=FRAME_HEADER)
+        header["magic"] = FRAME_MAGIC
+        header["left"], header["top"] = region["left"], region["top"]
+        header["width"], header["height"] = region["width"], region["height"]
+        header["stored_height"], header["stored_width"] = data.shape[:2]
+        header["channels"] = 1 if data.ndim == 2 else data.shape[2]
+        header["size"] = data.nbytes
+
+        with self._lock:
+            self._last = max(self._last, timestamp + self._offset)
+            header["time"] = self._last
+            self._file.write(header.tobytes())
+            self._file.write(data.data)
+            self._file.write(bytes(_padding(data.nbytes)))
+            self.frames += 1
+            self.bytes += ALIGNMENT + data.nbytes + _padding(data.nbytes)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+# === Сессия захвата с записью ===
+# Обёртка над сессией mss (или любой с тем же интерфейсом): каждый grab, полный
+# кадр или окно следящего захвата, пишется в FrameRecorder с моментом захвата.
+# Подставляется туда же, куда и сама сессия: ScreenCapture(session=...),
+# DetectionWorker(session=...), ProcessDetectionWorker(session=...).
+class RecordingSession:
+    def __init__(self, session, path, grayscale=RECORD_GRAYSCALE, downscale=RECORD_DOWNSCALE):
+        self.session = session
+        self.monitors = session.monitors
+        self.recorder = FrameRecorder(path, self.monitors[1], grayscale, downscale)
+        self.closed = False
+
+    def grab(self, monitor):
+        timestamp = time.perf_counter()
+        shot = self.session.grab(monitor)
+        frame = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        self.recorder.write(frame, timestamp, monitor)
+        return shot
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.recorder.close()
+            self.session.close()
+
+
+# === Чтение записи через mmap ===
+# Индекс (заголовки кадров) строится проходом по заголовкам, пиксели не читаются:
+# recording[i] — представление кадра прямо в отображённом файле.
+class Recording:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if size < ALIGNMENT or bytes(self._map[:8]) != FILE_MAGIC:
+            if isinstance(self._map, mmap.mmap):
+                self._map.close()
+            self._file.close()
+            raise ValueError(f"{path}: не файл записи кадров")
+        header = np.frombuffer(self._map, dtype=FILE_HEADER, count=1)[0]
+        self.monitor = {"left": int(header["left"]), "top": int(header["top"]),
+                        "width": int(header["width"]), "height": int(header["height"])}
+
+        headers = []
+        offsets = []
+        offset = ALIGNMENT
+        while offset + ALIGNMENT <= size:
+            frame = np.frombuffer(self._map, dtype=FRAME_HEADER, count=1, offset=offset)[0]
+            end = offset + ALIGNMENT + int(frame["size"]) + _padding(int(frame["size"]))
+            if frame["magic"] != FRAME_MAGIC or end > size:
+                break
+            headers.append(frame)
+            offsets.append(offset + ALIGNMENT)
+            offset = end
+        self.end = offset  # конец последней целой записи
+        self.headers = np.array(headers, dtype=FRAME_HEADER)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.times = self.headers["time"] if len(headers) else np.empty(0)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        header = self.headers[index]
+        shape = (int(header["stored_height"]), int(header["stored_width"]))
+        if header["channels"] > 1:
+            shape += (int(header["channels"]),)
+        return np.frombuffer(self._map, dtype=np.uint8, count=int(header["size"]),
+                             offset=int(self.offsets[index])).reshape(shape)
+
+    # Область экрана кадра: (left, top, width, height)
+    def region(self, index):
+        header = self.headers[index]
+        return int(header["left"]), int(header["top"]), int(header["width"]), int(header["height"])
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self.headers = self.headers.copy()
+            self.times = self.headers["time"] if len(self.headers) else np.empty(0)
+            self._map.close()
+        self._file.close()
+
+
+# === Воспроизведение записи вместо экрана ===
+# Тот же интерфейс, что у сессии mss: каждый grab выдаёт следующий записанный
+# кадр. Кадр (в т.ч. окно следящего захвата, серый или уменьшенный) кладётся на
+# холст размера монитора, а grab возвращает запрошенную область холста — поэтому
+# следящий захват при воспроизведении может просить другие окна, чем при записи.
+# realtime=True — кадры выдаются в записанном темпе, иначе так быстро, как просят.
+# clock() — время следующего кадра: записанное (realtime=False) или пересчитанное
+# на time.perf_counter; ScreenCapture берёт capture_time из него.
+# После последнего кадра finished=True и повторяется последний кадр (loop=True — сначала).
+class ReplaySession:
+    def __init__(self, path, realtime=False, loop=False):
+        self.recording = Recording(path)
+        if not len(self.recording):
+            raise ValueError(f"{path}: в записи нет кадров")
+        self.realtime = realtime
+        self.loop = loop
+        monitor = dict(self.recording.monitor)
+        self.monitors = [monitor, monitor]
+        self.canvas = np.zeros((monitor["height"], monitor["width"], 4), dtype=np.uint8)
+        self.canvas[..., 3] = 255
+        self.index = 0
+        self.frames = 0
+        self.finished = False
+        self._lock = threading.Lock()
+        self._offset = time.perf_counter() - self.recording.times[0] if realtime else 0.0
+
+    def clock(self):
+        return float(self.recording.times[min(self.index, len(self.recording) - 1)]) + self._offset
+
+    def _paste(self, index):
+        data = self.recording[index]
+        left, top, width, height = self.recording.region(index)
+        if data.ndim == 2:
+            data = cv2.cvtColor(data, cv2.COLOR_GRAY2BGRA)
+        else:
+            data = cv2.cvtColor(data, cv2.COLOR_BGR2BGRA)
+        if data.shape[:2] != (height, width):
+            data = cv2.resize(data, (width, height), interpolation=cv2.INTER_LINEAR)
+        x = left - self.monitors[1]["left"]
+        y = top - self.monitors[1]["top"]
+        self.canvas[y:y + height, x:x + width] = data[:self.canvas.shape[0] - y, :self.canvas.shape[1] - x]
+
+    def grab(self, monitor):
+        with self._lock:
+            if self.index >= len(self.recording):
+                if self.loop:
+                    self.index = 0
+                    if self.realtime:
+                        self._offset = time.perf_counter() - self.recording.times[0]
+                else:
+                    self.finished = True
+            if not self.finished:
+                if self.realtime:
+                    delay = self.recording.times[self.index] + self._offset - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                self._paste(self.index)
+                self.index += 1
+                self.frames += 1
+
+            left = monitor["left"] - self.monitors[1]["left"]
+            top = monitor["top"] - self.monitors[1]["top"]
+            width, height = monitor["width"], monitor["height"]
+            if left == 0 and top == 0 and width == self.canvas.shape[1] and height == self.canvas.shape[0]:
+                return Shot(self.canvas, width, height)
+            return Shot(np.ascontiguousarray(self.canvas[top:top + height, left:left + width]), width, height)
+
+    def close(self):
+        self.recording.close()
+
+
+# === Проверка и замер: python recording.py [файл] [число кадров] ===
+# Пишет синтетическую сцену с движущейся целью через следящий захват, затем
+# прогоняет запись через тот же поиск цели так быстро, как получается.
+if __name__ == "__main__":
+    from capture import ScreenCapture
+    from detection import TriangleDetector
+    from synthetic import SyntheticScreen
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "frames.rec"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    for grayscale, downscale in ((False, 1), (True, 1), (True, 2)):
+        if os.path.exists(path):
+            os.remove(path)
+        screen = SyntheticScreen(noise=4.0, clutter=30)
+        session = RecordingSession(screen, path, grayscale, downscale)
+        capture = ScreenCapture(tracking=True, session=session)
+        detector = TriangleDetector(pyramid=2)
+        recorded = []
+        started = time.perf_counter()
+        for i in range(count):
+            screen.set_target(300 + i * 2, 300 + (i % 200))
+            capture.next_tick()
+            recorded.append(capture.target(detector.detect))
+        elapsed = time.perf_counter() - started
+        recorder = session.recorder
+        capture.close()
+        print(f"Запись (серый={grayscale}, уменьшение={downscale}): {recorder.frames} кадров, "
+              f"{recorder.bytes / 1e6:.1f} МБ, {recorder.frames / elapsed:.0f} кадров/с с поиском цели")
+
+        started = time.perf_counter()
+        replay = ReplaySession(path)
+        times = replay.recording.times
+        assert np.all(np.diff(times) >= 0)
+        capture = ScreenCapture(tracking=True, session=replay)
+        detector = TriangleDetector(pyramid=2)
+        replayed = []
+        while True:
+            capture.next_tick()
+            found = capture.target(detector.detect)
+            if replay.finished:
+                break
+            replayed.append(found)
+        elapsed = time.perf_counter() - started
+        same = sum(a == b or (a is not None and b is not None and abs(a[0] - b[0]) <= downscale
+                              and abs(a[1] - b[1]) <= downscale) for a, b in zip(recorded, replayed))
+        print(f"  воспроизведение: {replay.frames} кадров за {elapsed:.2f} с ({replay.frames / elapsed:.0f} кадров/с), "
+              f"результат поиска тот же в {same}/{len(recorded)}")
+        capture.close()
+    os.remove(path)
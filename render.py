@@ -0,0 +1,108 @@
+import tkinter as tk
+
+# Цвет фона прозрачной поверхности: эти пиксели не рисуются и пропускают клики
+TRANSPARENT_COLOR = "white"
+
+
+# === Холст с сохраняемыми элементами ===
+# Вместо canvas.delete("all") и создания всех элементов заново на каждом тике
+# элементы создаются один раз по имени, а дальше у них меняются только
+# координаты и параметры — и только если значения действительно изменились.
+# Каждый вызов Tk обходится дорого, поэтому неизменившийся кадр не стоит ничего.
+class RetainedCanvas:
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self._items = {}  # имя -> id элемента холста
+        self._coords = {}
+        self._options = {}
+
+    def text(self, name, x, y, text, **options):
+        options["text"] = text
+        self._item(name, "text", (x, y), options)
+
+    def polygon(self, name, points, **options):
+        coords = tuple(c for point in points for c in point)
+        self._item(name, "polygon", coords, options)
+
+    def oval(self, name, x0, y0, x1, y1, **options):
+        self._item(name, "oval", (x0, y0, x1, y1), options)
+
+    # Скрыть элементы (они остаются на холсте до следующего показа)
+    def hide(self, *names):
+        for name in names:
+            options = self._options.get(name)
+            if options is not None and options["state"] != "hidden":
+                self.canvas.itemconfigure(self._items[name], state="hidden")
+                options["state"] = "hidden"
+
+    # Удалить всё (например, при пересоздании холста)
+    def clear(self):
+        self.canvas.delete("all")
+        self._items.clear()
+        self._coords.clear()
+        self._options.clear()
+
+    def _item(self, name, kind, coords, options):
+        options.setdefault("state", "normal")
+        item = self._items.get(name)
+        if item is None:
+            create = getattr(self.canvas, "create_" + kind)
+            self._items[name] = create(*coords, tags=name, **options)
+            self._coords[name] = coords
+            self._options[name] = options
+            return
+
+        if coords != self._coords[name]:
+            self.canvas.coords(item, *coords)
+            self._coords[name] = coords
+
+        current = self._options[name]
+        changed = {key: value for key, value in options.items() if current.get(key) != value}
+        if changed:
+            self.canvas.itemconfigure(item, **changed)
+            current.update(changed)
+
+
+# === Прозрачная поверхность поверх экрана ===
+# Одно окно во весь экран на главном интерпретаторе Tk вместо отдельного tk.Tk()
+# на каждый маркер. Маркеры (упреждение, ракета, взрыв) — элементы его холста:
+# они двигаются изменением координат, без вызовов оконного менеджера.
+class OverlaySurface:
+    def __init__(self, master):
+        self.window = tk.Toplevel(master)
+        self.window.overrideredirect(True)
+        self.window.wm_attributes("-topmost", True)
+        self.window.wm_attributes("-transparentcolor", TRANSPARENT_COLOR)
+        width = self.window.winfo_screenwidth()
+        height = self.window.winfo_screenheight()
+        self.window.geometry(f"{width}x{height}+0+0")
+
+        self.canvas = tk.Canvas(self.window, width=width, height=height,
+                                bg=TRANSPARENT_COLOR, highlightthickness=0)
+        self.canvas.pack()
+        self.scene = RetainedCanvas(self.canvas)
+        self._groups = {}  # префикс группы -> сколько элементов создано
+
+    # Круг с центром (x, y) в координатах экрана
+    def circle(self, name, x, y, radius, **options):
+        self.scene.oval(name, x - radius, y - radius, x + radius, y + radius, **options)
+
+    # Группа одинаковых кругов (залп ракет): элементы prefix0, prefix1, ...;
+    # если кругов стало меньше, лишние скрываются
+    def circles(self, prefix, points, radius, **options):
+        count = 0
+        for x, y in points:
+            self.circle(f"{prefix}{count}", x, y, radius, **options)
+            count += 1
+        self.hide(*(f"{prefix}{i}" for i in range(count, self._groups.get(prefix, 0))))
+        self._groups[prefix] = max(count, self._groups.get(prefix, 0))
+
+    def hide(self, *names):
+        self.scene.hide(*names)
+
+    # Вывести изменения сразу, не дожидаясь возврата в цикл событий
+    def flush(self):
+        self.window.update_idletasks()
+
+    def destroy(self):
+        self.window.destroy()
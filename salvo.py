@@ -0,0 +1,111 @@
+import math
+import sys
+import time
+
+import numpy as np
+
+from guidance import FINAL_APPROACH_TIME, intercept, lead_time
+from missile import MAX_MISSILE_SPEED, step_missiles
+
+SALVO_PATTERN = "ring"  # расстановка ракет вокруг точки старта: ring / line / grid
+SALVO_SPACING = 60.0  # px — расстояние между соседними ракетами
+
+
+# === Точки старта залпа ===
+# Вокруг центра: по кругу (ring), в линию (line) или квадратом (grid)
+def salvo_points(center, count, pattern=SALVO_PATTERN, spacing=SALVO_SPACING):
+    cx, cy = center
+    if count <= 1:
+        return np.array([[cx, cy]], dtype=np.float64)
+    index = np.arange(count)
+    if pattern == "ring":
+        radius = spacing * count / (2 * math.pi)
+        angle = 2 * math.pi * index / count
+        return np.column_stack((cx + radius * np.cos(angle), cy + radius * np.sin(angle)))
+    if pattern == "line":
+        return np.column_stack((cx + spacing * (index - (count - 1) / 2), np.full(count, float(cy))))
+    if pattern == "grid":
+        side = math.ceil(math.sqrt(count))
+        row, col = np.divmod(index, side)
+        return np.column_stack((cx + spacing * (col - (side - 1) / 2), cy + spacing * (row - (side - 1) / 2)))
+    raise ValueError(f"Неизвестная расстановка залпа: {pattern}")
+
+
+# === Залп: состояние всех ракет в массивах ===
+# pos, vel, aim — (N, 2), intercepting — (N,). Наведение и шаг — одна операция
+# над массивами на тик (guidance.intercept и missile.step_missiles), поэтому
+# цена тика почти не зависит от числа ракет. Для одной ракеты результат тот же,
+# что у lead_point и step_missile.
+class Salvo:
+    def __init__(self, points):
+        self.pos = np.array(points, dtype=np.float64).reshape(-1, 2)
+        self.vel = np.zeros_like(self.pos)
+        self.aim = self.pos.copy()
+        self.intercepting = np.zeros(len(self.pos), dtype=bool)
+
+    def __len__(self):
+        return len(self.pos)
+
+    # Точки прицеливания всех ракет по одной цели. velocity=None — скорость
+    # цели неизвестна, все ракеты идут на саму цель
+    def guide(self, target, velocity, remaining, solver=True, final_approach_time=FINAL_APPROACH_TIME):
+        target = np.asarray(target, dtype=np.float64)
+        if velocity is None:
+            self.aim[:] = target
+            self.intercepting[:] = False
+            return self.aim
+
+        velocity = np.asarray(velocity, dtype=np.float64)
+        fallback = np.trunc(target + velocity * lead_time(remaining, final_approach_time))
+        if solver:
+            _, point, ok = intercept(self.pos, MAX_MISSILE_SPEED, target, velocity)
+            np.copyto(self.aim, np.where(ok[:, None], np.trunc(point), fallback))
+            self.intercepting[:] = ok
+        else:
+            self.aim[:] = fallback
+            self.intercepting[:] = False
+        return self.aim
+
+    def step(self, dt):
+        step_missiles(self.pos, self.vel, self.aim, dt, ~self.intercepting)
+
+    def distances(self, point):
+        delta = self.pos - np.asarray(point, dtype=np.float64)
+        return np.hypot(delta[:, 0], delta[:, 1])
+
+    def speeds(self):
+        return np.hypot(self.vel[:, 0], self.vel[:, 1])
+
+
+# === Замер: python salvo.py [число ракет] [число тиков] ===
+if __name__ == "__main__":
+    from guidance import lead_point
+    from missile import step_missile
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 1250
+    dt = 0.008
+
+    # Совпадение с одиночной ракетой
+    for solver in (True, False):
+        salvo = Salvo(salvo_points((600, 400), 5))
+        single = [(x, y, 0.0, 0.0) for x, y in salvo.pos]
+        for i in range(ticks):
+            target = (900 + 120 * i * dt, 300 + 40 * i * dt)
+            remaining = 10.0 - i * dt
+            salvo.guide(target, (120, 40), remaining, solver)
+            salvo.step(dt)
+            for j, (x, y, vx, vy) in enumerate(single):
+                aim, intercepting = lead_point(target, (120, 40), (x, y), MAX_MISSILE_SPEED, remaining, solver)
+                single[j] = step_missile(x, y, vx, vy, aim[0], aim[1], dt, not intercepting)
+        worst = np.abs(salvo.pos - np.array([state[:2] for state in single])).max()
+        print(f"Отличие от одиночных ракет (solver={solver}): {worst:.2e} px")
+
+    salvo = Salvo(salvo_points((600, 400), count, "grid"))
+    started = time.perf_counter()
+    for i in range(ticks):
+        salvo.guide((900 + 120 * i * dt, 300 + 40 * i * dt), (120, 40), 10.0 - i * dt)
+        salvo.step(dt)
+    elapsed = time.perf_counter() - started
+    print(f"{count} ракет: {elapsed / ticks * 1000:.3f} мс на тик (наведение и шаг), "
+          f"ближайшая к цели {salvo.distances((900 + 120 * ticks * dt, 300 + 40 * ticks * dt)).min():.1f} px")
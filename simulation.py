@@ -1,25 +1,54 @@
-import cv2
 import numpy as np
-import mss
+import os
 import time
 import tkinter as tk
-from collections import deque
 import math
 
+import mss
+
+from capture import get_capture, set_capture_session
+from collision import sweep, target_triangles
+from detection import TriangleDetector
+from flight import FlightRecorder
+from pipeline import DetectionWorker, ProcessDetectionWorker
+from tracking import TrackManager
+from guidance import lead_point, lead_time
+from missile import MAX_MISSILE_SPEED, step_missile
+from recording import RecordingSession, ReplaySession
+from render import OverlaySurface, RetainedCanvas
+from salvo import Salvo, salvo_points
+from timing import NULL_PROFILER, LatencyEstimator, PhaseProfiler, TickScheduler, adaptive_interval
+from trajectories import TRAJECTORY_KINDS, random_trajectory
+
 # === Глобальные переменные ===
-target_history = deque(maxlen=10)
-time_stamps = deque(maxlen=10)
+tracks = TrackManager()  # треки целей: история и скорость каждой
+detection_worker = None  # фоновый поток захвата (если включён)
+frame_session = None  # запись или воспроизведение кадров (None — захват экрана)
+display_latency = LatencyEstimator()  # от начала тика до показа оверлея
+capture_latency = LatencyEstimator()  # от захвата кадра до показа оверлея
+last_capture_time = None  # время захвата кадра, уже переданного трекам
+render_time = LatencyEstimator()  # время отрисовки холста за тик
 overlay_window = None  # красный кружок (упреждение)
 missile_window = None  # жёлтый кружок (ракета)
 explosion_window = None  # красный взрыв (если будет)
+overlay_surface = None  # общее прозрачное окно для всех маркеров (если включено)
 overlay_frozen = False  # флаг заморозки красного кружка
 missile_frozen = False  # флаг заморозки жёлтого кружка
+salvo = None  # залп: состояние всех ракет в массивах (None — одна ракета)
+target_hit = False  # ракета коснулась цели (бой закончен попаданием)
+closest_approach = math.inf  # px — ближайший подход ракеты к треугольнику цели за полёт
+flight_recorder = None  # бортовой самописец текущего полёта (если включён)
+profiler = NULL_PROFILER  # время фаз тика (timing.PhaseProfiler, если включено)
+profile_hud = False  # показывать таблицу фаз на холсте
+profile_hud_text = ""
+profile_hud_time = 0.0  # когда таблица последний раз пересчитана
 
 # Параметры полёта
 TOTAL_TIME = 0.0
 START_TIME = 0.0
 RUNNING = False
 LAST_AIM_POINT = (800, 400)
+LAST_AIM_INTERCEPT = False  # LAST_AIM_POINT — точка встречи (ракета не тормозит)
 MISSILE_SPEED_MPS = 0.0
 
 # Симуляция цели
@@ -27,63 +56,130 @@ TARGET_X, TARGET_Y = 800, 400
 TARGET_SIZE = 60
 MOVE_SPEED = 4
 UPDATE_INTERVAL_MS = 8
+GUIDANCE_INTERVAL_MIN = UPDATE_INTERVAL_MS / 1000  # сек — самый частый поиск цели
+GUIDANCE_INTERVAL_MAX = 0.1  # сек — самый редкий (цель стоит на месте)
+ADAPTIVE_DETECTION = True  # частота поиска по скорости цели и остатку времени (False — раз в GUIDANCE_INTERVAL_MAX)
+TRACKING_CAPTURE = True  # захват только окна вокруг последней позиции цели
+BACKGROUND_DETECTION = True  # захват и поиск цели в отдельном потоке
+DETECTION_PYRAMID = 1  # 2/4 — первый проход по уменьшенному кадру (окупается только на полном кадре без помех)
+DETECTION_BACKEND = "contours"  # "components" — один проход по связным компонентам
+MOTION_GATE = True  # не искать цель заново, если кадр не изменился
+MULTI_TARGET = False  # искать все цели на экране (следящий захват тогда не используется)
+TRACK_POLICY = "nearest"  # выбор цели для наведения: oldest / nearest / fastest
+DETECTION_PROCESSES = 0  # >0 — поиск цели в пуле процессов через разделяемую память
+RETAINED_RENDERING = True  # обновлять элементы холста, а не пересоздавать их (False — прежняя отрисовка)
+OVERLAY_SURFACE = True  # все маркеры на одном прозрачном окне (False — отдельное окно на маркер)
+SALVO_SIZE = 1  # ракет в залпе по умолчанию (расстановка — SALVO_PATTERN в salvo.py)
+TARGET_MOTION = "keyboard"  # движение цели: keyboard или вид траектории из trajectories.py
+TARGET_SEED = 0  # seed траектории: одинаковый seed — одинаковое движение цели
+RECORD_FRAMES = None  # файл, куда пишутся захваченные кадры (серый/уменьшение — в recording.py)
+REPLAY_FRAMES = None  # файл записи: поиск цели и наведение по записанным кадрам вместо экрана
+FLIGHT_LOG_DIR = None  # папка для записей полётов (flight.py): цель, упреждение и ракета по тикам
+PROFILE_PHASES = False  # время фаз тика: захват, поиск, упреждение, ракета, отрисовка (F3 — таблица)
+PROFILE_EXPORT = None  # файл .json или .csv, куда при выходе пишутся перцентили фаз
+PROFILE_HUD_REFRESH = 0.25  # сек — как часто пересчитывать таблицу на экране
+# Фазы тика в порядке показа; grab и detect с фоновым поиском пишет поток захвата
+TICK_PHASES = ("draw", "grab", "detect", "tracks", "guidance", "overlay", "missile", "markers", "record", "tick")
+detector = TriangleDetector(pyramid=DETECTION_PYRAMID, backend=DETECTION_BACKEND, motion_gate=MOTION_GATE)
+tick_rate = TickScheduler(UPDATE_INTERVAL_MS / 1000)  # цикл обновления
+guidance_rate = TickScheduler(GUIDANCE_INTERVAL_MAX)  # поиск цели и упреждение
 
 key_state = {"Up": False, "Down": False, "Left": False, "Right": False}
+target_path = None  # траектория цели (None — управление с клавиатуры)
 
 # Окна
 sim_window = None
 canvas = None
+scene = None  # элементы холста, обновляемые на месте
 
 # === Физика ракеты ===
 MISSILE_X, MISSILE_Y = 600, 400  # стартовая позиция ракеты
 MISSILE_VX, MISSILE_VY = 0, 0  # скорость ракеты
 MISSILE_SPEED = 0.0  # текущая скорость
 
-# Ограничения ракеты (ОЧЕНЬ АГРЕССИВНЫЕ)
-MAX_MISSILE_SPEED = 400.0  # px/сек (высокая)
-MAX_ACCELERATION = 300.0  # px/сек² (высокое ускорение)
-MAX_DECELERATION = 400.0  # px/сек² (очень высокое торможение)
+# Ограничения ракеты и агрессивность — в missile.py
 MISSILE_RADIUS = 12  # радиус жёлтого кружка
 OVERLAY_RADIUS = 15  # радиус красного кружка
 
-# Параметры наведения (АГРЕССИВНЫЕ)
-AGGRESSIVENESS = 1.5  # высокая агрессивность
-FINAL_APPROACH_TIME = 1.5  # последние 1.5 сек — фиксированное упреждение
+# Параметры наведения (упреждение по времени — в guidance.py)
+INTERCEPT_SOLVER = True  # упреждение по точке встречи (False — по времени до взрыва)
 
 last_frame_time = time.perf_counter()
 
 
-# === Поиск треугольника ===
-def find_triangle(frame):
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    inv_gray = cv2.bitwise_not(gray)
-    _, thresh = cv2.threshold(inv_gray, 128, 255, cv2.THRESH_BINARY)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-    thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=2)
-
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
-        if area < 200:
-            continue
-        perimeter = cv2.arcLength(cnt, True)
-        approx = cv2.approxPolyDP(cnt, 0.04 * perimeter, True)
-        if len(approx) == 3 and cv2.isContourConvex(approx):
-            x, y, w, h = cv2.boundingRect(cnt)
-            aspect_ratio = float(w) / h
-            if 0.5 < aspect_ratio < 2.0:
-                M = cv2.moments(cnt)
-                if M["m00"] != 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    return (cx, cy)
-    return None
+# === Источник цели: фоновый поток или синхронный захват ===
+def target_source():
+    if detection_worker is not None:
+        return detection_worker
+    return get_capture()
+
+
+def stop_detection():
+    global detection_worker, frame_session
+    if detection_worker is not None:
+        # Сессию кадров закрывает поток захвата при выходе: если он не успел
+        # остановиться, его grab ещё может ею пользоваться
+        detection_worker.stop()
+        detection_worker = None
+    elif frame_session is not None:
+        frame_session.close()
+    frame_session = None
+
+
+# Источник кадров: экран, воспроизведение записи и/или запись захваченного
+def open_frame_session():
+    session = None
+    if REPLAY_FRAMES:
+        session = ReplaySession(REPLAY_FRAMES, realtime=True)
+    if RECORD_FRAMES:
+        session = RecordingSession(session if session is not None else mss.mss(), RECORD_FRAMES)
+    return session
+
+
+# Все цели текущего тика
+def detect_targets():
+    source = target_source()
+    if MULTI_TARGET:
+        return source.targets(detector.detect_all)
+    target_pos = source.target(detector.detect)
+    return [target_pos] if target_pos is not None else []
+
+
+# Передать трекам новый кадр. Время обнаружения — момент захвата, а не конец
+# поиска; повторно тот же кадр (фоновый поток ещё не успел) не передаётся.
+def update_tracks():
+    global last_capture_time
+    targets = detect_targets()
+    if profiler.enabled and detection_worker is None:
+        # Синхронный захват: поиск цели — всё, кроме самого захвата
+        grab = get_capture().grab_seconds
+        profiler.add("grab", grab)
+        profiler.lap("detect", grab)
+    capture_time = target_source().capture_time
+    if capture_time is not None and capture_time != last_capture_time:
+        tracks.update(targets, capture_time)
+        last_capture_time = capture_time
+    profiler.lap("tracks")
+    return capture_time
+
+
+# Прозрачное окно маркеров создаётся при первом обращении поверх окна симуляции
+def get_overlay_surface():
+    global overlay_surface
+    if overlay_surface is None:
+        overlay_surface = OverlaySurface(sim_window)
+    return overlay_surface
 
 
 # === Обновление оверлея упреждения (красный контур, 30 пикселей) ===
 def update_overlay(x, y):
     global overlay_window
+    if OVERLAY_SURFACE:
+        surface = get_overlay_surface()
+        surface.circle("lead", x, y, OVERLAY_RADIUS - 3, outline="red", width=2, fill="")
+        surface.flush()
+        return
+
     size = OVERLAY_RADIUS * 2
     offset = size // 2
 
@@ -106,6 +202,16 @@ def update_overlay(x, y):
 # === Обновление ракеты (жёлтый контур → жёлтый закрашенный при взрыве) ===
 def update_missile(x, y, exploded=False):
     global missile_window
+    if OVERLAY_SURFACE:
+        # Без flush: холст перерисуется, как только цикл Tk освободится
+        if exploded:
+            get_overlay_surface().circle("missile", x, y, MISSILE_RADIUS,
+                                         fill="yellow", outline="orange", width=2)
+        else:
+            get_overlay_surface().circle("missile", x, y, MISSILE_RADIUS - 2,
+                                         outline="yellow", width=2, fill="")
+        return
+
     size = MISSILE_RADIUS * 2
     offset = size // 2
 
@@ -134,90 +240,123 @@ def update_missile(x, y, exploded=False):
         missile_window.update_idletasks()
 
 
-# === Симуляция полёта ракеты (ОЧЕНЬ АГРЕССИВНАЯ) ===
-def simulate_missile(aim_x, aim_y, dt):
-    global MISSILE_X, MISSILE_Y, MISSILE_VX, MISSILE_VY, MISSILE_SPEED
+# === Ракеты залпа ===
+# Все ракеты — круги на прозрачной поверхности (окно на ракету не создаётся,
+# даже если OVERLAY_SURFACE выключен); двигаются только изменившиеся
+def update_salvo(exploded=False):
+    points = salvo.pos.astype(int).tolist()
+    if exploded:
+        get_overlay_surface().circles("salvo", points, MISSILE_RADIUS, fill="yellow", outline="orange", width=2)
+    else:
+        get_overlay_surface().circles("salvo", points, MISSILE_RADIUS - 2, outline="yellow", width=2, fill="")
+
+
+# === Попадание ===
+# Круг ракеты заметается вдоль шага против треугольника цели (с учётом движения
+# цели за тот же шаг), поэтому при любом dt ракета не проскакивает цель.
+# previous/current — позиции ракеты (или всех ракет залпа) до и после шага.
+def check_hit(previous, current, previous_target):
+    global target_hit, closest_approach
+    target = (TARGET_X, TARGET_Y)
+    hit, closest, _ = sweep(previous, current, target_triangles(previous_target, TARGET_SIZE),
+                            previous_target, target, MISSILE_RADIUS)
+    closest_approach = min(closest_approach, float(np.min(closest)))
+    target_hit = bool(np.any(hit))
+    return target_hit
+
+
+# === Бортовой самописец ===
+# Строка на тик: цель, решение наведения (nan на тиках без поиска) и ракета —
+# при залпе ближайшая к цели, та же, чьё упреждение показано на оверлее.
+def record_flight(now, guided, capture_time, track_pos, pred_time):
+    if salvo is not None:
+        i = int(np.argmin(salvo.distances((TARGET_X, TARGET_Y))))
+        (x, y), (vx, vy) = salvo.pos[i], salvo.vel[i]
+        speed = math.hypot(vx, vy)
+    else:
+        x, y, vx, vy, speed = MISSILE_X, MISSILE_Y, MISSILE_VX, MISSILE_VY, MISSILE_SPEED
+    capture_t = capture_time - START_TIME if capture_time is not None else math.nan
+    flight_recorder.append(now - START_TIME, max(0.0, TOTAL_TIME - (now - START_TIME)), TARGET_X, TARGET_Y,
+                           guided, capture_t, track_pos[0], track_pos[1], LAST_AIM_POINT[0], LAST_AIM_POINT[1],
+                           LAST_AIM_INTERCEPT, pred_time, x, y, vx, vy, speed)
 
-    dx = aim_x - MISSILE_X
-    dy = aim_y - MISSILE_Y
-    distance = math.hypot(dx, dy)
 
-    if distance < 1.0:
-        MISSILE_VX *= 0.95
-        MISSILE_VY *= 0.95
+# Сохранить запись полёта в FLIGHT_LOG_DIR (по колонкам, см. flight.FlightLog)
+def finish_flight():
+    global flight_recorder
+    if flight_recorder is None:
         return
-
-    # ОЧЕНЬ АГРЕССИВНОЕ наведение: максимальная скорость почти сразу
-    desired_speed = min(MAX_MISSILE_SPEED, distance * AGGRESSIVENESS)
-
-    dir_x = dx / distance
-    dir_y = dy / distance
-    desired_vx = dir_x * desired_speed
-    desired_vy = dir_y * desired_speed
-
-    current_speed = math.hypot(MISSILE_VX, MISSILE_VY)
-    desired_speed_mag = math.hypot(desired_vx, desired_vy)
-
-    # Высокое ускорение/торможение
-    if desired_speed_mag > current_speed:
-        max_accel_this_frame = MAX_ACCELERATION * dt
+    recorder, flight_recorder = flight_recorder, None
+    recorder.meta.update(hit=target_hit, closest=closest_approach if math.isfinite(closest_approach) else None)
+    os.makedirs(FLIGHT_LOG_DIR, exist_ok=True)
+    recorder.dump(os.path.join(FLIGHT_LOG_DIR, time.strftime("flight-%Y%m%d-%H%M%S.flt")))
+
+
+# === Взрыв: по истечении времени или при попадании ===
+def explode():
+    global RUNNING, overlay_frozen, missile_frozen
+    overlay_frozen = True
+    missile_frozen = True
+    if salvo is not None:
+        update_salvo(exploded=True)
     else:
-        max_accel_this_frame = MAX_DECELERATION * dt
-
-    dvx = desired_vx - MISSILE_VX
-    dvy = desired_vy - MISSILE_VY
-    dv = math.hypot(dvx, dvy)
-
-    if dv > 0:
-        accel = min(dv, max_accel_this_frame)
-        MISSILE_VX += (dvx / dv) * accel
-        MISSILE_VY += (dvy / dv) * accel
+        update_missile(int(MISSILE_X), int(MISSILE_Y), exploded=True)
+    RUNNING = False
+    stop_detection()
+    finish_flight()
+    sim_window.unbind("<KeyPress>")
+    sim_window.unbind("<KeyRelease>")
+    draw_all()
 
-    # Ограничение максимальной скорости
-    current_speed = math.hypot(MISSILE_VX, MISSILE_VY)
-    if current_speed > MAX_MISSILE_SPEED:
-        MISSILE_VX = (MISSILE_VX / current_speed) * MAX_MISSILE_SPEED
-        MISSILE_VY = (MISSILE_VY / current_speed) * MAX_MISSILE_SPEED
 
-    MISSILE_X += MISSILE_VX * dt
-    MISSILE_Y += MISSILE_VY * dt
+# === Симуляция полёта ракеты (ОЧЕНЬ АГРЕССИВНАЯ) ===
+# Шаг физики общий с расчётом без окон (missile.step_missile)
+def simulate_missile(aim_x, aim_y, dt, brake=True):
+    global MISSILE_X, MISSILE_Y, MISSILE_VX, MISSILE_VY, MISSILE_SPEED
+    MISSILE_X, MISSILE_Y, MISSILE_VX, MISSILE_VY = step_missile(
+        MISSILE_X, MISSILE_Y, MISSILE_VX, MISSILE_VY, aim_x, aim_y, dt, brake)
     MISSILE_SPEED = math.hypot(MISSILE_VX, MISSILE_VY)
 
 
 # === Рисование ===
+# Время отрисовки считается без поиска цели: только работа с элементами холста
 def draw_all():
     if not canvas:
         return
-    canvas.delete("all")
-    canvas.config(bg="gray")
 
     if RUNNING:
-        elapsed = time.time() - START_TIME
+        elapsed = time.perf_counter() - START_TIME
         remaining = max(0.0, TOTAL_TIME - elapsed)
         dist_m = remaining / TOTAL_TIME * 1000 if TOTAL_TIME > 0 else 0
         status_text = f"До взрыва: {remaining:.1f} с | Расст: {dist_m:.0f} м"
-        canvas.create_text(10, 10, anchor="nw", text=status_text,
-                           fill="white", font=("Courier", 10), tags="timer")
 
-        try:
-            sct = mss.mss()
-            monitor = sct.monitors[1]
-            screenshot = np.array(sct.grab(monitor))
-            target_pos = find_triangle(screenshot)
-        except Exception:
-            target_pos = None
-        status_color = "green" if target_pos else "red"
-        status_str = "🎯 Цель: захвачена" if target_pos else "❌ Цель: не найдена"
-        canvas.create_text(10, 30, anchor="nw", text=status_str,
-                           fill=status_color, font=("Arial", 10), tags="status")
-
-        distance_to_aim = math.hypot(MISSILE_X - LAST_AIM_POINT[0], MISSILE_Y - LAST_AIM_POINT[1])
-        missile_status = f"🚀 Ракета: {MISSILE_SPEED:.0f} px/s | До цели: {distance_to_aim:.0f}px"
-        canvas.create_text(10, 50, anchor="nw", text=missile_status,
-                           fill="yellow", font=("Courier", 9), tags="missile_status")
+        # Статус по трекам: поиск цели идёт с частотой наведения, а не каждый тик
+        found = any(track.misses == 0 for track in tracks.tracks)
+        status_color = "green" if found else "red"
+        status_str = "🎯 Цель: захвачена" if found else "❌ Цель: не найдена"
+        tick_requested, tick_achieved = tick_rate.rates()
+        detect_requested, detect_achieved = guidance_rate.rates()
+        status_str += (f" | Тик: {tick_achieved:.0f}/{tick_requested:.0f} Гц"
+                       f" | Поиск: {detect_achieved:.0f}/{detect_requested:.0f} Гц")
+
+        if salvo is not None:
+            missile_status = (f"🚀 Залп: {len(salvo)} ракет | Ближайшая: "
+                              f"{salvo.distances((TARGET_X, TARGET_Y)).min():.0f}px")
+        else:
+            distance_to_aim = math.hypot(MISSILE_X - LAST_AIM_POINT[0], MISSILE_Y - LAST_AIM_POINT[1])
+            missile_status = f"🚀 Ракета: {MISSILE_SPEED:.0f} px/s | До цели: {distance_to_aim:.0f}px"
+        missile_status += (f" | Задержка: {capture_latency.value * 1000:.0f} мс"
+                           f" | Отрисовка: {render_time.value * 1000:.1f} мс")
+        texts = [
+            ("timer", 10, status_text, "white", ("Courier", 10)),
+            ("status", 30, status_str, status_color, ("Arial", 10)),
+            ("missile_status", 50, missile_status, "yellow", ("Courier", 9)),
+        ]
     else:
-        canvas.create_text(10, 10, anchor="nw", text="💥 ВЗРЫВ!",
-                           fill="red", font=("Arial", 16, "bold"), tags="timer")
+        result = "💥 ПОПАДАНИЕ!" if target_hit else f"💥 ВЗРЫВ! Промах {closest_approach:.0f} px"
+        texts = [("timer", 10, result, "red", ("Arial", 16, "bold"))]
+    if profile_hud:
+        texts.append(("profile_hud", 70, profile_summary(), "white", ("Courier", 9)))
 
     h = TARGET_SIZE * np.sqrt(3) / 2
     pts = [
@@ -225,7 +364,57 @@ def draw_all():
         (TARGET_X - TARGET_SIZE // 2, TARGET_Y + h // 2),
         (TARGET_X + TARGET_SIZE // 2, TARGET_Y + h // 2)
     ]
-    canvas.create_polygon(pts, fill="black", outline="black", tags="triangle")
+
+    start = time.perf_counter()
+    if RETAINED_RENDERING:
+        for name, y, text, color, font in texts:
+            scene.text(name, 10, y, text, anchor="nw", fill=color, font=font)
+        if not RUNNING:
+            scene.hide("status", "missile_status")
+        if not profile_hud:
+            scene.hide("profile_hud")
+        scene.polygon("triangle", pts, fill="black", outline="black")
+    else:
+        canvas.delete("all")
+        canvas.config(bg="gray")
+        for name, y, text, color, font in texts:
+            canvas.create_text(10, y, anchor="nw", text=text, fill=color, font=font, tags=name)
+        canvas.create_polygon(pts, fill="black", outline="black", tags="triangle")
+    render_time.add(time.perf_counter() - start)
+
+
+# === Время фаз тика ===
+# Таблица перцентилей пересчитывается не чаще PROFILE_HUD_REFRESH: её форматирование
+# дороже самих засечек
+def profile_summary():
+    global profile_hud_text, profile_hud_time
+    now = time.perf_counter()
+    if now - profile_hud_time >= PROFILE_HUD_REFRESH:
+        profile_hud_text = profiler.summary() if profiler.stats() else "Время фаз: данных пока нет"
+        profile_hud_time = now
+    return profile_hud_text
+
+
+def new_profiler():
+    return PhaseProfiler(UPDATE_INTERVAL_MS / 1000, TICK_PHASES)
+
+
+# F3: показать/скрыть таблицу; если профилирование было выключено, оно включается
+# и в потоке фонового поиска
+def toggle_profile_hud(event=None):
+    global profiler, profile_hud, profile_hud_time
+    if not profiler.enabled:
+        profiler = new_profiler()
+        if detection_worker is not None:
+            detection_worker.set_profiler(profiler)
+    profile_hud = not profile_hud
+    profile_hud_time = 0.0
+    draw_all()
+
+
+def export_profile():
+    if PROFILE_EXPORT and profiler.stats():
+        profiler.export(PROFILE_EXPORT)
 
 
 # === Клавиши ===
@@ -241,12 +430,14 @@ def on_key_release(event):
 
 # === Перезапуск симуляции (полный перезапуск с окна ввода данных) ===
 def restart_simulation():
-    global sim_window, overlay_window, missile_window, explosion_window
+    global sim_window, overlay_window, missile_window, explosion_window, overlay_surface
     global RUNNING
 
     RUNNING = False
+    stop_detection()
+    finish_flight()
 
-    # Уничтожаем все окна
+    # Уничтожаем все окна (прозрачное окно маркеров — дочернее окно симуляции)
     if sim_window:
         sim_window.destroy()
     if overlay_window:
@@ -261,6 +452,7 @@ def restart_simulation():
     overlay_window = None
     missile_window = None
     explosion_window = None
+    overlay_surface = None
 
     # Открываем заново стартовое окно
     show_start_form()
@@ -268,100 +460,139 @@ def restart_simulation():
 
 # === Цикл обновления ===
 def update_loop():
-    global TARGET_X, TARGET_Y, RUNNING, last_frame_time, LAST_AIM_POINT
-    global overlay_frozen, missile_frozen
+    global TARGET_X, TARGET_Y, last_frame_time, LAST_AIM_POINT, LAST_AIM_INTERCEPT
 
     now = time.perf_counter()
     dt = now - last_frame_time
     last_frame_time = now
+    target_source().next_tick()
 
     if not RUNNING:
         draw_all()
-        sim_window.after(UPDATE_INTERVAL_MS, update_loop)
+        sim_window.after(tick_rate.next_delay(), update_loop)
         return
 
-    dx = dy = 0
-    if key_state["Up"]:    dy -= MOVE_SPEED
-    if key_state["Down"]:  dy += MOVE_SPEED
-    if key_state["Left"]:  dx -= MOVE_SPEED
-    if key_state["Right"]: dx += MOVE_SPEED
+    profiler.begin(now)
+    previous_target = (TARGET_X, TARGET_Y)
+    if target_path is not None:
+        # Позиция по времени с начала полёта — не зависит от частоты тиков
+        TARGET_X, TARGET_Y = (float(v) for v in target_path(time.perf_counter() - START_TIME))
+    else:
+        dx = dy = 0
+        if key_state["Up"]:    dy -= MOVE_SPEED
+        if key_state["Down"]:  dy += MOVE_SPEED
+        if key_state["Left"]:  dx -= MOVE_SPEED
+        if key_state["Right"]: dx += MOVE_SPEED
 
-    TARGET_X += dx
-    TARGET_Y += dy
+        TARGET_X += dx
+        TARGET_Y += dy
 
     draw_all()
-
-    current_time = time.time()
-    if not hasattr(update_loop, 'last_update'):
-        update_loop.last_update = current_time
-
-    if not overlay_frozen and current_time - update_loop.last_update >= 0.1:
+    profiler.lap("draw")
+
+    current_time = time.perf_counter()
+    guided = False
+    capture_time = None
+    target_pos = (math.nan, math.nan)
+    pred_time = math.nan
+    if not overlay_frozen and guidance_rate.due(current_time):
         elapsed = current_time - START_TIME
         remaining = max(0.0, TOTAL_TIME - elapsed)
 
         if remaining <= 0 and not missile_frozen:
-            # 💥 ВЗРЫВ
-            overlay_frozen = True
-            missile_frozen = True
-            update_missile(int(MISSILE_X), int(MISSILE_Y), exploded=True)
-            RUNNING = False
-            sim_window.unbind("<KeyPress>")
-            sim_window.unbind("<KeyRelease>")
-            draw_all()
-            sim_window.after(UPDATE_INTERVAL_MS, update_loop)
+            # 💥 ВЗРЫВ (тик учитывается до взрыва, как и на обычном выходе)
+            profiler.tick()
+            explode()
+            sim_window.after(tick_rate.next_delay(), update_loop)
             return
 
-        try:
-            sct = mss.mss()
-            monitor = sct.monitors[1]
-            screenshot = np.array(sct.grab(monitor))
-            target_pos = find_triangle(screenshot)
-        except Exception:
-            target_pos = None
-
-        if target_pos is not None:
-            target_history.append(target_pos)
-            time_stamps.append(current_time)
+        guided = True
+        capture_time = update_tracks()
+        missile_pos = tuple(salvo.pos.mean(axis=0)) if salvo is not None else (MISSILE_X, MISSILE_Y)
+        track = tracks.select(TRACK_POLICY, missile_pos)
+
+        # Медленная цель — поиск реже; быстрая, потерянная или конец полёта — чаще
+        if ADAPTIVE_DETECTION:
+            speed = math.hypot(*track.velocity()) if track is not None and track.samples >= 2 else None
+            guidance_rate.interval = adaptive_interval(speed, remaining, GUIDANCE_INTERVAL_MIN,
+                                                       GUIDANCE_INTERVAL_MAX)
+            if detection_worker is not None:
+                detection_worker.interval = guidance_rate.interval
+
+        # Цель берётся на момент показа оверлея: трек (обновлённый по времени захвата)
+        # прогнозируется вперёд на задержку захват → экран.
+        # Без обнаружения трек продолжает движение по прогнозу фильтра
+        display_time = current_time + display_latency.value
+        if track is not None:
+            target_pos = track.position_at(display_time)
         else:
             target_pos = (TARGET_X, TARGET_Y)
 
+        # Точка встречи с учётом позиции ракеты и её максимальной скорости;
+        # если цель быстрее ракеты — прежнее упреждение по времени
         aim_point = target_pos
-        if target_pos and len(target_history) >= 2:
-            dt_total = time_stamps[-1] - time_stamps[0]
-            if dt_total > 0:
-                dx_t = target_history[-1][0] - target_history[0][0]
-                dy_t = target_history[-1][1] - target_history[0][1]
-                vx, vy = dx_t / dt_total, dy_t / dt_total
-
-                # 🔑 КЛЮЧЕВОЕ ИЗМЕНЕНИЕ: последние 1.5 сек — фиксированное упреждение 1 сек
-                if remaining > FINAL_APPROACH_TIME:
-                    pred_time = min(5.0, remaining)
-                else:
-                    pred_time = 1.0  # фиксировано 1 сек в последние 1.5 сек
-
-                aim_x = int(target_pos[0] + vx * pred_time)
-                aim_y = int(target_pos[1] + vy * pred_time)
-                aim_point = (aim_x, aim_y)
+        intercepting = False
+        if salvo is not None:
+            # Все ракеты сразу; на оверлее — упреждение ближайшей к цели
+            velocity = track.velocity() if track is not None and track.samples >= 2 else None
+            remaining_at_display = max(0.0, TOTAL_TIME - (display_time - START_TIME))
+            salvo.guide(target_pos, velocity, remaining_at_display, INTERCEPT_SOLVER)
+            nearest = int(np.argmin(salvo.distances(target_pos)))
+            aim_point = (int(salvo.aim[nearest, 0]), int(salvo.aim[nearest, 1]))
+            intercepting = bool(salvo.intercepting[nearest])
+            if velocity is not None and not intercepting:
+                pred_time = lead_time(remaining_at_display)
+        elif track is not None and track.samples >= 2:
+            remaining_at_display = max(0.0, TOTAL_TIME - (display_time - START_TIME))
+            aim_point, intercepting = lead_point(target_pos, track.velocity(), (MISSILE_X, MISSILE_Y),
+                                                 MAX_MISSILE_SPEED, remaining_at_display, INTERCEPT_SOLVER)
+            if not intercepting:
+                pred_time = lead_time(remaining_at_display)
+
+        profiler.lap("guidance")
 
         if aim_point:
             LAST_AIM_POINT = aim_point
+            LAST_AIM_INTERCEPT = intercepting
             if not overlay_frozen:
                 update_overlay(aim_point[0], aim_point[1])
-
-        update_loop.last_update = current_time
-
-    if LAST_AIM_POINT is not None and not missile_frozen:
-        simulate_missile(LAST_AIM_POINT[0], LAST_AIM_POINT[1], dt)
+                shown = time.perf_counter()
+                display_latency.add(shown - current_time)
+                if capture_time is not None:
+                    capture_latency.add(shown - capture_time)
+                profiler.lap("overlay")
+
+    # Физика и попадание отдельно от перерисовки маркеров ракет
+    hit = False
+    if salvo is not None and not missile_frozen:
+        previous = salvo.pos.copy()
+        salvo.step(dt)
+        hit = check_hit(previous, salvo.pos, previous_target)
+        profiler.lap("missile")
+        update_salvo()
+        profiler.lap("markers")
+    elif LAST_AIM_POINT is not None and not missile_frozen:
+        previous = (MISSILE_X, MISSILE_Y)
+        simulate_missile(LAST_AIM_POINT[0], LAST_AIM_POINT[1], dt, brake=not LAST_AIM_INTERCEPT)
+        hit = check_hit(previous, (MISSILE_X, MISSILE_Y), previous_target)
+        profiler.lap("missile")
         update_missile(int(MISSILE_X), int(MISSILE_Y), exploded=False)
+        profiler.lap("markers")
+    if flight_recorder is not None:
+        record_flight(now, guided, capture_time, target_pos, pred_time)
+        profiler.lap("record")
+    profiler.tick()
+    if hit:
+        explode()
 
-    sim_window.after(UPDATE_INTERVAL_MS, update_loop)
+    sim_window.after(tick_rate.next_delay(), update_loop)
 
 
 # === Стартовое окно ===
 def show_start_form():
     root = tk.Tk()
     root.title("Запуск ракеты")
-    root.geometry("350x220")
+    root.geometry("350x340")
     root.resizable(False, False)
     root.wm_attributes("-topmost", True)
 
@@ -375,38 +606,101 @@ def show_start_form():
     speed_entry.insert(0, "300")
     speed_entry.pack()
 
-    tk.Label(root, text="Начальная позиция ракеты (X, Y):", font=("Arial", 9)).pack(pady=5)
+    tk.Label(root, text="Начальная позиция ракеты (X, Y; несколько — через «;»):", font=("Arial", 9)).pack(pady=5)
     pos_entry = tk.Entry(root, justify='center', font=("Arial", 10))
     pos_entry.insert(0, "600, 400")
     pos_entry.pack()
 
+    tk.Label(root, text="Ракет в залпе:", font=("Arial", 9)).pack(pady=5)
+    salvo_entry = tk.Entry(root, justify='center', font=("Arial", 10))
+    salvo_entry.insert(0, str(SALVO_SIZE))
+    salvo_entry.pack()
+
+    tk.Label(root, text="Движение цели:", font=("Arial", 9)).pack(pady=5)
+    motion = tk.StringVar(root, TARGET_MOTION)
+    tk.OptionMenu(root, motion, "keyboard", *TRAJECTORY_KINDS).pack()
+
     def on_launch():
         try:
             distance_m = float(dist_entry.get())
             speed_kmh = float(speed_entry.get())
             pos_str = pos_entry.get().replace(" ", "")
-            missile_x, missile_y = map(int, pos_str.split(","))
-            if distance_m <= 0 or speed_kmh <= 0:
+            start_points = [tuple(map(int, point.split(","))) for point in pos_str.split(";") if point]
+            missile_x, missile_y = start_points[0]
+            salvo_size = int(salvo_entry.get())
+            if distance_m <= 0 or speed_kmh <= 0 or salvo_size <= 0:
                 raise ValueError
         except:
             tk.messagebox.showerror("Ошибка", "Введите корректные числа!")
             return
 
         global TOTAL_TIME, START_TIME, RUNNING, MISSILE_SPEED_MPS
-        global MISSILE_X, MISSILE_Y, MISSILE_VX, MISSILE_VY, LAST_AIM_POINT
-        global overlay_frozen, missile_frozen
-        global sim_window, canvas
+        global MISSILE_X, MISSILE_Y, MISSILE_VX, MISSILE_VY, LAST_AIM_POINT, LAST_AIM_INTERCEPT
+        global overlay_frozen, missile_frozen, salvo, target_hit, closest_approach
+        global sim_window, canvas, scene, detection_worker, target_path, frame_session, flight_recorder
+        global profiler
 
         MISSILE_SPEED_MPS = speed_kmh * 1000 / 3600
         TOTAL_TIME = distance_m / MISSILE_SPEED_MPS
-        START_TIME = time.time()
+        START_TIME = time.perf_counter()
         RUNNING = True
+        if motion.get() == "keyboard":
+            target_path = None
+        else:
+            # Траектория начинается в текущей позиции цели и не уходит за край экрана
+            screen = (TARGET_SIZE, TARGET_SIZE,
+                      root.winfo_screenwidth() - TARGET_SIZE, root.winfo_screenheight() - TARGET_SIZE)
+            target_path = random_trajectory(motion.get(), TARGET_SEED, start=(TARGET_X, TARGET_Y), bounds=screen)
+
+        # С фоновым поиском кадры берёт только поток (процесс) захвата
+        frame_session = open_frame_session()
+        if BACKGROUND_DETECTION:
+            capture = get_capture()
+        else:
+            capture = set_capture_session(frame_session)
+        capture.tracking = TRACKING_CAPTURE
+        capture.reset_tracking()
+        tracks.reset()
+        display_latency.reset()
+        capture_latency.reset()
+        render_time.reset()
+        tick_rate.reset()
+        guidance_rate.reset()
+        guidance_rate.interval = GUIDANCE_INTERVAL_MIN if ADAPTIVE_DETECTION else GUIDANCE_INTERVAL_MAX
+        # Гистограммы копятся за всю работу программы (выгружаются при выходе)
+        if PROFILE_PHASES and not profiler.enabled:
+            profiler = new_profiler()
+        if BACKGROUND_DETECTION and DETECTION_PROCESSES > 0:
+            detection_worker = ProcessDetectionWorker(DETECTION_PROCESSES, UPDATE_INTERVAL_MS / 1000,
+                                                      pyramid=DETECTION_PYRAMID, backend=DETECTION_BACKEND,
+                                                      session=frame_session, profiler=profiler).start()
+        elif BACKGROUND_DETECTION:
+            detection_worker = DetectionWorker(UPDATE_INTERVAL_MS / 1000, TRACKING_CAPTURE, DETECTION_PYRAMID,
+                                               DETECTION_BACKEND, MOTION_GATE, MULTI_TARGET,
+                                               session=frame_session, profiler=profiler).start()
+
         overlay_frozen = False
         missile_frozen = False
+        target_hit = False
+        closest_approach = math.inf
 
         MISSILE_X, MISSILE_Y = missile_x, missile_y
         MISSILE_VX, MISSILE_VY = 0, 0
         LAST_AIM_POINT = (missile_x, missile_y)
+        LAST_AIM_INTERCEPT = False
+
+        # Несколько точек — залп из них; одна точка и размер залпа > 1 — расстановка вокруг неё
+        if len(start_points) > 1:
+            salvo = Salvo(start_points)
+        elif salvo_size > 1:
+            salvo = Salvo(salvo_points((missile_x, missile_y), salvo_size))
+        else:
+            salvo = None
+
+        if FLIGHT_LOG_DIR:
+            flight_recorder = FlightRecorder(meta={
+                "total_time": TOTAL_TIME, "interval": UPDATE_INTERVAL_MS / 1000, "salvo": len(salvo) if salvo else 1,
+                "target_motion": motion.get(), "target_seed": TARGET_SEED, "solver": INTERCEPT_SOLVER})
 
         root.destroy()
 
@@ -417,6 +711,7 @@ def show_start_form():
 
         canvas = tk.Canvas(sim_window, bg="gray", highlightthickness=0)
         canvas.pack(fill="both", expand=True)
+        scene = RetainedCanvas(canvas)
 
         # Кнопка перезапуска в правом верхнем углу
         restart_button = tk.Button(
@@ -432,6 +727,7 @@ def show_start_form():
 
         sim_window.bind("<KeyPress>", on_key_press)
         sim_window.bind("<KeyRelease>", on_key_release)
+        sim_window.bind("<F3>", toggle_profile_hud)
 
         def on_escape(e):
             if not RUNNING:
@@ -449,4 +745,7 @@ def show_start_form():
 
 # === Запуск ===
 if __name__ == "__main__":
-    show_start_form()
\ No newline at end of file
+    try:
+        show_start_form()
+    finally:
+        export_profile()
\ No newline at end of file
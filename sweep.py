@@ -0,0 +1,285 @@
+import argparse
+import csv
+import itertools
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from engine import GUIDANCE_INTERVAL_MAX, Engagement
+from guidance import FINAL_APPROACH_TIME
+from missile import AGGRESSIVENESS, MAX_ACCELERATION
+from tracking import KALMAN_MODEL, PROCESS_NOISE
+from trajectories import TARGET_SPEED, random_trajectory
+
+# Перебираемые параметры и их значения по умолчанию (текущие константы модулей)
+PARAMETERS = {
+    "aggressiveness": AGGRESSIVENESS,
+    "final_approach_time": FINAL_APPROACH_TIME,
+    "max_acceleration": MAX_ACCELERATION,
+    "process_noise": PROCESS_NOISE[KALMAN_MODEL],
+    "detection_interval": GUIDANCE_INTERVAL_MAX,
+}
+
+# Торможение перед целью и фиксированное упреждение работают, только когда точки
+# встречи нет. С решателем (по умолчанию) они не влияют на бой, поэтому
+# перебираются лишь с --no-solver, а иначе стоят на значениях PARAMETERS.
+BRAKING_PARAMETERS = ("aggressiveness", "final_approach_time")
+
+# Сетка по умолчанию — вокруг текущих значений
+DEFAULT_GRID = {
+    "aggressiveness": (1.0, 1.5, 2.5),
+    "final_approach_time": (0.5, 1.5, 3.0),
+    "max_acceleration": (200.0, 300.0, 500.0),
+    "process_noise": (5000.0, 20000.0, 80000.0),
+    "detection_interval": (0.05, 0.1, 0.2),
+}
+
+MISSILE_START = (600, 400)
+TOTAL_TIME = 10.0  # сек — время полёта до взрыва
+REPEATS = 4  # прогонов каждого сценария со своим seed
+
+STAT_COLUMNS = ("miss_mean", "miss_median", "miss_p95", "miss_max",
+                "hit_rate", "intercept_mean", "intercept_median", "intercept_p95")
+
+
+# === Сценарии движения цели ===
+# Вид траектории из trajectories.py и скорость цели (px/сек). Путь задаёт seed
+# (номер прогона), поэтому все наборы параметров сравниваются на одинаковых путях.
+SCENARIOS = {
+    "static": ("linear", 0.0),
+    "linear": ("linear", 120.0),
+    "fast": ("linear", 300.0),
+    "circle": ("circle", TARGET_SPEED),
+    "zigzag": ("zigzag", TARGET_SPEED),
+    "random_walk": ("random_walk", TARGET_SPEED),
+    "evasive": ("evasive", 200.0),
+}
+
+
+# === Один набор параметров на всех сценариях ===
+# Промах — ближайший подход ракеты к треугольнику цели в боях без попадания (у
+# попадания это лишь шум шага касания), время перехвата — момент касания (только
+# для попаданий; бой на попадании заканчивается).
+def evaluate(task):
+    params, scenarios, repeats, total_time, adaptive, solver = task
+    runs = 0
+    misses = []
+    intercepts = []
+    for name in scenarios:
+        for repeat in range(repeats):
+            kind, speed = SCENARIOS[name]
+            path = random_trajectory(kind, repeat, MISSILE_START, speed)
+            engagement = Engagement(path, missile=MISSILE_START, total_time=total_time,
+                                    guidance_max=params["detection_interval"], adaptive=adaptive, solver=solver,
+                                    process_noise=params["process_noise"],
+                                    final_approach_time=params["final_approach_time"],
+                                    aggressiveness=params["aggressiveness"],
+                                    max_acceleration=params["max_acceleration"])
+            result = engagement.run()
+            runs += 1
+            if result.hit:
+                intercepts.append(result.time)
+            else:
+                misses.append(result.closest)
+
+    row = dict(params)
+    row["scenarios"] = "+".join(scenarios)
+    row["runs"] = runs
+    if misses:
+        row["miss_mean"] = np.mean(misses)
+        row["miss_median"] = np.median(misses)
+        row["miss_p95"] = np.percentile(misses, 95)
+        row["miss_max"] = np.max(misses)
+    else:
+        row["miss_mean"] = row["miss_median"] = row["miss_p95"] = row["miss_max"] = math.nan
+    row["hit_rate"] = len(intercepts) / runs
+    if intercepts:
+        row["intercept_mean"] = np.mean(intercepts)
+        row["intercept_median"] = np.median(intercepts)
+        row["intercept_p95"] = np.percentile(intercepts, 95)
+    else:
+        row["intercept_mean"] = row["intercept_median"] = row["intercept_p95"] = math.nan
+    return row
+
+
+# === Наборы параметров ===
+# Значение параметра в командной строке: "1.5" (одно), "1,1.5,2" (список) или
+# "1:3" (диапазон — только для случайной выборки). Не заданные параметры берутся
+# из DEFAULT_GRID (сетка) или PARAMETERS (выборка). С решателем (solver=True)
+# параметры BRAKING_PARAMETERS не перебираются.
+def parse_values(text):
+    if ":" in text:
+        low, high = text.split(":")
+        return float(low), float(high)
+    return [float(value) for value in text.split(",")]
+
+
+def _fixed(name, values, solver):
+    if solver and name in BRAKING_PARAMETERS:
+        if name in values:
+            raise ValueError(f"{name}: не влияет на наведение с решателем, добавьте --no-solver")
+        return True
+    return False
+
+
+def grid(values, solver=True):
+    names = list(PARAMETERS)
+    axes = []
+    for name in names:
+        if _fixed(name, values, solver):
+            axes.append([PARAMETERS[name]])
+            continue
+        axis = values.get(name, DEFAULT_GRID[name])
+        if isinstance(axis, tuple) and len(axis) == 2 and name in values:
+            raise ValueError(f"{name}: диапазон допустим только со --samples")
+        axes.append(axis)
+    for combination in itertools.product(*axes):
+        yield {name: float(value) for name, value in zip(names, combination)}
+
+
+# Одна и та же выборка при одном seed — поэтому прерванный перебор продолжается
+def sample(values, count, seed=0, solver=True):
+    for name in PARAMETERS:
+        _fixed(name, values, solver)
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        params = {}
+        for name, default in PARAMETERS.items():
+            axis = values.get(name, [default])
+            if isinstance(axis, tuple):
+                value = rng.uniform(*axis)
+            else:
+                value = axis[rng.integers(len(axis))]
+            params[name] = float(value)
+        yield params
+
+
+# === Файл результатов (CSV, строка на набор параметров) ===
+# Строки дописываются по мере готовности и сразу сбрасываются на диск; при
+# повторном запуске уже посчитанные наборы пропускаются. Набор узнаётся по
+# параметрам, сценариям, числу боёв и режиму (наведение, расписание, время полёта).
+def _key(params, scenarios, runs, mode):
+    return tuple(repr(float(params[name])) for name in PARAMETERS) + (scenarios, int(runs), mode)
+
+
+def load_done(path):
+    if not os.path.exists(path):
+        return set()
+    # Прерванная запись: отбросить неполную последнюю строку
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [name for name in PARAMETERS if name not in (reader.fieldnames or [])]
+        if reader.fieldnames and missing:
+            raise ValueError(f"{path}: нет колонок {', '.join(missing)} — файл от другого набора параметров")
+        return {_key(row, row["scenarios"], row["runs"], row["mode"]) for row in reader}
+
+
+def run_sweep(path, param_sets, scenarios=tuple(SCENARIOS), repeats=REPEATS, total_time=TOTAL_TIME,
+              adaptive=True, solver=True, processes=None, log=print):
+    scenarios = tuple(scenarios)
+    label = "+".join(scenarios)
+    runs = len(scenarios) * repeats
+    mode = f"{'solver' if solver else 'lead'}/{'adaptive' if adaptive else 'fixed'}/{total_time:g}s"
+    done = load_done(path)
+    tasks = []
+    seen = set()
+    for params in param_sets:
+        key = _key(params, label, runs, mode)
+        if key in seen:
+            continue
+        seen.add(key)
+        if key not in done:
+            tasks.append((params, scenarios, repeats, total_time, adaptive, solver))
+    log(f"Наборов: {len(seen)}, уже посчитано {len(seen) - len(tasks)}, осталось {len(tasks)} "
+        f"({len(tasks) * runs} боёв)")
+    if not tasks:
+        return 0
+
+    columns = list(PARAMETERS) + ["scenarios", "runs", "mode"] + list(STAT_COLUMNS)
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    started = time.perf_counter()
+    finished = 0
+    with open(path, "a", newline="") as f, multiprocessing.Pool(processes) as pool:
+        writer = csv.DictWriter(f, columns)
+        if new_file:
+            writer.writeheader()
+        for row in pool.imap_unordered(evaluate, tasks):
+            row["mode"] = mode
+            # Параметры — полностью (по ним узнаются посчитанные наборы), статистика — 4 знака
+            writer.writerow({key: f"{value:.4g}" if key in STAT_COLUMNS else value for key, value in row.items()})
+            f.flush()
+            finished += 1
+            elapsed = time.perf_counter() - started
+            log(f"[{finished}/{len(tasks)}] попаданий {row['hit_rate']:.0%}, "
+                f"перехват медиана {row['intercept_median']:.2f} с "
+                f"— осталось ~{elapsed / finished * (len(tasks) - finished):.0f} с")
+    return finished
+
+
+def _rank(row):
+    def last_if_nan(name):
+        value = float(row[name])
+        return math.inf if math.isnan(value) else value
+    return -float(row["hit_rate"]), last_if_nan("intercept_median"), last_if_nan("miss_median")
+
+
+# Лучшие наборы: больше попаданий, затем раньше перехват, затем меньше промах у непопавших
+def best(path, count=5):
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    rows.sort(key=_rank)
+    return rows[:count]
+
+
+# === python sweep.py results.csv [--max-acceleration 200,400] [--process-noise 5000:80000 --samples 50] ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перебор параметров наведения по сценариям целей")
+    parser.add_argument("output", help="CSV с результатами (дописывается, повторный запуск продолжает)")
+    for name in PARAMETERS:
+        parser.add_argument("--" + name.replace("_", "-"), dest=name, type=parse_values,
+                            help=f"значение, список a,b,c или диапазон a:b (сейчас {PARAMETERS[name]})")
+    parser.add_argument("--samples", type=int, help="случайная выборка вместо полной сетки")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"из {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--time", type=float, default=TOTAL_TIME, help="время полёта, сек")
+    parser.add_argument("--fixed-interval", action="store_true",
+                        help="искать цель строго раз в detection-interval (без адаптации)")
+    parser.add_argument("--no-solver", action="store_true",
+                        help="упреждение по времени вместо точки встречи (только с ним перебираются aggressiveness и final-approach-time)")
+    parser.add_argument("--processes", type=int, help="по умолчанию — все ядра")
+    args = parser.parse_args()
+
+    values = {name: getattr(args, name) for name in PARAMETERS if getattr(args, name) is not None}
+    scenarios = args.scenarios.split(",")
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+    try:
+        solver = not args.no_solver
+        param_sets = list(sample(values, args.samples, args.seed, solver) if args.samples else grid(values, solver))
+    except ValueError as error:
+        parser.error(str(error))
+
+    try:
+        run_sweep(args.output, param_sets, scenarios, args.repeats, args.time,
+                  not args.fixed_interval, solver, args.processes)
+    except ValueError as error:
+        parser.error(str(error))
+    except KeyboardInterrupt:
+        print("Прервано — посчитанные наборы сохранены, повторный запуск продолжит", file=sys.stderr)
+        sys.exit(1)
+
+    print("Лучшие наборы (по доле попаданий и времени перехвата):")
+    for row in best(args.output):
+        params = ", ".join(f"{name}={row[name]}" for name in PARAMETERS)
+        print(f"  {params}: попаданий {float(row['hit_rate']):.0%}, перехват {row['intercept_median']} с, "
+              f"промах без попадания {row['miss_median']} px")
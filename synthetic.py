@@ -0,0 +1,184 @@
+import sys
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from capture import ScreenCapture
+from detection import TriangleDetector, find_triangle
+
+# Как в draw_all: фон холста Tk "gray" (#bebebe) и чёрный треугольник
+BACKGROUND = 190
+TARGET_SIZE = 60
+
+# Снимок в формате mss: сырые BGRA-байты и размер (его понимает wrap_screenshot)
+Shot = namedtuple("Shot", ["raw", "width", "height"])
+
+
+# Вершины треугольника цели — те же, что у draw_all
+def triangle_points(x, y, size=TARGET_SIZE):
+    h = size * np.sqrt(3) / 2
+    return np.array([
+        (x, y - size // 2),
+        (x - size // 2, y + h // 2),
+        (x + size // 2, y + h // 2),
+    ])
+
+
+# === Синтетический экран вместо mss ===
+# Тот же интерфейс, что у сессии mss (monitors, grab, close), поэтому подставляется
+# везде, где сейчас захватывается экран: ScreenCapture(session=...),
+# DetectionWorker(session=...), ProcessDetectionWorker(session=...).
+# Фон (серый, с помехами и шумом) рисуется один раз. На каждом кадре стираются
+# только прямоугольники, где были цели, и рисуются цели на новых местах,
+# поэтому кадр стоит микросекунды, а не заливку всего экрана.
+# Шум — постоянный узор (seed), одинаковый на фоне и на цели; кадр без движения
+# цели не меняется, как и настоящий снимок экрана.
+# Кадр полного монитора отдаётся без копирования и действителен до следующего grab.
+class SyntheticScreen:
+    def __init__(self, width=1920, height=1080, targets=((800, 400),), size=TARGET_SIZE,
+                 noise=0.0, clutter=0, seed=0):
+        self.width = width
+        self.height = height
+        self.size = size
+        monitor = {"left": 0, "top": 0, "width": width, "height": height}
+        self.monitors = [monitor, monitor]
+        self.frames = 0
+
+        rng = np.random.default_rng(seed)
+        shape = (height, width, 4)
+        if noise > 0:
+            pattern = rng.normal(0.0, noise, (height, width, 1))
+        else:
+            pattern = np.zeros((height, width, 1))
+        self._background = np.empty(shape, dtype=np.uint8)
+        self._background[:] = np.clip(BACKGROUND + pattern, 0, 255).astype(np.uint8)
+        self._background[..., 3] = 255
+        self._draw_clutter(rng, clutter)
+        self._dark = np.empty(shape, dtype=np.uint8)
+        self._dark[:] = np.clip(pattern, 0, 255).astype(np.uint8)
+        self._dark[..., 3] = 255
+
+        self.buffer = self._background.copy()
+        self._mask = np.zeros((size + 4, size + 4), dtype=np.uint8)
+        self._drawn = []  # прямоугольники целей на текущем кадре
+        self.targets = []
+        self.set_targets(targets)
+
+    # Помехи: тёмные фигуры, которые не должны считаться целью
+    # (прямоугольники, круги, отрезки, мелкие пятна) и светлые пятна
+    def _draw_clutter(self, rng, count):
+        canvas = self._background
+        for _ in range(count):
+            x = int(rng.integers(0, self.width))
+            y = int(rng.integers(0, self.height))
+            shade = int(rng.integers(0, 100))
+            color = (shade, shade, shade, 255)
+            kind = rng.integers(0, 5)
+            if kind == 0:
+                w, h = rng.integers(15, 80, 2)
+                cv2.rectangle(canvas, (x, y), (x + int(w), y + int(h)), color, -1)
+            elif kind == 1:
+                cv2.circle(canvas, (x, y), int(rng.integers(8, 40)), color, -1)
+            elif kind == 2:
+                dx, dy = rng.integers(-150, 150, 2)
+                cv2.line(canvas, (x, y), (x + int(dx), y + int(dy)), color, int(rng.integers(1, 3)))
+            elif kind == 3:
+                cv2.circle(canvas, (x, y), int(rng.integers(1, 4)), color, -1)
+            else:
+                light = int(rng.integers(120, 255))
+                cv2.circle(canvas, (x, y), int(rng.integers(10, 60)), (light, light, light, 255), -1)
+
+    def set_target(self, x, y):
+        self.set_targets([(x, y)])
+
+    def set_targets(self, targets):
+        self.targets = [(float(x), float(y)) for x, y in targets]
+
+    # Перерисовать цели в буфере
+    def render(self):
+        for top, bottom, left, right in self._drawn:
+            self.buffer[top:bottom, left:right] = self._background[top:bottom, left:right]
+        self._drawn = []
+
+        for x, y in self.targets:
+            pts = np.round(triangle_points(x, y, self.size)).astype(np.int32)
+            left, top = pts.min(axis=0) - 1
+            right, bottom = pts.max(axis=0) + 2
+            left, top = max(left, 0), max(top, 0)
+            right, bottom = min(right, self.width), min(bottom, self.height)
+            if right <= left or bottom <= top:
+                continue
+            mask = self._mask[:bottom - top, :right - left]
+            mask[:] = 0
+            cv2.fillPoly(mask, [pts - (left, top)], 1)
+            region = self.buffer[top:bottom, left:right]
+            np.copyto(region, self._dark[top:bottom, left:right], where=mask[..., None].astype(bool))
+            self._drawn.append((top, bottom, left, right))
+        self.frames += 1
+        return self.buffer
+
+    def grab(self, monitor):
+        frame = self.render()
+        left, top = monitor["left"], monitor["top"]
+        width, height = monitor["width"], monitor["height"]
+        if left == 0 and top == 0 and width == self.width and height == self.height:
+            return Shot(frame, width, height)
+        return Shot(np.ascontiguousarray(frame[top:top + height, left:left + width]), width, height)
+
+    def close(self):
+        pass
+
+
+# === Поиск цели по синтетическому кадру для engine.Engagement(detect=...) ===
+# Цель рисуется в позиции из модели, а кадр проходит тот же путь, что и снимок
+# экрана: ScreenCapture (со следящим окном, если tracking=True) и детектор.
+# multi=True — все цели на полном кадре (detect_all).
+def frame_detect(screen, detector=None, multi=False, tracking=False):
+    if detector is None:
+        detector = TriangleDetector()
+    capture = ScreenCapture(tracking=tracking, session=screen)
+
+    def detect(pos, t):
+        screen.set_target(*pos)
+        capture.next_tick()
+        if multi:
+            return capture.targets(detector.detect_all)
+        found = capture.target(detector.detect)
+        return [found] if found is not None else []
+
+    return detect
+
+
+# === Замер: python synthetic.py [число кадров] ===
+if __name__ == "__main__":
+    from engine import Engagement
+
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    for noise, clutter, tracking in ((0.0, 0, False), (0.0, 0, True), (8.0, 200, True)):
+        screen = SyntheticScreen(noise=noise, clutter=clutter)
+        detect = frame_detect(screen, TriangleDetector(pyramid=2), tracking=tracking)
+        errors = []
+        started = time.perf_counter()
+        for i in range(frames):
+            x, y = 400 + i % 1000, 300 + (i // 2) % 500
+            found = detect((x, y), i)
+            if found:
+                cx, cy = triangle_points(x, y).mean(axis=0)
+                errors.append(np.hypot(found[0][0] - cx, found[0][1] - cy))
+        elapsed = time.perf_counter() - started
+        mode = "окно" if tracking else "весь экран"
+        print(f"Шум {noise:.0f}, помех {clutter}, {mode}: {frames / elapsed:.0f} кадров/с, "
+              f"найдено {len(errors)}/{frames}, ошибка до {max(errors, default=0):.1f} px")
+
+    screen = SyntheticScreen(1280, 720, noise=4.0, clutter=20, seed=1)
+    started = time.perf_counter()
+    result = Engagement(lambda t: (900 + 60 * t, 300 + 25 * t), total_time=5.0,
+                        detect=frame_detect(screen, TriangleDetector(), tracking=True)).run()
+    elapsed = time.perf_counter() - started
+    outcome = (f"попадание на {result.time:.2f} с (ближайший подход {result.closest:.1f} px)" if result.hit
+               else f"промах {result.closest:.1f} px")
+    print(f"Бой по кадрам: {screen.frames} кадров за {elapsed:.2f} с, {outcome}")
+    screen.set_target(640, 360)
+    print(f"find_triangle на кадре с помехами: {find_triangle(screen.render())}")
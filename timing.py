@@ -0,0 +1,260 @@
+import bisect
+import csv
+import json
+import math
+import threading
+import time
+
+# Допустимое смещение цели между двумя поисками, px
+DETECTION_STEP = 10.0
+
+
+# === Задержки конвейера ===
+# Все метки времени берутся с одних монотонных часов time.perf_counter():
+# захват кадра, физика ракеты и таймер полёта. Скачки системных часов
+# на них не влияют.
+# Сглаженная оценка задержки (экспоненциальное среднее), секунды
+class LatencyEstimator:
+    def __init__(self, alpha=0.1, limit=0.5):
+        self.alpha = alpha
+        self.limit = limit  # выбросы (например, пауза окна) не портят оценку
+        self.value = 0.0
+        self.last = 0.0
+        self.count = 0
+
+    def add(self, latency):
+        self.last = latency
+        latency = min(max(latency, 0.0), self.limit)
+        if self.count == 0:
+            self.value = latency
+        else:
+            self.value += self.alpha * (latency - self.value)
+        self.count += 1
+        return self.value
+
+    def reset(self):
+        self.value = 0.0
+        self.last = 0.0
+        self.count = 0
+
+
+# === Расписание по абсолютным дедлайнам ===
+# Следующий тик назначается на deadline + interval, а не на «сейчас + interval»,
+# поэтому время работы тика не накапливается в периоде. Если тик опоздал больше
+# чем на период, пропущенные дедлайны не догоняются пачкой, а пропускаются.
+# interval можно менять на ходу (адаптивная частота поиска цели).
+class TickScheduler:
+    def __init__(self, interval):
+        self.interval = interval
+        self.deadline = None
+        self.ticks = 0
+        self.skipped = 0
+        self._started = None
+        self._requested = 0.0  # сумма запрошенных периодов — для средней частоты
+
+    def reset(self):
+        self.deadline = None
+        self.ticks = 0
+        self.skipped = 0
+        self._started = None
+        self._requested = 0.0
+
+    def _advance(self, now):
+        if self.deadline is None:
+            self._started = now
+            self.deadline = now
+        self.ticks += 1
+        self._requested += self.interval
+        self.deadline += self.interval
+        if now >= self.deadline:
+            missed = int((now - self.deadline) // self.interval) + 1
+            self.skipped += missed
+            self.deadline += missed * self.interval
+
+    # Для цикла Tk: отметить тик и вернуть задержку до следующего дедлайна (мс для after)
+    def next_delay(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+        self._advance(now)
+        return max(0, int((self.deadline - now) * 1000))
+
+    # Для действия внутри тика: наступил ли его дедлайн (если да — тик отмечается)
+    def due(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+        if self.deadline is not None and now < self.deadline:
+            return False
+        self._advance(now)
+        return True
+
+    # Запрошенная (средняя по периодам) и достигнутая частота, Гц
+    def rates(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+        if not self.ticks or self._started is None or now <= self._started:
+            return 0.0, 0.0
+        return self.ticks / self._requested, self.ticks / (now - self._started)
+
+    def stats(self, now=None):
+        requested, achieved = self.rates(now)
+        return {"ticks": self.ticks, "skipped": self.skipped, "requested": requested, "achieved": achieved}
+
+
+# === Адаптивный период поиска цели ===
+# Цель должна сместиться между поисками не больше чем на step пикселей, а к концу
+# полёта поиск учащается (не реже, чем раз в remaining / final_ticks секунд).
+# Результат ограничен [min_interval, max_interval]; скорость неизвестна — самый частый.
+def adaptive_interval(speed, remaining, min_interval, max_interval, step=DETECTION_STEP, final_ticks=10):
+    if speed is None:
+        return min_interval
+    interval = max_interval
+    if speed > 0:
+        interval = min(interval, step / speed)
+    if remaining is not None:
+        interval = min(interval, remaining / final_ticks)
+    return max(min_interval, interval)
+
+
+# === Гистограмма задержек с фиксированными корзинами ===
+# Границы корзин — геометрическая сетка от 1 мкс до ~16 сек, по 8 корзин на
+# удвоение (шаг около 9%). Добавление значения — поиск корзины и инкремент, без
+# выделения памяти; перцентили считаются по корзинам (верхняя граница корзины,
+# не больше максимума). misses — значения дольше deadline.
+HISTOGRAM_MIN = 1e-6  # сек
+HISTOGRAM_OCTAVES = 24
+HISTOGRAM_STEPS = 8  # корзин на удвоение
+HISTOGRAM_EDGES = [HISTOGRAM_MIN * 2 ** (i / HISTOGRAM_STEPS)
+                   for i in range(HISTOGRAM_OCTAVES * HISTOGRAM_STEPS + 1)]
+
+
+class LatencyHistogram:
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+        self.counts = [0] * (len(HISTOGRAM_EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.misses = 0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(HISTOGRAM_EDGES, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if self.deadline is not None and seconds > self.deadline:
+            self.misses += 1
+
+    def percentile(self, q):
+        if not self.count:
+            return math.nan
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(HISTOGRAM_EDGES[i] if i < len(HISTOGRAM_EDGES) else math.inf, self.max)
+        return self.max
+
+    def stats(self):
+        return {"count": self.count, "mean": self.total / self.count if self.count else math.nan,
+                "p50": self.percentile(50), "p95": self.percentile(95), "p99": self.percentile(99),
+                "max": self.max, "misses": self.misses}
+
+
+# === Время по фазам тика ===
+# Засечки «с прошлой засечки»: begin() в начале тика, lap(фаза) после каждой
+# фазы — время между ними уходит в гистограмму фазы; tick() — весь тик от начала.
+# add(фаза, сек) — время, измеренное в другом месте (например, в потоке захвата);
+# каждую фазу пишет один поток. Все фазы сравниваются с одним дедлайном — периодом тика.
+# Гистограммы фаз phases создаются сразу (в этом порядке и показываются); новая фаза
+# добавляется заменой словаря под блокировкой, поэтому stats() из другого потока
+# всегда обходит словарь, который уже не меняется.
+class PhaseProfiler:
+    enabled = True
+
+    def __init__(self, deadline, phases=()):
+        self.deadline = deadline
+        self.phases = {phase: LatencyHistogram(deadline) for phase in phases}  # фаза -> LatencyHistogram
+        self._lock = threading.Lock()
+        self._start = 0.0
+        self._last = 0.0
+
+    def _histogram(self, phase):
+        histogram = self.phases.get(phase)
+        if histogram is None:
+            with self._lock:
+                histogram = self.phases.get(phase)
+                if histogram is None:
+                    histogram = LatencyHistogram(self.deadline)
+                    self.phases = {**self.phases, phase: histogram}
+        return histogram
+
+    def begin(self, now=None):
+        self._start = self._last = time.perf_counter() if now is None else now
+
+    # excluded — часть интервала, уже записанная в другую фазу
+    def lap(self, phase, excluded=0.0):
+        now = time.perf_counter()
+        self._histogram(phase).add(now - self._last - excluded)
+        self._last = now
+
+    def add(self, phase, seconds):
+        self._histogram(phase).add(seconds)
+
+    def tick(self):
+        now = time.perf_counter()
+        self._histogram("tick").add(now - self._start)
+        self._last = now
+
+    # Только фазы, в которых уже есть замеры
+    def stats(self):
+        return {phase: histogram.stats() for phase, histogram in self.phases.items() if histogram.count}
+
+    # Таблица для показа на экране, мс
+    def summary(self):
+        lines = [f"{'фаза':10s} {'p50':>6s} {'p95':>6s} {'p99':>6s} {'max':>6s} {'>' + format(self.deadline * 1000, 'g') + 'мс':>7s}"]
+        for phase, stats in self.stats().items():
+            lines.append(f"{phase:10s} {stats['p50'] * 1000:6.2f} {stats['p95'] * 1000:6.2f} "
+                         f"{stats['p99'] * 1000:6.2f} {stats['max'] * 1000:6.2f} {stats['misses']:7d}")
+        return "\n".join(lines)
+
+    # Выгрузка: .csv — строка на фазу, иначе JSON (секунды)
+    def export(self, path):
+        stats = self.stats()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["phase", "count", "mean", "p50", "p95", "p99", "max", "misses", "deadline"])
+                for phase, row in stats.items():
+                    writer.writerow([phase, row["count"], row["mean"], row["p50"], row["p95"], row["p99"],
+                                     row["max"], row["misses"], self.deadline])
+        else:
+            with open(path, "w") as f:
+                json.dump({"deadline": self.deadline, "phases": stats}, f, indent=2)
+        return path
+
+
+# Выключенный профилировщик: те же методы без работы — засечки в цикле остаются,
+# но стоят один пустой вызов
+class NullProfiler:
+    enabled = False
+    phases = {}
+
+    def begin(self, now=None):
+        pass
+
+    def lap(self, phase, excluded=0.0):
+        pass
+
+    def add(self, phase, seconds):
+        pass
+
+    def tick(self):
+        pass
+
+    def stats(self):
+        return {}
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,310 @@
+import math
+import sys
+
+import numpy as np
+
+# Параметры сопровождения
+TRACK_HISTORY = 10  # сколько последних обнаружений хранит трек
+GATE_RADIUS = 80.0  # px — дальше прогноза трека обнаружение ему не сопоставляется
+MAX_MISSES = 10  # кадров подряд без обнаружения до удаления трека
+
+TRACK_POLICIES = ("oldest", "nearest", "fastest")
+TRACK_ESTIMATORS = ("kalman", "endpoint")
+
+# Параметры фильтра Калмана
+KALMAN_MODEL = "cv"  # "cv" — постоянная скорость, "ca" — постоянное ускорение
+# Спектральная плотность манёвра: px²/с³ для cv (шум ускорения), px²/с⁵ для ca (шум рывка)
+PROCESS_NOISE = {"cv": 20000.0, "ca": 1000000.0}
+MEASUREMENT_NOISE = 4.0  # px² — дисперсия ошибки центра треугольника
+INITIAL_SPEED = 400.0  # px/с — начальная неопределённость скорости
+INITIAL_ACCELERATION = 1000.0  # px/с² — начальная неопределённость ускорения
+
+
+# === Фильтр Калмана для одной цели ===
+# Оси x и y независимы и измеряются одновременно с одинаковым шумом, поэтому
+# ковариация P у них общая: хранится одна матрица n×n (n = 2 для cv, 3 для ca),
+# а состояние — матрица n×2 (столбцы x и y). Обновление — O(1), без обращения матриц.
+class KalmanFilter:
+    def __init__(self, x, y, t, model=KALMAN_MODEL, q=None, r=MEASUREMENT_NOISE):
+        if model not in PROCESS_NOISE:
+            raise ValueError(f"Неизвестная модель движения: {model}")
+        self.model = model
+        self.q = PROCESS_NOISE[model] if q is None else q
+        self.r = r
+        n = 2 if model == "cv" else 3
+        self.state = np.zeros((n, 2), dtype=np.float64)
+        self.state[0] = (x, y)
+        self.P = np.diag([r, INITIAL_SPEED ** 2, INITIAL_ACCELERATION ** 2][:n])
+        self.t = t
+
+    def _transition(self, dt):
+        if self.model == "cv":
+            F = np.array([[1.0, dt],
+                          [0.0, 1.0]])
+            Q = self.q * np.array([[dt ** 3 / 3, dt ** 2 / 2],
+                                   [dt ** 2 / 2, dt]])
+        else:
+            F = np.array([[1.0, dt, dt ** 2 / 2],
+                          [0.0, 1.0, dt],
+                          [0.0, 0.0, 1.0]])
+            Q = self.q * np.array([[dt ** 5 / 20, dt ** 4 / 8, dt ** 3 / 6],
+                                   [dt ** 4 / 8, dt ** 3 / 3, dt ** 2 / 2],
+                                   [dt ** 3 / 6, dt ** 2 / 2, dt]])
+        return F, Q
+
+    # Прогноз состояния на момент t (фильтр сдвигается во времени)
+    def advance(self, t):
+        dt = t - self.t
+        if dt <= 0:
+            return
+        F, Q = self._transition(dt)
+        self.state = F @ self.state
+        self.P = F @ self.P @ F.T + Q
+        self.t = t
+
+    # Коррекция по измерению позиции (H = [1, 0, ...])
+    def update(self, x, y):
+        innovation = np.array([x, y]) - self.state[0]
+        gain = self.P[:, 0] / (self.P[0, 0] + self.r)
+        self.state += np.outer(gain, innovation)
+        self.P -= np.outer(gain, self.P[0])
+
+    # Позиция на момент t без изменения фильтра
+    def position_at(self, t):
+        dt = max(0.0, t - self.t)
+        x, y = self.state[0] + self.state[1] * dt
+        if self.model == "ca":
+            x += self.state[2, 0] * dt * dt / 2
+            y += self.state[2, 1] * dt * dt / 2
+        return x, y
+
+    @property
+    def position(self):
+        return self.state[0, 0], self.state[0, 1]
+
+    @property
+    def velocity(self):
+        return self.state[1, 0], self.state[1, 1]
+
+    # Ковариация позиции и скорости (общая для обеих осей)
+    @property
+    def covariance(self):
+        return self.P
+
+
+# === Трек одной цели ===
+# История — кольцевой массив (x, y, t) фиксированного размера, без кортежей в deque.
+# Оценка движения:
+#   kalman   — фильтр Калмана (позиция, скорость, ковариация; без обнаружений
+#              трек продолжает движение по прогнозу);
+#   endpoint — прежняя оценка по первому и последнему обнаружению окна.
+class Track:
+    def __init__(self, track_id, x, y, t, history=TRACK_HISTORY, estimator="kalman", model=KALMAN_MODEL,
+                 process_noise=None):
+        if estimator not in TRACK_ESTIMATORS:
+            raise ValueError(f"Неизвестный способ оценки движения: {estimator}")
+        self.id = track_id
+        self.history = np.empty((history, 3), dtype=np.float64)
+        self.count = 0  # всего обнаружений за жизнь трека
+        self.misses = 0  # кадров подряд без обнаружения
+        self.filter = KalmanFilter(x, y, t, model, process_noise) if estimator == "kalman" else None
+        self.add(x, y, t)
+
+    def add(self, x, y, t):
+        self.history[self.count % len(self.history)] = (x, y, t)
+        self.count += 1
+        self.misses = 0
+        if self.filter is not None and self.count > 1:
+            self.filter.advance(t)
+            self.filter.update(x, y)
+
+    @property
+    def samples(self):
+        return min(self.count, len(self.history))
+
+    @property
+    def position(self):
+        if self.filter is not None:
+            x, y = self.filter.position
+        else:
+            x, y, _ = self.history[(self.count - 1) % len(self.history)]
+        return int(x), int(y)
+
+    # Позиция на момент t с учётом движения после последнего обнаружения
+    def position_at(self, t):
+        x, y = self.predict(t)
+        return int(x), int(y)
+
+    @property
+    def covariance(self):
+        return self.filter.covariance if self.filter is not None else None
+
+    @property
+    def last_time(self):
+        return self.history[(self.count - 1) % len(self.history)][2]
+
+    def velocity(self):
+        if self.filter is not None:
+            return self.filter.velocity
+        if self.samples < 2:
+            return 0.0, 0.0
+        x0, y0, t0 = self.history[(self.count - self.samples) % len(self.history)]
+        x1, y1, t1 = self.history[(self.count - 1) % len(self.history)]
+        if t1 - t0 <= 0:
+            return 0.0, 0.0
+        return (x1 - x0) / (t1 - t0), (y1 - y0) / (t1 - t0)
+
+    # Ожидаемая позиция в момент t
+    def predict(self, t):
+        if self.filter is not None:
+            return self.filter.position_at(t)
+        x, y, last = self.history[(self.count - 1) % len(self.history)]
+        vx, vy = self.velocity()
+        return x + vx * (t - last), y + vy * (t - last)
+
+    # Точка упреждения: текущая позиция + скорость * время прогноза
+    def lead_point(self, pred_time):
+        if self.filter is not None:
+            x, y = self.filter.position_at(self.filter.t + pred_time)
+            return int(x), int(y)
+        x, y = self.position
+        vx, vy = self.velocity()
+        return int(x + vx * pred_time), int(y + vy * pred_time)
+
+
+# === Менеджер треков ===
+# Каждый кадр обнаружения сопоставляются трекам: матрица расстояний от прогнозов
+# треков до обнаружений считается разом, пары дальше GATE_RADIUS отсекаются,
+# затем пары назначаются жадно по возрастанию расстояния (глобально ближайшие
+# первыми). Для десятков целей это O(N·M log(N·M)) и не требует SciPy.
+class TrackManager:
+    def __init__(self, history=TRACK_HISTORY, gate=GATE_RADIUS, max_misses=MAX_MISSES,
+                 estimator="kalman", model=KALMAN_MODEL, process_noise=None):
+        self.history = history
+        self.gate = gate
+        self.max_misses = max_misses
+        self.estimator = estimator
+        self.model = model
+        self.process_noise = process_noise  # None — PROCESS_NOISE[model]
+        self.tracks = []
+        self._next_id = 1
+
+    def reset(self):
+        self.tracks = []
+        self._next_id = 1
+
+    def update(self, detections, t):
+        detections = np.asarray(detections, dtype=np.float64).reshape(-1, 2)
+        assigned_tracks = set()
+        assigned_detections = set()
+
+        if self.tracks and len(detections):
+            predicted = np.array([track.predict(t) for track in self.tracks])
+            cost = np.hypot(predicted[:, None, 0] - detections[None, :, 0],
+                            predicted[:, None, 1] - detections[None, :, 1])
+            order = np.argsort(cost, axis=None)
+            for flat in order:
+                i, j = divmod(int(flat), len(detections))
+                if cost[i, j] > self.gate:
+                    break
+                if i in assigned_tracks or j in assigned_detections:
+                    continue
+                self.tracks[i].add(detections[j, 0], detections[j, 1], t)
+                assigned_tracks.add(i)
+                assigned_detections.add(j)
+
+        for i, track in enumerate(self.tracks):
+            if i not in assigned_tracks:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        for j in range(len(detections)):
+            if j not in assigned_detections:
+                x, y = detections[j]
+                self.tracks.append(Track(self._next_id, x, y, t, self.history, self.estimator, self.model,
+                                         self.process_noise))
+                self._next_id += 1
+        return self.tracks
+
+    # Выбор цели для наведения:
+    #   oldest  — трек с наибольшим числом обнаружений (самый устойчивый);
+    #   nearest — ближайший к точке point (например, к ракете);
+    #   fastest — самая быстрая цель.
+    def select(self, policy="oldest", point=None):
+        if policy not in TRACK_POLICIES:
+            raise ValueError(f"Неизвестная политика выбора цели: {policy}")
+        if not self.tracks:
+            return None
+        if policy == "nearest" and point is not None:
+            return min(self.tracks, key=lambda track: math.hypot(track.position[0] - point[0],
+                                                                 track.position[1] - point[1]))
+        if policy == "fastest":
+            return max(self.tracks, key=lambda track: math.hypot(*track.velocity()))
+        return max(self.tracks, key=lambda track: (track.count, -track.id))
+
+
+# === Сравнение оценок движения на записанных треках ===
+# samples — массив строк (t, x, y) с обнаружениями одной цели. После каждого
+# обнаружения оценка прогнозирует позицию через horizon секунд; ошибка — расстояние
+# до позиции цели в этот момент, интерполированной по записи.
+# Возвращает {название: (средняя ошибка, RMS, 95-й перцентиль)} в пикселях.
+def compare_estimators(samples, horizon=0.5, estimators=("kalman-cv", "kalman-ca", "endpoint")):
+    samples = np.asarray(samples, dtype=np.float64)
+    t, x, y = samples[:, 0], samples[:, 1], samples[:, 2]
+    results = {}
+    for name in estimators:
+        estimator, _, model = name.partition("-")
+        track = None
+        errors = []
+        for i in range(len(samples)):
+            if track is None:
+                track = Track(0, x[i], y[i], t[i], estimator=estimator, model=model or KALMAN_MODEL)
+            else:
+                track.add(x[i], y[i], t[i])
+            target_time = t[i] + horizon
+            if target_time > t[-1]:
+                break
+            px, py = track.predict(target_time)
+            errors.append(math.hypot(px - np.interp(target_time, t, x), py - np.interp(target_time, t, y)))
+        errors = np.array(errors)
+        results[name] = (errors.mean(), math.sqrt((errors ** 2).mean()), np.percentile(errors, 95))
+    return results
+
+
+# Синтетическая запись: прямая, разворот по дуге и «змейка» с частотой rate Гц,
+# целочисленными центрами, шумом и пропусками обнаружений
+def synthetic_track(duration=20.0, rate=60.0, noise=1.0, dropout=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(0.0, duration, 1.0 / rate)
+    x = np.empty_like(t)
+    y = np.empty_like(t)
+    third = duration / 3
+    for i, ti in enumerate(t):
+        if ti < third:
+            x[i], y[i] = 300 + 150 * ti, 400
+        elif ti < 2 * third:
+            angle = (ti - third) * 1.2
+            x[i] = 300 + 150 * third + 125 * math.sin(angle)
+            y[i] = 275 + 125 * math.cos(angle)
+        else:
+            base_x = 300 + 150 * third + 125 * math.sin(third * 1.2)
+            x[i] = base_x - 120 * (ti - 2 * third)
+            y[i] = 275 + 125 * math.cos(third * 1.2) + 80 * math.sin(4.0 * (ti - 2 * third))
+    x = np.round(x + rng.normal(0, noise, len(t)))
+    y = np.round(y + rng.normal(0, noise, len(t)))
+    keep = rng.random(len(t)) >= dropout
+    return np.column_stack([t, x, y])[keep]
+
+
+# Запуск: python tracking.py [запись.npy|запись.csv]
+# Запись — строки (t, x, y); без аргумента используется синтетический трек.
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+        recorded = np.load(path) if path.endswith(".npy") else np.loadtxt(path, delimiter=",")
+    else:
+        recorded = synthetic_track()
+    for horizon in (0.1, 0.5, 1.0):
+        print(f"Прогноз на {horizon:.1f} с:")
+        for name, (mean, rms, p95) in compare_estimators(recorded, horizon).items():
+            print(f"  {name:10s} средняя {mean:7.1f} px | RMS {rms:7.1f} px | p95 {p95:7.1f} px")
@@ -0,0 +1,201 @@
+import math
+import sys
+import time
+
+import numpy as np
+
+TRAJECTORY_KINDS = ("linear", "circle", "zigzag", "random_walk", "evasive")
+
+# Случайные траектории: старт на таком расстоянии от точки around (px) и скорость (px/сек)
+START_DISTANCE = (400.0, 700.0)
+TARGET_SPEED = 150.0
+RANDOM_WALK_STEP = 0.01  # сек — шаг сетки, на которой заранее считается случайное блуждание
+RANDOM_WALK_DURATION = 120.0  # сек — дальше цель идёт прямо с последней скоростью
+
+
+# === Траектория цели ===
+# positions(times) — позиции в моменты времени (сек от начала боя) одним
+# вызовом numpy: (n,) -> (n, 2). Вызов path(t) — то же для одного момента,
+# поэтому траекторию можно передать в engine.Engagement вместо функции.
+class Trajectory:
+    def __init__(self, kind, positions):
+        self.kind = kind
+        self._positions = positions
+
+    def positions(self, times):
+        times = np.asarray(times, dtype=np.float64)
+        return self._positions(np.atleast_1d(times)).reshape(times.shape + (2,))
+
+    def __call__(self, t):
+        return self.positions(t)
+
+    # Скорость по разности позиций (px/сек)
+    def velocities(self, times, eps=1e-3):
+        times = np.asarray(times, dtype=np.float64)
+        return (self.positions(times + eps) - self.positions(times - eps)) / (2 * eps)
+
+
+def constant_velocity(start, velocity):
+    start = np.asarray(start, dtype=np.float64)
+    velocity = np.asarray(velocity, dtype=np.float64)
+    return Trajectory("linear", lambda t: start + velocity * t[:, None])
+
+
+# Круг радиуса radius вокруг center; rate — угловая скорость (рад/сек)
+def circle(center, radius, rate, phase=0.0):
+    cx, cy = center
+
+    def positions(t):
+        angle = phase + rate * t
+        return np.column_stack((cx + radius * np.cos(angle), cy + radius * np.sin(angle)))
+
+    return Trajectory("circle", positions)
+
+
+# Движение со скоростью velocity и поперечным смещением треугольной волной
+# (amplitude px в каждую сторону, полный период period сек); в t=0 смещение нулевое
+def zigzag(start, velocity, amplitude, period):
+    start = np.asarray(start, dtype=np.float64)
+    velocity = np.asarray(velocity, dtype=np.float64)
+    speed = math.hypot(*velocity)
+    side = np.array([-velocity[1], velocity[0]]) / speed if speed > 0 else np.array([0.0, 1.0])
+
+    def positions(t):
+        phase = (t / period + 0.25) % 1.0
+        offset = amplitude * (4 * np.abs(phase - 0.5) - 1)
+        return start + velocity * t[:, None] + side * offset[:, None]
+
+    return Trajectory("zigzag", positions)
+
+
+# Случайное блуждание: скорость постоянна, курс меняется как винеровский процесс
+# (turn_noise рад/√сек). Путь считается один раз на сетке RANDOM_WALK_STEP и
+# интерполируется; один seed — один и тот же путь.
+def random_walk(start, speed, turn_noise=1.5, seed=0, heading=None, duration=RANDOM_WALK_DURATION,
+                step=RANDOM_WALK_STEP):
+    rng = np.random.default_rng(seed)
+    if heading is None:
+        heading = rng.uniform(0, 2 * math.pi)
+    count = int(math.ceil(duration / step))
+    headings = heading + np.concatenate(([0.0], np.cumsum(rng.normal(0.0, turn_noise * math.sqrt(step), count))))
+    grid = np.arange(count + 1) * step
+    path = np.empty((count + 1, 2))
+    path[0] = start
+    path[1:, 0] = start[0] + np.cumsum(speed * np.cos(headings[:-1]) * step)
+    path[1:, 1] = start[1] + np.cumsum(speed * np.sin(headings[:-1]) * step)
+    last_velocity = speed * np.array([math.cos(headings[-1]), math.sin(headings[-1])])
+
+    def positions(t):
+        result = np.column_stack((np.interp(t, grid, path[:, 0]), np.interp(t, grid, path[:, 1])))
+        beyond = t > grid[-1]
+        if beyond.any():
+            result[beyond] = path[-1] + last_velocity * (t[beyond] - grid[-1])[:, None]
+        return result
+
+    return Trajectory("random_walk", positions)
+
+
+# Прямо до turn_time, затем разворот на angle (рад, знак — направление)
+# с угловой скоростью rate (рад/сек), дальше снова прямо
+def evasive_turn(start, velocity, turn_time, angle, rate=3.0):
+    start = np.asarray(start, dtype=np.float64)
+    velocity = np.asarray(velocity, dtype=np.float64)
+    speed = math.hypot(*velocity)
+    heading = math.atan2(velocity[1], velocity[0])
+    omega = math.copysign(rate, angle)
+    turn_end = turn_time + abs(angle) / rate
+    turn_start = start + velocity * turn_time
+    exit_point = turn_start + speed / omega * np.array([math.sin(heading + angle) - math.sin(heading),
+                                                        math.cos(heading) - math.cos(heading + angle)])
+    exit_velocity = speed * np.array([math.cos(heading + angle), math.sin(heading + angle)])
+
+    def positions(t):
+        result = start + velocity * t[:, None]
+        turning = (t > turn_time) & (t <= turn_end)
+        theta = heading + omega * (t[turning] - turn_time)
+        result[turning] = turn_start + speed / omega * np.column_stack(
+            (np.sin(theta) - math.sin(heading), math.cos(heading) - np.cos(theta)))
+        after = t > turn_end
+        result[after] = exit_point + exit_velocity * (t[after] - turn_end)[:, None]
+        return result
+
+    return Trajectory("evasive", positions)
+
+
+# === Случайная траектория заданного вида ===
+# Старт — на расстоянии START_DISTANCE от точки around в случайном направлении
+# (или точка start), остальные параметры (курс, фаза, поворот) тоже из seed: один
+# seed — один путь. Любая траектория в t=0 проходит через старт. bounds — не
+# выпускать цель из прямоугольника (см. bounded).
+def random_trajectory(kind, seed=0, around=(600, 400), speed=TARGET_SPEED, start=None, bounds=None):
+    path = _random_trajectory(kind, seed, around, speed, start)
+    return bounded(path, bounds) if bounds is not None else path
+
+
+def _random_trajectory(kind, seed, around, speed, start):
+    rng = np.random.default_rng(seed)
+    angle = rng.uniform(0, 2 * math.pi)
+    distance = rng.uniform(*START_DISTANCE)
+    if start is None:
+        start = (around[0] + distance * math.cos(angle), around[1] + distance * math.sin(angle))
+    start = np.asarray(start, dtype=np.float64)
+    heading = rng.uniform(0, 2 * math.pi)
+    velocity = speed * np.array([math.cos(heading), math.sin(heading)])
+
+    if kind == "linear":
+        return constant_velocity(start, velocity)
+    if kind == "circle":
+        # Центр смещён от старта на радиус: круг начинается в точке старта
+        radius = rng.uniform(100, 250)
+        rate = speed / radius * rng.choice((-1, 1))
+        phase = rng.uniform(0, 2 * math.pi)
+        center = start - radius * np.array([math.cos(phase), math.sin(phase)])
+        return circle(center, radius, rate, phase)
+    if kind == "zigzag":
+        # Поперечная скорость 4·amplitude/period — не больше продольной
+        amplitude = rng.uniform(40, 120)
+        return zigzag(start, velocity, amplitude, 4 * amplitude / (speed * rng.uniform(0.5, 1.0)))
+    if kind == "random_walk":
+        return random_walk(start, speed, seed=int(rng.integers(2 ** 32)), heading=heading)
+    if kind == "evasive":
+        return evasive_turn(start, velocity, rng.uniform(1.0, 4.0), rng.choice((-1, 1)) * rng.uniform(1.0, 2.5))
+    raise ValueError(f"Неизвестный вид траектории: {kind}")
+
+
+# === Траектория внутри прямоугольника ===
+# bounds = (left, top, right, bottom): у края цель отражается, как от стенки,
+# поэтому путь остаётся непрерывным, а скорость по модулю не меняется
+def bounded(trajectory, bounds):
+    low = np.array(bounds[:2], dtype=np.float64)
+    span = np.array(bounds[2:], dtype=np.float64) - low
+
+    def positions(t):
+        offset = (trajectory.positions(t) - low) % (2 * span)
+        return low + span - np.abs(offset - span)
+
+    return Trajectory(trajectory.kind, positions)
+
+
+# === Замер: python trajectories.py [число траекторий] ===
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    times = np.arange(0, 10.0, 0.008)
+    for kind in TRAJECTORY_KINDS:
+        paths = [random_trajectory(kind, seed) for seed in range(count)]
+        started = time.perf_counter()
+        positions = [path.positions(times) for path in paths]
+        elapsed = time.perf_counter() - started
+        speeds = np.concatenate([np.hypot(*np.diff(p, axis=0).T) / 0.008 for p in positions])
+        again = random_trajectory(kind, count - 1).positions(times)
+        # Со старта в заданной точке и внутри экрана: ни скачка в t=0, ни выхода за край
+        screen = (60, 60, 1860, 1020)
+        jumps = bounds_ok = 0.0
+        for seed in range(min(count, 200)):
+            path = random_trajectory(kind, seed, start=(800, 400), bounds=screen).positions(times)
+            jumps = max(jumps, np.hypot(*(path[0] - (800, 400))))
+            bounds_ok = max(bounds_ok, np.max(np.r_[screen[0] - path[:, 0], path[:, 0] - screen[2],
+                                                    screen[1] - path[:, 1], path[:, 1] - screen[3]]))
+        print(f"{kind:12s} {count} × {len(times)} точек за {elapsed * 1000:.0f} мс, "
+              f"скорость {speeds.min():.0f}..{speeds.max():.0f} px/с, "
+              f"повтор по seed совпадает: {np.array_equal(again, positions[-1])}, "
+              f"отход от старта {jumps:.1e} px, выход за экран {max(bounds_ok, 0.0):.1f} px")